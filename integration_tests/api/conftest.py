@@ -0,0 +1,22 @@
+import asyncio
+import os
+import tempfile
+
+import pytest
+
+
+# The API opens its database on import, so point it at a scratch file first.
+os.environ.setdefault(
+    "ZQL_DB_PATH", os.path.join(tempfile.mkdtemp(), "zql.db")
+)
+
+
+@pytest.fixture(scope="session", autouse=True)
+def started_app():
+    """Runs the API startup and shutdown around the whole session."""
+    from zql_api.main import app, lifespan
+
+    context = lifespan(app)
+    asyncio.run(context.__aenter__())
+    yield app
+    asyncio.run(context.__aexit__(None, None, None))
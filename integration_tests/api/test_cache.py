@@ -0,0 +1,108 @@
+import asyncio
+
+from zql_api.cache import ResultCache, TableVersions, normalize_sql
+from zql_api.main import run_zql
+
+
+class FakeClock:
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_normalize_sql_keeps_quoted_whitespace():
+    sql = "SELECT  'a   b',\n  \"c  d\"\nFROM   t\n;"
+    assert normalize_sql(sql) == "SELECT 'a   b', \"c  d\" FROM t ;"
+
+
+def test_cache_expires_after_ttl():
+    clock = FakeClock()
+    cache = ResultCache(max_bytes=1000, ttl_seconds=10, clock=clock)
+    cache.put("q", [1, 2], {"t"})
+    clock.now = 9.9
+    assert cache.get("q") == [1, 2]
+    clock.now = 10
+    assert cache.get("q") is None
+    assert cache.size == 0
+
+
+def test_cache_evicts_least_recently_used_over_budget():
+    cache = ResultCache(max_bytes=20)
+    cache.put("a", "x" * 6, {"t"})
+    cache.put("b", "x" * 6, {"t"})
+    cache.get("a")
+    cache.put("c", "x" * 6, {"t"})
+    assert cache.get("a") is not None
+    assert cache.get("b") is None
+    assert cache.get("c") is not None
+    assert cache.size <= 20
+
+
+def test_cache_invalidates_by_table():
+    cache = ResultCache()
+    cache.put("a", 1, {"apples"})
+    cache.put("b", 2, {"bananas"})
+    cache.put("ab", 3, {"apples", "bananas"})
+    cache.invalidate({"apples"})
+    assert cache.get("a") is None
+    assert cache.get("ab") is None
+    assert cache.get("b") == 2
+
+    cache.invalidate(set())
+    assert cache.get("b") is None
+
+
+def test_cache_skips_results_that_raced_a_write():
+    cache = ResultCache()
+    snapshot = cache.snapshot({"apples"})
+    cache.invalidate({"apples"})
+    cache.put("a", 1, {"apples"}, snapshot)
+    assert cache.get("a") is None
+
+
+def test_caches_sharing_versions_see_each_others_writes(tmp_path):
+    path = str(tmp_path / "versions.db")
+    first = ResultCache(versions=TableVersions(path))
+    second = ResultCache(versions=TableVersions(path))
+    first.put("a", 1, {"apples"})
+    first.put("b", 2, {"bananas"})
+
+    second.invalidate({"apples"})
+    assert first.get("a") is None
+    assert first.get("b") == 2
+
+    second.invalidate(set())
+    assert first.get("b") is None
+
+
+def test_shared_versions_drop_results_that_raced_a_write(tmp_path):
+    path = str(tmp_path / "versions.db")
+    first = ResultCache(versions=TableVersions(path))
+    second = ResultCache(versions=TableVersions(path))
+    snapshot = first.snapshot({"apples"})
+    second.invalidate({"apples"})
+    first.put("a", 1, {"apples"}, snapshot)
+    assert first.get("a") is None
+
+
+def test_run_serves_repeated_queries_from_cache_until_a_write():
+    asyncio.run(run_zql("yeet girlie fruits or nah no cap"))
+    asyncio.run(run_zql(
+        "built different girlie fruits be (name text) no cap"
+    ))
+    asyncio.run(run_zql("pushin p into fruits ('apple') no cap"))
+
+    query = "its giving count(name) yass fruits no cap"
+    first = asyncio.run(run_zql(query))
+    second = asyncio.run(run_zql(query))
+    assert first["cached"] is False
+    assert second["cached"] is True
+    assert second["rows"] == first["rows"] == [{"count(name)": 1}]
+
+    asyncio.run(run_zql("pushin p into fruits ('banana') no cap"))
+    third = asyncio.run(run_zql(query))
+    assert third["cached"] is False
+    assert third["rows"] == [{"count(name)": 2}]
@@ -0,0 +1,78 @@
+import sqlite3
+
+import pytest
+
+from zql_api.db import ConnectionPool, PoolTimeoutError
+from zql_api.main import setup_db
+
+
+def test_pool_uses_wal(tmp_path):
+    pool = ConnectionPool(str(tmp_path / "wal.db"), size=1)
+    with pool.connection() as connection:
+        mode = connection.execute("PRAGMA journal_mode;").fetchone()[0]
+    pool.close()
+    assert mode == "wal"
+
+
+def test_pool_reuses_connections(tmp_path):
+    pool = ConnectionPool(str(tmp_path / "reuse.db"), size=2)
+    with pool.connection() as first:
+        pass
+    with pool.connection() as second:
+        pass
+    pool.close()
+    assert first is second
+
+
+def test_pool_times_out_when_exhausted(tmp_path):
+    pool = ConnectionPool(str(tmp_path / "full.db"), size=1, timeout=0.01)
+    with pool.connection():
+        with pytest.raises(PoolTimeoutError):
+            pool.acquire()
+    pool.close()
+
+
+def test_pool_recovers_from_failed_connects(tmp_path):
+    path = str(tmp_path / "missing.db")
+    pool = ConnectionPool(path, size=2, timeout=0.01, read_only=True)
+    for _ in range(3):
+        with pytest.raises(sqlite3.OperationalError):
+            pool.acquire()
+    sqlite3.connect(path).close()
+    with pool.connection() as connection:
+        assert connection.execute("SELECT 1;").fetchone() == (1,)
+    pool.close()
+
+
+def test_pool_maps_database_into_memory(tmp_path):
+    pool = ConnectionPool(str(tmp_path / "mmap.db"), size=1)
+    with pool.connection() as connection:
+        size = connection.execute("PRAGMA mmap_size;").fetchone()[0]
+    pool.close()
+    assert size > 0
+
+
+def test_read_only_pool_cannot_write(tmp_path):
+    path = str(tmp_path / "ro.db")
+    writer = ConnectionPool(path, size=1)
+    with writer.connection() as connection:
+        connection.execute("CREATE TABLE t(x int);")
+        connection.commit()
+    writer.close()
+
+    pool = ConnectionPool(path, size=1, read_only=True)
+    with pool.connection() as connection:
+        assert connection.execute("SELECT count(*) FROM t;").fetchone() == (0,)
+        with pytest.raises(sqlite3.OperationalError):
+            connection.execute("INSERT INTO t VALUES (1);")
+    pool.close()
+
+
+def test_setup_db_seeds_once(tmp_path):
+    pool = ConnectionPool(str(tmp_path / "seed.db"), size=1)
+    with pool.connection() as connection:
+        setup_db(connection)
+        setup_db(connection)
+        count = connection.execute("SELECT count(*) FROM peeps;").fetchone()
+    pool.close()
+    assert count == (14,)
@@ -0,0 +1,78 @@
+import asyncio
+import json
+import sqlite3
+
+from zql import Zql
+from zql_api.main import explain_query
+from zql_api.plan import (
+    find_full_scans,
+    get_index_hints,
+    get_plan_sql,
+    get_plan_tree,
+)
+
+
+def post_explain(query: str) -> dict:
+    response = asyncio.run(explain_query(query=query))
+    return json.loads(response.body)
+
+
+def explain(connection: sqlite3.Connection, query: str) -> tuple[dict, list]:
+    prepared = Zql().prepare(query)
+    sql = get_plan_sql(prepared["sql"])
+    rows = connection.execute(sql, prepared["params"]).fetchall()
+    return prepared, get_plan_tree(rows)
+
+
+def test_plan_tree_nests_children():
+    rows = [(2, 0, 0, "CO-ROUTINE x"), (3, 2, 0, "SCAN y"), (7, 0, 0, "SCAN x")]
+    assert get_plan_tree(rows) == [
+        {
+            "id": 2,
+            "detail": "CO-ROUTINE x",
+            "children": [{"id": 3, "detail": "SCAN y", "children": []}],
+        },
+        {"id": 7, "detail": "SCAN x", "children": []},
+    ]
+
+
+def test_index_hints_follow_aliases():
+    connection = sqlite3.connect(":memory:")
+    connection.execute("CREATE TABLE a(id int, name text);")
+    connection.execute("CREATE TABLE b(id int, a_id int);")
+    connection.execute("CREATE INDEX idx_b_a_id ON b(a_id);")
+    prepared, plan = explain(
+        connection,
+        "its giving x.name yass a be x, b be y tfw x.id be y.a_id no cap",
+    )
+    full_scans = find_full_scans(plan)
+    assert [scan["name"] for scan in full_scans] == ["x"]
+    assert get_index_hints(connection, prepared["ast"], full_scans) == [
+        "CREATE INDEX idx_a_id ON a(id);"
+    ]
+
+
+def test_explain_reports_full_scan_and_timing():
+    body = post_explain("its giving name yass peeps tfw followers bops 1000 no cap")
+    assert body["error_message"] is None
+    assert body["plan"][0]["detail"] == "SCAN peeps"
+    assert body["full_scans"] == [{"name": "peeps", "detail": "SCAN peeps"}]
+    assert body["index_hints"] == [
+        "CREATE INDEX idx_peeps_followers ON peeps(followers);"
+    ]
+    assert body["row_count"] == 5
+    assert body["timing"]["transpile_seconds"] >= 0
+    assert body["timing"]["execute_seconds"] >= 0
+
+
+def test_explain_accepts_explain_queries():
+    body = post_explain("whats good with its giving 1 no cap")
+    assert body["error_message"] is None
+    assert body["full_scans"] == []
+    assert body["row_count"] == 1
+
+
+def test_explain_reports_parse_errors():
+    body = post_explain("its giving no cap")
+    assert body["error_message"]
+    assert body["plan"] == []
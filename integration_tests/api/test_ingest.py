@@ -0,0 +1,115 @@
+import asyncio
+import json
+import sqlite3
+import time
+
+import pytest
+
+from zql_api import main
+from zql_api.cache import ResultCache
+from zql_api.ingest import IngestError, ingest_statements, iter_ndjson_statements
+from zql_api.main import run_ingest, run_zql
+
+
+ROW_COUNT = 300
+CREATE = "built different girlie {table} be (name text, n int) no cap"
+
+
+def get_inserts(table: str) -> list[str]:
+    return [
+        f"pushin p into {table} ('row {i}', {i}) no cap"
+        for i in range(ROW_COUNT)
+    ]
+
+
+@pytest.fixture
+def connection():
+    connection = sqlite3.connect(":memory:")
+    yield connection
+    connection.close()
+
+
+def test_ingest_batches_same_shape_inserts(connection):
+    statements = [CREATE.format(table="t"), *get_inserts("t")]
+    stats = ingest_statements(connection, statements, batch_size=100)
+    assert stats["statements"] == ROW_COUNT + 1
+    assert stats["rows"] == ROW_COUNT
+    assert stats["batches"] == 3
+    assert stats["tables"] == {"t"}
+    count = connection.execute("SELECT count(*), sum(n) FROM t").fetchone()
+    assert count == (ROW_COUNT, sum(range(ROW_COUNT)))
+
+
+def test_ingest_rolls_back_on_error(connection):
+    connection.execute("CREATE TABLE t (name text, n int)")
+    statements = [*get_inserts("t")[:5], "pushin p into no cap"]
+    with pytest.raises(IngestError):
+        ingest_statements(connection, statements)
+    assert connection.execute("SELECT count(*) FROM t").fetchone() == (0,)
+
+
+def test_ingest_rolls_back_definitions_on_error(connection):
+    statements = [
+        CREATE.format(table="t"),
+        "pushin p into t ('a', 1) no cap",
+        "pushin p into t ('b', 2 no cap",
+    ]
+    with pytest.raises(IngestError):
+        ingest_statements(connection, statements)
+    tables = connection.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'table'"
+    ).fetchall()
+    assert tables == []
+
+
+def test_iter_ndjson_statements():
+    lines = [
+        json.dumps("its giving 1 no cap"),
+        "",
+        json.dumps({"query": "its giving 2 no cap"}),
+    ]
+    actual = list(iter_ndjson_statements(lines))
+    assert actual == ["its giving 1 no cap", "its giving 2 no cap"]
+
+    with pytest.raises(IngestError):
+        list(iter_ndjson_statements(["{\"sql\": 1}"]))
+
+
+def test_ingest_script_through_api():
+    script = "\n".join([
+        "yeet girlie scripted or nah no cap",
+        CREATE.format(table="scripted"),
+        *get_inserts("scripted"),
+    ])
+    stats = run_ingest(script, is_ndjson=False)
+    assert stats["rows"] == ROW_COUNT
+    assert stats["tables"] == ["scripted"]
+
+    result = asyncio.run(run_zql("its giving count(n) yass scripted no cap"))
+    assert result["rows"] == [{"count(n)": ROW_COUNT}]
+
+
+def test_bulk_ingest_beats_per_request_path(monkeypatch):
+    monkeypatch.setattr(main, "result_cache", ResultCache(max_bytes=0))
+    setup = ["yeet girlie {table} or nah no cap", CREATE]
+    for statement in setup:
+        asyncio.run(run_zql(statement.format(table="per_request")))
+        asyncio.run(run_zql(statement.format(table="bulk")))
+
+    async def per_request():
+        for statement in get_inserts("per_request"):
+            await run_zql(statement)
+
+    start = time.perf_counter()
+    asyncio.run(per_request())
+    per_request_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    run_ingest("\n".join(get_inserts("bulk")), is_ndjson=False)
+    bulk_seconds = time.perf_counter() - start
+
+    print(
+        f"per request: {ROW_COUNT / per_request_seconds:.0f} rows/s, "
+        f"bulk: {ROW_COUNT / bulk_seconds:.0f} rows/s"
+    )
+    assert bulk_seconds < per_request_seconds
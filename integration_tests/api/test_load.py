@@ -0,0 +1,78 @@
+import asyncio
+import os
+import time
+
+import pytest
+
+from zql.generator import QueryGenerator
+from zql.main import ZQL_GRAMMAR
+from zql.statements import QUERY_STMT
+from zql_api import main
+from zql_api.cache import ResultCache
+from zql_api.main import run_zql
+
+
+# Cross joins make SQLite do enough work per request for overlap to show.
+LOAD_QUERY = """
+its giving count(a.name)
+yass peeps a, peeps b, peeps c, peeps d
+no cap
+"""
+EXPECTED_COUNT = 14 ** 4
+TOTAL_REQUESTS = 32
+LOAD_SEED = 7
+
+
+@pytest.fixture(autouse=True)
+def no_result_cache(monkeypatch):
+    # Every request should reach SQLite, not the result cache.
+    monkeypatch.setattr(main, "result_cache", ResultCache(max_bytes=0))
+
+
+def get_generated_queries(count: int) -> list[str]:
+    # Only queries that read, so the load never changes the test database.
+    generator = QueryGenerator(ZQL_GRAMMAR, seed=LOAD_SEED, kinds={QUERY_STMT})
+    return generator.generate_many(count)
+
+
+async def measure_throughput(concurrency: int) -> float:
+    """
+    Sends `TOTAL_REQUESTS` cross join queries and as many generated queries,
+    `concurrency` at a time. Generated queries name random tables, so only
+    their transpiling is checked.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def send():
+        async with semaphore:
+            result = await run_zql(LOAD_QUERY)
+            assert result["error_message"] is None
+            assert result["rows"][0]["count(a.name)"] == EXPECTED_COUNT
+
+    async def send_generated(query: str):
+        async with semaphore:
+            result = await run_zql(query)
+            assert result["transpiled_query"], result["error_message"]
+
+    requests = [send() for _ in range(TOTAL_REQUESTS)]
+    requests += [send_generated(q) for q in get_generated_queries(TOTAL_REQUESTS)]
+    start = time.perf_counter()
+    await asyncio.gather(*requests)
+    elapsed = time.perf_counter() - start
+    return 2 * TOTAL_REQUESTS / elapsed
+
+
+def test_concurrent_requests_all_succeed():
+    throughput = asyncio.run(measure_throughput(8))
+    assert throughput > 0
+
+
+@pytest.mark.skipif(
+    (os.cpu_count() or 1) < 4,
+    reason="Throughput only scales with concurrency on multiple cores.",
+)
+def test_throughput_scales_with_concurrency():
+    serial = asyncio.run(measure_throughput(1))
+    concurrent = asyncio.run(measure_throughput(4))
+    print(f"serial: {serial:.1f} req/s, concurrent: {concurrent:.1f} req/s")
+    assert concurrent > 1.5 * serial
@@ -0,0 +1,46 @@
+import asyncio
+
+import pytest
+
+from zql_api import main
+from zql_api.main import run_zql
+
+
+QUERY = "its giving name yass peeps no cap"
+
+
+def get_names(result: dict) -> list[str]:
+    return [row["name"] for row in result["rows"]]
+
+
+def test_first_page():
+    result = asyncio.run(run_zql(QUERY, page=1, page_size=3))
+    assert get_names(result) == ["andrew", "bella", "hugo"]
+    assert result["has_more"] is True
+
+
+def test_later_page_steps_past_earlier_rows():
+    result = asyncio.run(run_zql(QUERY, page=2, page_size=3))
+    assert get_names(result) == ["vinesh", "tamjid", "laura"]
+    assert result["page"] == 2
+
+
+def test_last_page_has_no_more():
+    result = asyncio.run(run_zql(QUERY, page=3, page_size=5))
+    assert len(result["rows"]) == 4
+    assert result["has_more"] is False
+
+
+def test_row_cap_applies_without_page_params(monkeypatch):
+    monkeypatch.setattr(main, "MAX_ROWS", 4)
+    result = asyncio.run(run_zql(QUERY))
+    assert len(result["rows"]) == 4
+    assert result["page_size"] == 4
+    assert result["has_more"] is True
+
+
+@pytest.mark.parametrize("page,page_size", [(0, 10), (1, 0)])
+def test_invalid_page_params(page, page_size):
+    result = asyncio.run(run_zql(QUERY, page=page, page_size=page_size))
+    assert result["error_message"].startswith("Expected")
+    assert result["rows"] == []
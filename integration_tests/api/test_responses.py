@@ -0,0 +1,90 @@
+import asyncio
+import json
+
+from fastapi.middleware.gzip import GZipMiddleware
+
+from zql_api import responses
+from zql_api.main import app, run_query, run_zql
+
+
+QUERY = "its giving name, followers yass peeps say less 2 no cap"
+
+
+def post_run(result_format: str) -> dict:
+    response = asyncio.run(
+        run_query(
+            query=QUERY,
+            page=None,
+            page_size=None,
+            format=result_format,
+            pretty=False,
+        )
+    )
+    return json.loads(response.body)
+
+
+def test_dumps_is_compact_without_orjson(monkeypatch):
+    monkeypatch.setattr(responses, "orjson", None)
+    actual = responses.dumps({"a": [1, None], "b": b"blob"})
+    assert actual == b'{"a":[1,null],"b":"b\'blob\'"}'
+
+
+def test_run_columnar_format():
+    body = post_run("columnar")
+    assert body["columns"] == ["name", "followers"]
+    assert body["data"] == [["andrew", 1700], ["bella", 1000]]
+    assert "rows" not in body
+
+
+def test_run_rows_format_by_default():
+    body = asyncio.run(run_zql(QUERY))
+    assert body["rows"] == [
+        {"name": "andrew", "followers": 1700},
+        {"name": "bella", "followers": 1000},
+    ]
+
+
+def test_run_rejects_unknown_format():
+    body = post_run("xml")
+    assert body["error_message"].startswith("Expected `format`")
+
+
+def test_app_compresses_responses():
+    middleware = [m.cls for m in app.user_middleware]
+    assert GZipMiddleware in middleware
+
+
+def test_run_returns_compact_sql_unless_pretty():
+    compact = asyncio.run(run_zql(QUERY))
+    pretty = asyncio.run(run_zql(QUERY, pretty=True))
+    assert compact["transpiled_query"] == (
+        "SELECT name, followers FROM peeps LIMIT 2 ;"
+    )
+    assert pretty["transpiled_query"] == (
+        "SELECT name, followers\nFROM peeps\nLIMIT 2\n;"
+    )
+    assert pretty["rows"] == compact["rows"]
+
+
+def test_run_orders_and_groups_by_column_position():
+    ordered = asyncio.run(
+        run_zql("its giving name, followers yass peeps ngl 2 high key no cap")
+    )
+    followers = [row["followers"] for row in ordered["rows"]]
+    assert followers == sorted(followers, reverse=True)
+
+    grouped = asyncio.run(
+        run_zql("its giving followers, count(name) yass peeps let 1 cook no cap")
+    )
+    assert len(grouped["rows"]) > 1
+
+
+def test_run_keeps_select_list_literals():
+    body = asyncio.run(run_zql("its giving 6 no cap"))
+    assert body["rows"] == [{"6": 6}]
+
+
+def test_run_accepts_integers_too_large_for_sqlite():
+    body = asyncio.run(run_zql("its giving 99999999999999999999 no cap"))
+    assert body["error_message"] is None
+    assert body["rows"] == [{"99999999999999999999": 1e20}]
@@ -0,0 +1,31 @@
+import asyncio
+import json
+
+from zql_api.main import run_query_stream
+
+
+async def read_lines(query: str) -> list:
+    response = await run_query_stream(query=query)
+    chunks = [chunk async for chunk in response.body_iterator]
+    return [json.loads(line) for line in b"".join(chunks).splitlines()]
+
+
+def test_stream_sends_columns_once_then_rows():
+    query = "its giving name, followers yass peeps say less 2 no cap"
+    header, *rows = asyncio.run(read_lines(query))
+    assert header["columns"] == ["name", "followers"]
+    assert header["error_message"] is None
+    assert rows == [["andrew", 1700], ["bella", 1000]]
+
+
+def test_stream_reports_parse_error_in_header():
+    lines = asyncio.run(read_lines("its giving no cap"))
+    assert len(lines) == 1
+    assert lines[0]["error_message"]
+    assert lines[0]["transpiled_query"] == ""
+
+
+def test_stream_reports_sql_error_in_header():
+    lines = asyncio.run(read_lines("its giving a yass missing no cap"))
+    assert len(lines) == 1
+    assert lines[0]["error_message"] == "no such table: missing"
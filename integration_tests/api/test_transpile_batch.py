@@ -0,0 +1,119 @@
+import asyncio
+import time
+
+import pytest
+from fastapi import HTTPException
+
+from zql_api import main
+from zql_api.main import transpile_queries, transpile_query
+
+
+# Unclosed nested calls backtrack so much that they never finish in time.
+RUNAWAY_QUERY = "its giving count ( " + "b ( " * 20
+
+
+class FakeRequest:
+    def __init__(self, is_disconnected: bool = False):
+        self.disconnected = is_disconnected
+
+    async def is_disconnected(self) -> bool:
+        return self.disconnected
+
+
+def post_batch(queries: list[str]) -> list[dict]:
+    return asyncio.run(transpile_queries(FakeRequest(), queries))
+
+
+def test_batch_keeps_order_and_reports_errors():
+    queries = [
+        "its giving 1 no cap",
+        "its giving no cap",
+        "its giving 1 no cap",
+        "its giving a yass t no cap",
+    ]
+    actual = post_batch(queries)
+    assert actual[0] == {"sql": "SELECT 1\n;", "error": None}
+    assert actual[1]["sql"] is None
+    assert actual[1]["error"]
+    assert actual[2] == actual[0]
+    assert actual[3] == {"sql": "SELECT a\nFROM t\n;", "error": None}
+
+
+def test_batch_dedupes_identical_queries(monkeypatch):
+    transpiled = []
+
+    def record(query: str, deadline: float, budgets: list) -> dict:
+        transpiled.append(query)
+        return {"sql": query, "error": None}
+
+    monkeypatch.setattr(main, "transpile_for_batch", record)
+    queries = ["a", "b", "a", "a", "b"]
+    actual = post_batch(queries)
+    assert [r["sql"] for r in actual] == queries
+    assert sorted(transpiled) == ["a", "b"]
+
+
+def test_batch_rejects_oversized_input(monkeypatch):
+    monkeypatch.setattr(main, "MAX_BATCH_SIZE", 2)
+    with pytest.raises(HTTPException) as err:
+        post_batch(["a", "b", "c"])
+    assert err.value.status_code == 413
+
+
+def test_batch_beats_single_requests():
+    queries = [
+        f"its giving a, b yass t{i % 10} tfw a bops {i % 10} no cap"
+        for i in range(200)
+    ]
+
+    async def singles():
+        for query in queries:
+            await transpile_query(query=query)
+
+    start = time.perf_counter()
+    asyncio.run(singles())
+    single_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    post_batch(queries)
+    batch_seconds = time.perf_counter() - start
+
+    print(f"singles: {single_seconds:.3f}s, batch: {batch_seconds:.3f}s")
+    assert batch_seconds < single_seconds
+
+
+def test_batch_shares_one_deadline(monkeypatch):
+    monkeypatch.setattr(main, "BATCH_TIMEOUT_SECONDS", 0.2)
+    monkeypatch.setattr(main, "MAX_PARSE_ATTEMPTS", None)
+    queries = [f"{RUNAWAY_QUERY} {i}" for i in range(16)]
+    start = time.perf_counter()
+    actual = post_batch(queries)
+    elapsed = time.perf_counter() - start
+    assert all(result["sql"] is None for result in actual)
+    assert elapsed < 1
+
+
+def test_batch_does_not_delay_single_transpiles(monkeypatch):
+    monkeypatch.setattr(main, "BATCH_TIMEOUT_SECONDS", 1)
+    monkeypatch.setattr(main, "MAX_PARSE_ATTEMPTS", None)
+    queries = [f"{RUNAWAY_QUERY} {i}" for i in range(16)]
+
+    async def single_during_batch():
+        batch = asyncio.create_task(transpile_queries(FakeRequest(), queries))
+        await asyncio.sleep(0.05)
+        single = await transpile_query(query="its giving 1 no cap")
+        await batch
+        return single
+
+    assert asyncio.run(single_during_batch()) == "SELECT 1\n;"
+
+
+def test_batch_stops_when_client_disconnects(monkeypatch):
+    monkeypatch.setattr(main, "MAX_PARSE_ATTEMPTS", None)
+    queries = [f"{RUNAWAY_QUERY} {i}" for i in range(16)]
+    start = time.perf_counter()
+    with pytest.raises(HTTPException) as err:
+        asyncio.run(transpile_queries(FakeRequest(is_disconnected=True), queries))
+    assert err.value.status_code == 499
+    assert post_batch(["its giving 1 no cap"])[0]["sql"] == "SELECT 1\n;"
+    assert time.perf_counter() - start < main.BATCH_TIMEOUT_SECONDS
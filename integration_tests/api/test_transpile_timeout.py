@@ -0,0 +1,52 @@
+import asyncio
+import threading
+
+import pytest
+
+from zql import ZqlTimeoutError
+from zql.parser import ParseBudget, ParseTimeoutError
+from zql_api import main
+from zql_api.main import run_transpile, transpile_query
+
+
+def test_runaway_transpile_times_out_and_stops(monkeypatch):
+    monkeypatch.setattr(main, "TRANSPILE_TIMEOUT_SECONDS", 0.05)
+    monkeypatch.setattr(main, "MAX_PARSE_ATTEMPTS", None)
+    stopped = threading.Event()
+
+    def runaway(query: str, budget: ParseBudget):
+        # Behaves like `Zql.parse` on input that never finishes parsing.
+        try:
+            while True:
+                budget.check()
+        except ParseTimeoutError as pte:
+            stopped.set()
+            raise ZqlTimeoutError(pte)
+
+    with pytest.raises(ZqlTimeoutError):
+        asyncio.run(run_transpile(runaway, "its giving 1 no cap"))
+    assert stopped.wait(timeout=5)
+
+
+def test_transpile_endpoint_still_transpiles():
+    actual = asyncio.run(transpile_query(query="its giving 1 no cap"))
+    assert actual == "SELECT 1\n;"
+
+
+def test_run_reports_parse_limits_and_counters(monkeypatch):
+    monkeypatch.setattr(main, "MAX_PARSE_TOKENS", 3)
+    # A shape no other test runs, so it is parsed rather than served from cache.
+    query = "its giving dank, name yass peeps say less 99 no cap"
+    result = asyncio.run(main.run_zql(query))
+    assert result["error_message"] == "Got 12 tokens. Expected at most 3."
+    assert result["parse_stats"] == {"attempts": 0, "tokens": 12}
+
+
+def test_runaway_parse_hits_attempt_limit(monkeypatch):
+    # A generous timeout, so only the attempt limit can stop the parse.
+    monkeypatch.setattr(main, "TRANSPILE_TIMEOUT_SECONDS", 60)
+    # Unclosed nested calls backtrack about 3x more per level.
+    query = "its giving count ( " + "b ( " * 14
+    result = asyncio.run(main.run_zql(query))
+    expected = f"Parse attempted more than {main.MAX_PARSE_ATTEMPTS} rules."
+    assert result["error_message"] == expected
@@ -0,0 +1,191 @@
+import json
+import multiprocessing
+import os
+import socket
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import pytest
+
+from zql.cache import SqliteCache
+from zql.generator import QueryGenerator
+from zql.main import (
+    SHAPE_CACHE_SIZE,
+    ZQL_GRAMMAR,
+    ZQL_GRAMMAR_HASH,
+    open_transpile_cache,
+)
+from zql.statements import QUERY_STMT
+from zql_api.serve import prepare_worker_env
+
+
+TOTAL_QUERIES = 400
+LOAD_SEED = 11
+SERVER_WORKERS = 2
+SERVER_START_SECONDS = 30
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
+
+
+def get_load_queries(count: int) -> list[str]:
+    # Random queries rarely share a shape, so almost none are cached.
+    return QueryGenerator(ZQL_GRAMMAR, seed=LOAD_SEED).generate_many(count)
+
+
+def transpile_in_worker(queries: list[str]) -> list[str]:
+    """Transpiles queries the way an API worker process does."""
+    from zql_api.main import Zql
+
+    zql = Zql()
+    return [zql.prepare(query)["sql"] for query in queries]
+
+
+def parse_in_worker(queries: list[str]) -> list[str]:
+    """Transpiles queries the way the API's transpile endpoints do."""
+    from zql_api.main import Zql
+
+    zql = Zql()
+    return [zql.parse(query) for query in queries]
+
+
+@pytest.fixture
+def worker_env(tmp_path, monkeypatch):
+    env = prepare_worker_env(str(tmp_path))
+    for name, value in env.items():
+        monkeypatch.setenv(name, value)
+    return env
+
+
+def new_worker_pool(workers: int) -> ProcessPoolExecutor:
+    context = multiprocessing.get_context("spawn")
+    return ProcessPoolExecutor(max_workers=workers, mp_context=context)
+
+
+def measure_throughput(workers: int, queries: list[str]) -> float:
+    """Splits `queries` across `workers` processes and returns queries/s."""
+    with new_worker_pool(workers) as executor:
+        # Start every worker before timing, so imports are not measured.
+        list(executor.map(transpile_in_worker, [[]] * workers))
+        chunks = [queries[n::workers] for n in range(workers)]
+        start = time.perf_counter()
+        list(executor.map(transpile_in_worker, chunks))
+        elapsed = time.perf_counter() - start
+    return len(queries) / elapsed
+
+
+def test_workers_share_transpile_cache(worker_env):
+    query = "its giving name yass peeps tfw followers bops 1000 no cap"
+    with new_worker_pool(1) as executor:
+        sql = executor.submit(transpile_in_worker, [query]).result()[0]
+
+    cache = SqliteCache(
+        worker_env["ZQL_SHARED_CACHE_PATH"],
+        SHAPE_CACHE_SIZE,
+        namespace=ZQL_GRAMMAR_HASH,
+    )
+    assert len(cache) == 1
+    with new_worker_pool(1) as executor:
+        assert executor.submit(transpile_in_worker, [query]).result() == [sql]
+    assert len(cache) == 1
+    cache.close()
+
+    # The transpile endpoints read SQL by tokens from the same shared file.
+    with new_worker_pool(1) as executor:
+        sql = executor.submit(parse_in_worker, [query]).result()[0]
+    cache = open_transpile_cache(worker_env["ZQL_TRANSPILE_CACHE_PATH"])
+    assert len(cache) == 2
+    with new_worker_pool(1) as executor:
+        assert executor.submit(parse_in_worker, [query]).result() == [sql]
+    assert len(cache) == 2
+    cache.close()
+
+
+@pytest.mark.skipif(
+    (os.cpu_count() or 1) < 4,
+    reason="Throughput only scales with worker processes on multiple cores.",
+)
+def test_throughput_scales_with_workers(worker_env):
+    queries = get_load_queries(TOTAL_QUERIES)
+    single = measure_throughput(1, queries)
+    multiple = measure_throughput(4, queries)
+    print(f"1 worker: {single:.1f} q/s, 4 workers: {multiple:.1f} q/s")
+    assert multiple > 2 * single
+
+
+def get_free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def post_run(url: str, query: str) -> dict:
+    data = urllib.parse.urlencode({"query": query}).encode()
+    with urllib.request.urlopen(f"{url}/run", data, timeout=10) as response:
+        return json.loads(response.read())
+
+
+@pytest.fixture
+def server_url(tmp_path):
+    """Runs the API with several worker processes, as it runs in production."""
+    port = get_free_port()
+    env = {
+        **os.environ,
+        "PYTHONPATH": os.path.abspath(ROOT_DIR),
+        "ZQL_DB_PATH": str(tmp_path / "zql.db"),
+        "ZQL_COMPILED_GRAMMAR": str(tmp_path / "zql_grammar.json"),
+        "ZQL_SHARED_CACHE_PATH": str(tmp_path / "zql_cache.db"),
+    }
+    command = [
+        sys.executable, "-m", "zql_api.serve", "--host", "127.0.0.1",
+        "--port", str(port), "--workers", str(SERVER_WORKERS),
+    ]
+    server = subprocess.Popen(
+        command, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + SERVER_START_SECONDS
+    while True:
+        try:
+            post_run(url, "its giving 1 no cap")
+            break
+        except (urllib.error.URLError, ConnectionError):
+            if time.monotonic() > deadline or server.poll() is not None:
+                server.kill()
+                pytest.fail("The API server did not start.")
+            time.sleep(0.2)
+    yield url
+    server.terminate()
+    server.wait(timeout=10)
+
+
+def test_server_workers_never_serve_stale_results(server_url):
+    post_run(server_url, "built different girlie fruits be (name text) no cap")
+    post_run(server_url, "pushin p into fruits ('apple') no cap")
+    query = "its giving count(name) yass fruits no cap"
+    # Separate connections spread requests, and cached results, over workers.
+    warm = [post_run(server_url, query) for _ in range(20)]
+    assert all(r["rows"] == [{"count(name)": 1}] for r in warm)
+    assert any(r["cached"] for r in warm)
+
+    post_run(server_url, "pushin p into fruits ('banana') no cap")
+    after = [post_run(server_url, query) for _ in range(20)]
+    assert all(r["rows"] == [{"count(name)": 2}] for r in after)
+
+
+def test_server_workers_serve_concurrent_load(server_url):
+    generator = QueryGenerator(ZQL_GRAMMAR, seed=LOAD_SEED, kinds={QUERY_STMT})
+    queries = generator.generate_many(100)
+    queries += ["its giving name yass peeps tfw followers bops 100 no cap"] * 100
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        results = list(executor.map(lambda q: post_run(server_url, q), queries))
+    elapsed = time.perf_counter() - start
+    print(f"{SERVER_WORKERS} workers: {len(queries) / elapsed:.1f} req/s")
+    # Generated queries name random tables, so only transpiling must succeed.
+    assert all(r["transpiled_query"] for r in results)
+    assert all(r["rows"] for r in results[100:])
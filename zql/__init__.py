@@ -1,2 +1,2 @@
 from zql.types import ZqlQuery
-from zql.main import Zql, ZqlParserError
+from zql.main import Zql, ZqlLimitError, ZqlParserError, ZqlTimeoutError
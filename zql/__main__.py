@@ -0,0 +1,6 @@
+import sys
+
+from zql.cli import main
+
+
+sys.exit(main())
@@ -0,0 +1,144 @@
+import json
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Any, Hashable
+
+
+class LruCache:
+    """Bounded least recently used cache that is safe to share across threads."""
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self.entries: OrderedDict[Hashable, Any] = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Any | None:
+        with self.lock:
+            value = self.entries.get(key)
+            if value is not None:
+                self.entries.move_to_end(key)
+            return value
+
+    def put(self, key: Hashable, value: Any):
+        if self.max_size <= 0:
+            return
+        with self.lock:
+            self.entries[key] = value
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+
+class Interner:
+    """
+    Bounded table of shared strings, so equal identifiers and keywords seen
+    across many queries are kept once. When the table is full it is cleared,
+    and the strings still in use are soon added back.
+    """
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self.strings: dict[str, str] = {}
+
+    def intern(self, text: str) -> str:
+        shared = self.strings.get(text)
+        if shared is not None:
+            return shared
+        if self.max_size <= 0:
+            return text
+        if len(self.strings) >= self.max_size:
+            self.strings.clear()
+        self.strings[text] = text
+        return text
+
+    def __len__(self) -> int:
+        return len(self.strings)
+
+
+class SqliteCache:
+    """
+    Bounded cache in a SQLite file, so separate processes on one machine can
+    share entries. Keys and values must be JSON serializable, and tuples come
+    back as lists. Entries are scoped to a `namespace`, such as a grammar
+    hash, so a file left over from another version is never read. Once full,
+    the oldest entries are evicted first, whatever their namespace. Eviction
+    runs once every `max_size / 10` inserts rather than on every insert, so
+    the file may briefly hold that many entries over `max_size`.
+    """
+
+    def __init__(self, path: str, max_size: int, namespace: str = ""):
+        self.path = path
+        self.max_size = max_size
+        self.namespace = namespace
+        self.eviction_chunk = max(max_size // 10, 1)
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(
+            path, check_same_thread=False, isolation_level=None
+        )
+        self.connection.execute("PRAGMA busy_timeout = 5000;")
+        self.connection.execute("PRAGMA journal_mode = WAL;")
+        # Losing the last few entries in a power cut is fine for a cache.
+        self.connection.execute("PRAGMA synchronous = NORMAL;")
+        self.connection.execute("""
+            CREATE TABLE IF NOT EXISTS cache_entries(
+                namespace text,
+                key text,
+                value text,
+                PRIMARY KEY (namespace, key)
+            );
+        """)
+
+    def get(self, key: Hashable) -> Any | None:
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT value FROM cache_entries WHERE namespace = ? AND key = ?;",
+                (self.namespace, json.dumps(key)),
+            ).fetchone()
+        if row is None:
+            return None
+        return json.loads(row[0])
+
+    def put(self, key: Hashable, value: Any):
+        if self.max_size <= 0:
+            return
+        with self.lock:
+            cursor = self.connection.execute(
+                "INSERT OR REPLACE INTO cache_entries VALUES (?, ?, ?);",
+                (self.namespace, json.dumps(key), json.dumps(value)),
+            )
+            # Rowids count inserts across every process sharing the file, so
+            # one process evicts per chunk, and only rows older than the
+            # newest `max_size` are read.
+            rowid = cursor.lastrowid
+            if rowid > self.max_size and rowid % self.eviction_chunk == 0:
+                self.connection.execute(
+                    "DELETE FROM cache_entries WHERE rowid <= ?;",
+                    (rowid - self.max_size,),
+                )
+
+    def clear(self):
+        with self.lock:
+            self.connection.execute(
+                "DELETE FROM cache_entries WHERE namespace = ?;",
+                (self.namespace,),
+            )
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
+
+    def __len__(self) -> int:
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT count(*) FROM cache_entries WHERE namespace = ?;",
+                (self.namespace,),
+            ).fetchone()
+        return row[0]
@@ -0,0 +1,69 @@
+from zql.cache import Interner, LruCache, SqliteCache
+
+
+def test_lru_cache_evicts_least_recently_used():
+    cache = LruCache(2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    cache.get("a")
+    cache.put("c", 3)
+    assert cache.get("a") == 1
+    assert cache.get("b") is None
+    assert cache.get("c") == 3
+    assert len(cache) == 2
+
+
+def test_lru_cache_disabled_at_zero_size():
+    cache = LruCache(0)
+    cache.put("a", 1)
+    assert cache.get("a") is None
+
+
+def test_sqlite_cache_shares_entries_between_instances(tmp_path):
+    path = str(tmp_path / "cache.db")
+    writer = SqliteCache(path, 10, namespace="v1")
+    reader = SqliteCache(path, 10, namespace="v1")
+    writer.put(("a", 1), {"sql": "SELECT 1"})
+    assert reader.get(("a", 1)) == {"sql": "SELECT 1"}
+    assert SqliteCache(path, 10, namespace="v2").get(("a", 1)) is None
+
+
+def test_sqlite_cache_evicts_oldest(tmp_path):
+    cache = SqliteCache(str(tmp_path / "cache.db"), 2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    cache.put("c", 3)
+    assert cache.get("a") is None
+    assert cache.get("b") == 2
+    assert cache.get("c") == 3
+    assert len(cache) == 2
+
+
+def test_sqlite_cache_evicts_in_chunks(tmp_path):
+    cache = SqliteCache(str(tmp_path / "cache.db"), 100)
+    for i in range(1000):
+        cache.put(i, i)
+        assert len(cache) < 100 + cache.eviction_chunk
+    assert cache.get(0) is None
+    assert cache.get(999) == 999
+
+
+def test_interner_shares_equal_strings():
+    interner = Interner(10)
+    first = interner.intern("".join(["user", "_id"]))
+    second = interner.intern("".join(["user", "_id"]))
+    assert first is second
+
+
+def test_interner_clears_when_full():
+    interner = Interner(2)
+    interner.intern("a")
+    interner.intern("b")
+    interner.intern("c")
+    assert len(interner) == 1
+
+
+def test_interner_disabled_at_zero_size():
+    interner = Interner(0)
+    interner.intern("a")
+    assert len(interner) == 0
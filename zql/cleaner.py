@@ -1,5 +1,10 @@
 
+import os
 import re
+from array import array
+from typing import Iterable, Iterator
+
+from zql.cache import Interner
 
 
 SPACE = " "
@@ -10,6 +15,12 @@ NEWLINE = "\n"
 WHITESPACE_REGEX = re.compile(r"\s+")
 NEED_SPACE_AROUND_CHARS = [",", ".", "(", ")", "+", "-", "*", "/", "="]
 QUOTES = {"\"", "'"}
+TERMINAL_TOKENS = ["no", "cap"]
+WORD_TOKEN = 0
+SYMBOL_TOKEN = 1
+QUOTED_TOKEN = 2
+INTERN_SIZE = int(os.environ.get("ZQL_INTERN_SIZE", "65536"))
+TOKEN_INTERNER = Interner(INTERN_SIZE)
 
 
 def get_tokens(source: str) -> list[str]:
@@ -55,87 +66,197 @@ def is_end_of_multi_line_comment_at(i: int, chars: list[str]) -> bool:
     )
 
 
-def get_tokens_string_safe(source: str) -> list[str]:
+class TokenSpans:
     """
-    Converts a raw source string to a list of tokens.
-    - Strips whitespace from either side.
-    - Ensures that non-whitespace separating characters become single tokens.
-    - Creates a single token for a quoted string, even if contains whitespace or
-      separating characters.
-    - Ignores comments.
-    - Ignores other extra whitespace or line breaks in the query.
+    Tokens of a source string, kept as `(kind, start, end)` offsets into the
+    source in one flat `array('I')` instead of as separate strings. A token's
+    text is only sliced from the source when it is asked for, then reused.
+    Keywords and identifiers go through `interner`, so queries share one
+    copy of each. Numbers are left out, since they rarely repeat.
+    """
+
+    __slots__ = ("source", "spans", "texts", "folded", "interner")
+
+    def __init__(self, source: str, interner: Interner = TOKEN_INTERNER):
+        self.source = source
+        self.spans = array("I")
+        self.texts: dict[int, str] = {}
+        self.interner = interner
+        # Offsets only line up with the casefolded source if no character
+        # folds to several, which holds for almost every query.
+        folded = source.casefold()
+        self.folded = folded if len(folded) == len(source) else None
+
+    def append(self, kind: int, start: int, end: int):
+        self.spans.extend((kind, start, end))
+
+    def kind(self, i: int) -> int:
+        return self.spans[3 * i]
+
+    def start(self, i: int) -> int:
+        return self.spans[3 * i + 1]
+
+    def end(self, i: int) -> int:
+        return self.spans[3 * i + 2]
+
+    def text(self, i: int) -> str:
+        text = self.texts.get(i)
+        if text is None:
+            text = self.source[self.start(i):self.end(i)]
+            if self.kind(i) == WORD_TOKEN and not text[0].isdigit():
+                text = self.interner.intern(text)
+            self.texts[i] = text
+        return text
+
+    def matches(self, i: int, word: str) -> bool:
+        """Checks if token `i` equals a casefolded `word`, ignoring case."""
+        if self.folded is None:
+            return self.text(i).casefold() == word
+        start = self.start(i)
+        return (
+            self.end(i) - start == len(word)
+            and self.folded.startswith(word, start)
+        )
+
+    def __len__(self) -> int:
+        return len(self.spans) // 3
+
+    def __getitem__(self, i: int) -> str:
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError("Token index out of range.")
+        return self.text(i)
+
+
+def get_token_spans(
+    source: str,
+    interner: Interner = TOKEN_INTERNER
+) -> TokenSpans:
     """
-    chars: str = source.strip()
-    # Scan characters to accumulate tokens
-    tokens: list[str] = []
-    token_chars: list[str] = []
+    Scans a raw source string into token spans, by the same rules as
+    `get_tokens_string_safe`. A comment also ends the token before it.
+    """
+    spans = TokenSpans(source, interner)
+    start: int | None = None
     open_quote: str | None = None
     ignore_next: bool = False
     is_single_line_comment: bool = False
     is_multi_line_comment: bool = False
-    for i, c in enumerate(chars):
+    for i, c in enumerate(source):
         if ignore_next:
             ignore_next = False
-            pass
         elif is_single_line_comment:
             if c == NEWLINE:
                 # Found end of single line comment
                 is_single_line_comment = False
-            else:
-                # Found char in single line comment
-                pass
         elif is_multi_line_comment:
-            if is_end_of_multi_line_comment_at(i, chars):
+            if is_end_of_multi_line_comment_at(i, source):
                 # Found end of multi line comment
                 is_multi_line_comment = False
                 ignore_next = True
-            else:
-                # Found char in multi line comment
-                pass
         elif open_quote is not None:
             if c == open_quote:
                 # Found close quote
-                token_chars.append(c)
-                token = "".join(token_chars)
-                tokens.append(token)
-                token_chars = []
+                spans.append(QUOTED_TOKEN, start, i + 1)
+                start = None
                 open_quote = None
-            else:
-                # Found char in quoted string
-                token_chars.append(c)
-        elif WHITESPACE_REGEX.match(c):
+        elif c.isspace():
             # Found non-quoted whitespace
-            if token_chars:
-                token = "".join(token_chars)
-                tokens.append(token)
-                token_chars = []
-        elif is_single_line_comment_at(i, chars):
+            if start is not None:
+                spans.append(WORD_TOKEN, start, i)
+                start = None
+        elif is_single_line_comment_at(i, source):
             # Found start of single line comment
+            if start is not None:
+                spans.append(WORD_TOKEN, start, i)
+                start = None
             is_single_line_comment = True
-        elif is_multi_line_comment_at(i, chars):
+        elif is_multi_line_comment_at(i, source):
             # Found start of multi line comment
+            if start is not None:
+                spans.append(WORD_TOKEN, start, i)
+                start = None
             is_multi_line_comment = True
         elif c in NEED_SPACE_AROUND_CHARS:
             # Found character token
-            if token_chars:
-                token = "".join(token_chars)
-                tokens.append(token)
-                token_chars = []
-            tokens.append(c)
+            if start is not None:
+                spans.append(WORD_TOKEN, start, i)
+                start = None
+            spans.append(SYMBOL_TOKEN, i, i + 1)
         elif c in QUOTES:
             # Found open quote
-            if token_chars:
-                token = "".join(token_chars)
-                tokens.append(token)
-                token_chars = []
+            if start is not None:
+                spans.append(WORD_TOKEN, start, i)
+            start = i
             open_quote = c
-            token_chars.append(c)
-        else:
-            # Found other char
-            token_chars.append(c)
-    # Capture all remaining accumulated token chars into a token
-    if token_chars:
-        token = "".join(token_chars)
-        tokens.append(token)
-        token_chars = []
-    return tokens
+        elif start is None:
+            # Found first char of a token
+            start = i
+    # Capture the remaining token, which may be an unclosed quoted string
+    if start is not None:
+        kind = WORD_TOKEN if open_quote is None else QUOTED_TOKEN
+        spans.append(kind, start, len(source))
+    return spans
+
+
+def get_tokens_string_safe(
+    source: str,
+    interner: Interner = TOKEN_INTERNER
+) -> list[str]:
+    """
+    Converts a raw source string to a list of tokens.
+    - Strips whitespace from either side.
+    - Ensures that non-whitespace separating characters become single tokens.
+    - Creates a single token for a quoted string, even if contains whitespace or
+      separating characters.
+    - Ignores comments.
+    - Ignores other extra whitespace or line breaks in the query.
+    """
+    spans = get_token_spans(source, interner)
+    return [spans.text(i) for i in range(len(spans))]
+
+
+def split_statements(source: str) -> list[str]:
+    """
+    Splits a script into one source string per statement.
+    - A statement ends after the `no cap` terminal, matched case insensitively.
+    - Quoted strings and comments never end a statement.
+    - Tokens after the last terminal form a final, unterminated statement.
+    """
+    return list(iter_statements([source]))
+
+
+def iter_statements(chunks: Iterable[str]) -> Iterator[str]:
+    """
+    Splits a script read in chunks, such as the lines of a file, by the same
+    rules as `split_statements`, yielding each statement as soon as the chunk
+    with its terminal is read. Text after the last terminal is kept for the
+    next chunk, and only scanned again once a chunk could end a terminal.
+    """
+    buffer = ""
+    for chunk in chunks:
+        scanned = len(buffer)
+        buffer += chunk
+        # `cap` may start in the last two characters of the previous chunk.
+        if TERMINAL_TOKENS[1] not in buffer[max(scanned - 2, 0):].casefold():
+            continue
+        spans = get_token_spans(buffer)
+        start = 0
+        end = 0
+        for i in range(1, len(spans)):
+            if spans.end(i) == len(buffer):
+                # The last word may go on in the next chunk.
+                break
+            is_terminal = (
+                spans.text(i - 1).casefold() == TERMINAL_TOKENS[0]
+                and spans.text(i).casefold() == TERMINAL_TOKENS[1]
+            )
+            if is_terminal:
+                yield SPACE.join(spans.text(j) for j in range(start, i + 1))
+                start = i + 1
+                end = spans.end(i)
+        buffer = buffer[end:]
+    tokens = get_tokens_string_safe(buffer)
+    if tokens:
+        yield SPACE.join(tokens)
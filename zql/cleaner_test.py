@@ -1,4 +1,13 @@
-from zql.cleaner import get_tokens, get_tokens_string_safe
+from zql.cleaner import (
+    QUOTED_TOKEN,
+    SYMBOL_TOKEN,
+    WORD_TOKEN,
+    get_token_spans,
+    get_tokens,
+    get_tokens_string_safe,
+    iter_statements,
+    split_statements,
+)
 
 
 def test_get_tokens():
@@ -93,3 +102,79 @@ def test_get_tokens_string_safe_quote_in_word():
     actual = get_tokens_string_safe(source)
     expected = ["it", "'s me"]
     assert actual == expected
+
+
+def test_split_statements():
+    source = """
+    -- no cap in a comment
+    pushin p into t ('no cap') no cap
+    its giving a
+    yass t NO CAP
+    its giving 1
+    """
+    actual = split_statements(source)
+    expected = [
+        "pushin p into t ( 'no cap' ) no cap",
+        "its giving a yass t NO CAP",
+        "its giving 1",
+    ]
+    assert actual == expected
+
+
+def test_iter_statements_matches_split_statements_across_chunks():
+    source = """
+    /* no
+    cap */ pushin p into t ('no
+    cap') no cap its giving a yass t NO CAP
+    its giving capybara
+    """
+    expected = split_statements(source)
+    for size in range(1, 8):
+        chunks = [source[i:i + size] for i in range(0, len(source), size)]
+        assert list(iter_statements(chunks)) == expected
+
+
+def test_iter_statements_yields_before_reading_on():
+    def lines():
+        yield "its giving a no cap\n"
+        raise AssertionError("Read past the first statement.")
+
+    statements = iter_statements(lines())
+    assert next(statements) == "its giving a no cap"
+
+
+def test_get_token_spans_offsets_and_kinds():
+    source = "  get 'red hot' -- note\n from(x)"
+    spans = get_token_spans(source)
+    actual = [
+        (spans.kind(i), source[spans.start(i):spans.end(i)])
+        for i in range(len(spans))
+    ]
+    assert actual == [
+        (WORD_TOKEN, "get"),
+        (QUOTED_TOKEN, "'red hot'"),
+        (WORD_TOKEN, "from"),
+        (SYMBOL_TOKEN, "("),
+        (WORD_TOKEN, "x"),
+        (SYMBOL_TOKEN, ")"),
+    ]
+
+
+def test_get_token_spans_materializes_text_lazily():
+    spans = get_token_spans("its giving x")
+    assert spans.texts == {}
+    assert spans[1] == "giving"
+    assert spans.texts == {1: "giving"}
+    assert spans.matches(0, "its")
+    assert spans.texts == {1: "giving"}
+
+
+def test_get_token_spans_matches_ignoring_case():
+    spans = get_token_spans("ITS Giving")
+    assert spans.matches(0, "its")
+    assert spans.matches(1, "giving")
+    assert not spans.matches(1, "give")
+
+
+def test_get_token_spans_comment_ends_token():
+    assert get_tokens_string_safe("ab--c\nd") == ["ab", "d"]
@@ -0,0 +1,388 @@
+import argparse
+import glob
+import hashlib
+import io
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterable, Iterator, TextIO
+
+from zql.cleaner import iter_statements
+from zql.main import ZQL_GRAMMAR_HASH, Zql, ZqlParserError
+from zql.renderer import PRETTY_MODE, RENDER_MODES
+
+
+ZQL_EXTENSION = ".zql"
+SQL_EXTENSION = ".sql"
+STDIN_PATH = "-"
+CACHE_FILE_NAME = ".zql-cache.json"
+STAGES = ["read", "split", "parse", "render", "write"]
+
+
+Stats = dict
+FileCache = dict[str, dict]
+
+
+def new_stats() -> Stats:
+    stats: Stats = {
+        "files": 0,
+        "skipped": 0,
+        "statements": 0,
+        "errors": 0,
+        "bytes": 0,
+    }
+    for stage in STAGES:
+        stats[f"{stage}_seconds"] = 0.0
+    return stats
+
+
+def add_stats(total: Stats, stats: Stats):
+    for key, value in stats.items():
+        if key in total:
+            total[key] += value
+
+
+def find_inputs(patterns: list[str]) -> list[str]:
+    """
+    Expands files, directories and glob patterns to a sorted list of files.
+    Directories contribute every `.zql` file beneath them. `-` is stdin.
+    """
+    paths: list[str] = []
+    for pattern in patterns:
+        if pattern == STDIN_PATH:
+            matches = [STDIN_PATH]
+        elif os.path.isdir(pattern):
+            nested = os.path.join(pattern, "**", f"*{ZQL_EXTENSION}")
+            matches = sorted(glob.glob(nested, recursive=True))
+        elif glob.has_magic(pattern):
+            matches = sorted(glob.glob(pattern, recursive=True))
+        else:
+            matches = [pattern]
+        for path in matches:
+            if path not in paths:
+                paths.append(path)
+    return paths
+
+
+def get_output_path(path: str, out_dir: str) -> str:
+    """
+    Mirrors an input path below `out_dir` with a `.sql` extension. Inputs
+    outside the working directory are written by file name.
+    """
+    relative = os.path.relpath(path)
+    if relative.startswith(os.pardir):
+        relative = os.path.basename(path)
+    return os.path.join(out_dir, os.path.splitext(relative)[0] + SQL_EXTENSION)
+
+
+def get_file_hash(content: str) -> str:
+    return hashlib.sha256(content.encode()).hexdigest()
+
+
+def load_file_cache(path: str) -> FileCache:
+    try:
+        with open(path, "r") as file:
+            cache = json.load(file)
+    except (OSError, ValueError):
+        return {}
+    return cache if isinstance(cache, dict) else {}
+
+
+def save_file_cache(path: str, cache: FileCache):
+    # Write then rename, so an interrupted run never leaves a broken file.
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "w") as file:
+        json.dump(cache, file)
+    os.replace(temp_path, path)
+
+
+def get_cache_entry(path: str, mode: str) -> dict:
+    stat = os.stat(path)
+    return {
+        "mtime_ns": stat.st_mtime_ns,
+        "size": stat.st_size,
+        "grammar": ZQL_GRAMMAR_HASH,
+        "mode": mode,
+    }
+
+
+def is_unchanged(
+    path: str,
+    out_path: str,
+    entry: dict,
+    cached: dict | None
+) -> bool:
+    """
+    Checks a file against its entry from the last run. A changed mtime alone
+    falls back to comparing content hashes, so touched files are skipped too.
+    """
+    if cached is None or not os.path.exists(out_path):
+        return False
+    if any(cached.get(k) != v for k, v in entry.items() if k != "mtime_ns"):
+        return False
+    if cached.get("mtime_ns") == entry["mtime_ns"]:
+        return True
+    with open(path, "r") as file:
+        return cached.get("hash") == get_file_hash(file.read())
+
+
+def read_chunks(chunks: Iterable[str], stats: Stats) -> Iterator[str]:
+    """Passes chunks through, counting their size and the time to read them."""
+    iterator = iter(chunks)
+    while True:
+        start = time.perf_counter()
+        chunk = next(iterator, None)
+        stats["read_seconds"] += time.perf_counter() - start
+        if chunk is None:
+            return
+        stats["bytes"] += len(chunk)
+        yield chunk
+
+
+def hash_chunks(chunks: Iterable[str], digest) -> Iterator[str]:
+    """Passes chunks through, adding them to a `hashlib` digest."""
+    for chunk in chunks:
+        digest.update(chunk.encode())
+        yield chunk
+
+
+def transpile_source(
+    source: str | Iterable[str],
+    writer: TextIO,
+    mode: str = PRETTY_MODE,
+    name: str = STDIN_PATH,
+    errors: TextIO = sys.stderr
+) -> Stats:
+    """
+    Transpiles a script statement by statement, writing and flushing the SQL
+    of each one before reading the next. `source` is a string, or chunks such
+    as the lines of an open file, which are read as the script goes, so the
+    output of a long file or pipe starts right away. Errors are reported to
+    `errors` by statement number, and do not stop the run.
+    """
+    zql = Zql()
+    stats = new_stats()
+    chunks = [source] if isinstance(source, str) else source
+    statements = iter_statements(read_chunks(chunks, stats))
+
+    n = 0
+    while True:
+        start = time.perf_counter()
+        read_seconds = stats["read_seconds"]
+        statement = next(statements, None)
+        elapsed = time.perf_counter() - start
+        stats["split_seconds"] += elapsed - (stats["read_seconds"] - read_seconds)
+        if statement is None:
+            break
+
+        n += 1
+        stats["statements"] += 1
+        try:
+            start = time.perf_counter()
+            ast = zql.parse_tree(statement)
+            stats["parse_seconds"] += time.perf_counter() - start
+
+            start = time.perf_counter()
+            sql = zql.render(ast, mode)
+            stats["render_seconds"] += time.perf_counter() - start
+        except ZqlParserError as zpe:
+            stats["errors"] += 1
+            errors.write(f"{name}: statement {n}: {zpe}\n")
+            continue
+
+        start = time.perf_counter()
+        writer.write(sql)
+        writer.write("\n")
+        writer.flush()
+        stats["write_seconds"] += time.perf_counter() - start
+    return stats
+
+
+def transpile_file_to(
+    path: str,
+    writer: TextIO,
+    mode: str = PRETTY_MODE,
+    errors: TextIO = sys.stderr
+) -> Stats:
+    digest = hashlib.sha256()
+    with open(path, "r") as file:
+        chunks = hash_chunks(file, digest)
+        stats = transpile_source(chunks, writer, mode, path, errors)
+    stats["files"] = 1
+    stats["hash"] = digest.hexdigest()
+    return stats
+
+
+def transpile_file(
+    path: str,
+    out_path: str | None,
+    mode: str = PRETTY_MODE
+) -> tuple[Stats, str | None, str]:
+    """
+    Transpiles one file to `out_path`, or to a string when it is `None`.
+    Returns the stats, the SQL string if any, and errors to report. Runs in
+    worker processes, so it only takes and returns plain values.
+    """
+    errors = io.StringIO()
+    if out_path is None:
+        buffer = io.StringIO()
+        stats = transpile_file_to(path, buffer, mode, errors)
+        return stats, buffer.getvalue(), errors.getvalue()
+
+    os.makedirs(os.path.dirname(out_path) or ".", exist_ok=True)
+    with open(out_path, "w") as file:
+        stats = transpile_file_to(path, file, mode, errors)
+    return stats, None, errors.getvalue()
+
+
+def format_stats(stats: Stats, elapsed: float) -> str:
+    statements_per_second = stats["statements"] / max(elapsed, 1e-9)
+    megabytes_per_second = stats["bytes"] / 2**20 / max(elapsed, 1e-9)
+    lines = [
+        f"files: {stats['files']} transpiled, {stats['skipped']} unchanged",
+        f"statements: {stats['statements']} ({stats['errors']} errors)",
+        f"elapsed: {elapsed:.3f}s",
+        (
+            f"throughput: {statements_per_second:.1f} statements/s, "
+            f"{megabytes_per_second:.2f} MiB/s"
+        ),
+    ]
+    # With several jobs, stage times add up across processes.
+    for stage in STAGES:
+        lines.append(f"{stage}: {stats[f'{stage}_seconds']:.3f}s")
+    return "\n".join(lines)
+
+
+def run(
+    paths: list[str],
+    out_dir: str | None,
+    mode: str,
+    jobs: int,
+    use_cache: bool,
+    stdout: TextIO,
+    stderr: TextIO
+) -> Stats:
+    """
+    Transpiles every input, in order. With `out_dir`, each file is written to
+    its own `.sql` file and files unchanged since the last run are skipped.
+    Otherwise all SQL goes to `stdout`.
+    """
+    total = new_stats()
+    if STDIN_PATH in paths:
+        stats = transpile_source(sys.stdin, stdout, mode, errors=stderr)
+        add_stats(total, stats)
+        paths = [path for path in paths if path != STDIN_PATH]
+
+    cache_path = None
+    cache: FileCache = {}
+    if out_dir is not None and use_cache:
+        cache_path = os.path.join(out_dir, CACHE_FILE_NAME)
+        cache = load_file_cache(cache_path)
+
+    jobs_to_run: list[tuple[str, str | None, dict]] = []
+    for path in paths:
+        out_path = None
+        entry: dict = {}
+        if out_dir is not None:
+            out_path = get_output_path(path, out_dir)
+            entry = get_cache_entry(path, mode)
+            cached = cache.get(os.path.abspath(path))
+            if use_cache and is_unchanged(path, out_path, entry, cached):
+                total["skipped"] += 1
+                continue
+        jobs_to_run.append((path, out_path, entry))
+
+    def record(job: tuple, result: tuple):
+        path, _, entry = job
+        stats, sql, errors = result
+        if sql:
+            stdout.write(sql)
+            stdout.flush()
+        if errors:
+            stderr.write(errors)
+        if out_dir is not None and not stats["errors"]:
+            cache[os.path.abspath(path)] = {**entry, "hash": stats["hash"]}
+        add_stats(total, stats)
+
+    if jobs > 1 and len(jobs_to_run) > 1:
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            results = executor.map(
+                transpile_file,
+                [path for path, _, _ in jobs_to_run],
+                [out_path for _, out_path, _ in jobs_to_run],
+                [mode] * len(jobs_to_run),
+            )
+            for job, result in zip(jobs_to_run, results):
+                record(job, result)
+    else:
+        for job in jobs_to_run:
+            path, out_path, _ = job
+            if out_path is None:
+                # Stream straight to stdout rather than through a buffer.
+                stats = transpile_file_to(path, stdout, mode, stderr)
+                record(job, (stats, None, ""))
+            else:
+                record(job, transpile_file(path, out_path, mode))
+
+    if cache_path is not None:
+        save_file_cache(cache_path, cache)
+    return total
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m zql",
+        description="Transpile ZQL files, globs or stdin to SQL.",
+    )
+    parser.add_argument(
+        "inputs",
+        nargs="*",
+        default=[STDIN_PATH],
+        help="Files, directories of .zql files, or globs. `-` reads stdin.",
+    )
+    parser.add_argument(
+        "-o",
+        "--out-dir",
+        help="Write one .sql file per input here, instead of to stdout.",
+    )
+    parser.add_argument("--mode", choices=sorted(RENDER_MODES), default=PRETTY_MODE)
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=1,
+        help="Transpile files in this many processes.",
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Transpile every file, even if unchanged since the last run.",
+    )
+    parser.add_argument(
+        "--stats",
+        action="store_true",
+        help="Print throughput and time per stage to stderr.",
+    )
+    args = parser.parse_args(argv)
+
+    paths = find_inputs(args.inputs)
+    missing = [p for p in paths if p != STDIN_PATH and not os.path.isfile(p)]
+    if missing:
+        parser.error(f"No such file: {', '.join(missing)}")
+
+    start = time.perf_counter()
+    total = run(
+        paths,
+        args.out_dir,
+        args.mode,
+        args.jobs,
+        not args.no_cache,
+        sys.stdout,
+        sys.stderr,
+    )
+    elapsed = time.perf_counter() - start
+    if args.stats:
+        print(format_stats(total, elapsed), file=sys.stderr)
+    return 1 if total["errors"] else 0
@@ -0,0 +1,123 @@
+import io
+import os
+import subprocess
+import sys
+
+from zql.cli import find_inputs, main, transpile_source
+
+
+SCRIPT = "its giving a yass b no cap\n\nits giving c yass d no cap\n"
+
+
+def write_file(path, content: str) -> str:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(content)
+    return str(path)
+
+
+class FlushCounter(io.StringIO):
+    def __init__(self):
+        super().__init__()
+        self.flushes = []
+
+    def flush(self):
+        self.flushes.append(self.getvalue())
+
+
+def test_transpile_source_streams_each_statement():
+    writer = FlushCounter()
+    stats = transpile_source(SCRIPT, writer, "compact")
+    assert writer.flushes == [
+        "SELECT a FROM b ;\n",
+        "SELECT a FROM b ;\nSELECT c FROM d ;\n",
+    ]
+    assert stats["statements"] == 2
+    assert stats["errors"] == 0
+
+
+def test_transpile_source_writes_before_reading_on():
+    writer = io.StringIO()
+
+    def lines():
+        yield "its giving a\n"
+        yield "yass b no cap\n"
+        assert writer.getvalue() == "SELECT a FROM b ;\n"
+        yield "its giving c yass d no cap\n"
+
+    stats = transpile_source(lines(), writer, "compact")
+    assert stats["statements"] == 2
+    assert stats["bytes"] == 54
+
+
+def test_transpile_source_reports_errors_and_continues():
+    writer, errors = io.StringIO(), io.StringIO()
+    stats = transpile_source(
+        "its giving no cap its giving x no cap", writer, "compact", "s", errors
+    )
+    assert writer.getvalue() == "SELECT x ;\n"
+    assert errors.getvalue().startswith("s: statement 1:")
+    assert stats["errors"] == 1
+
+
+def test_find_inputs_expands_directories_and_globs(tmp_path):
+    first = write_file(tmp_path / "a.zql", SCRIPT)
+    second = write_file(tmp_path / "nested" / "b.zql", SCRIPT)
+    write_file(tmp_path / "notes.txt", "")
+    assert find_inputs([str(tmp_path)]) == [first, second]
+    assert find_inputs([str(tmp_path / "*.zql"), first]) == [first]
+
+
+def test_main_writes_stdout(tmp_path, capsys):
+    path = write_file(tmp_path / "a.zql", SCRIPT)
+    assert main([path, "--mode", "compact"]) == 0
+    assert capsys.readouterr().out == "SELECT a FROM b ;\nSELECT c FROM d ;\n"
+
+
+def test_main_skips_unchanged_files(tmp_path, capsys):
+    path = write_file(tmp_path / "queries" / "a.zql", SCRIPT)
+    out_dir = str(tmp_path / "out")
+    assert main([path, "-o", out_dir, "--stats"]) == 0
+    assert "1 transpiled, 0 unchanged" in capsys.readouterr().err
+
+    # Touching a file without changing it still skips it.
+    os.utime(path, ns=(0, 0))
+    assert main([path, "-o", out_dir, "--stats"]) == 0
+    assert "0 transpiled, 1 unchanged" in capsys.readouterr().err
+
+    write_file(tmp_path / "queries" / "a.zql", "its giving e no cap")
+    assert main([path, "-o", out_dir, "--stats", "--mode", "compact"]) == 0
+    assert "1 transpiled, 0 unchanged" in capsys.readouterr().err
+    [sql_path] = [
+        os.path.join(root, name)
+        for root, _, names in os.walk(out_dir)
+        for name in names
+        if name.endswith(".sql")
+    ]
+    with open(sql_path, "r") as file:
+        assert file.read() == "SELECT e ;\n"
+
+
+def test_main_runs_jobs_in_order(tmp_path, capsys):
+    paths = [
+        write_file(tmp_path / f"{n}.zql", f"its giving c{n} no cap")
+        for n in range(3)
+    ]
+    assert main([*paths, "--jobs", "2", "--mode", "compact"]) == 0
+    assert capsys.readouterr().out == (
+        "SELECT c0 ;\nSELECT c1 ;\nSELECT c2 ;\n"
+    )
+
+
+def test_module_runs_outside_the_repo(tmp_path):
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = {**os.environ, "PYTHONPATH": root}
+    result = subprocess.run(
+        [sys.executable, "-m", "zql", "--mode", "compact"],
+        input="its giving 1 no cap",
+        capture_output=True,
+        text=True,
+        cwd=tmp_path,
+        env=env,
+    )
+    assert result.stderr == ""
+    assert result.stdout == "SELECT 1 ;\n"
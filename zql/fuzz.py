@@ -0,0 +1,295 @@
+import argparse
+import ast as python_ast
+import hashlib
+import os
+import random
+import re
+import sys
+import time
+from pathlib import Path
+
+from zql.cleaner import get_tokens_string_safe
+from zql.generator import TERMINAL_SAMPLERS, QueryGenerator
+from zql.grammar import Grammar, expand_rule
+from zql.main import ZQL_GRAMMAR
+from zql.parser import AstParseError, ParseBudget, parse_ast
+
+
+SPACE = " "
+TERMINAL = "no cap"
+TEST_CORPUS_PATH = Path(__file__).parent / "main_test.py"
+REGRESSION_CORPUS_PATH = Path(__file__).parent / "slow_queries"
+ATTEMPTS_HEADER_REGEX = re.compile(r"^-- attempts: (\d+)", re.M)
+SCORES = ["attempts", "time"]
+# Saved cases are measured with a much higher cap than the search uses.
+RECORD_ATTEMPTS_FACTOR = 100
+
+
+SearchResult = dict
+
+
+def get_test_corpus(path: str | Path = TEST_CORPUS_PATH) -> list[str]:
+    """Reads the ZQL string literals of a test module, to seed the search."""
+    with open(path, "r") as file:
+        tree = python_ast.parse(file.read())
+    queries = []
+    for node in python_ast.walk(tree):
+        is_string = isinstance(node, python_ast.Constant)
+        if not is_string or not isinstance(node.value, str):
+            continue
+        if TERMINAL in node.value.casefold():
+            queries.append(node.value.strip())
+    return queries
+
+
+def get_grammar_tokens(grammar: Grammar) -> list[str]:
+    """Lists every literal of the grammar, and samples for its regex nodes."""
+    tokens = []
+    rng = random.Random(0)
+    for node, rules in grammar.items():
+        for rule in rules:
+            for expanded in expand_rule(rule):
+                literal = expanded.get("literal")
+                if literal is not None and literal not in tokens:
+                    tokens.append(literal)
+        sampler = TERMINAL_SAMPLERS.get(node)
+        if sampler is not None:
+            tokens.append(sampler(rng))
+    return tokens
+
+
+def measure(
+    grammar: Grammar,
+    query: str,
+    max_attempts: int | None = None
+) -> SearchResult:
+    """
+    Parses a query and counts the work, as `{"query", "tokens", "attempts",
+    "seconds", "is_valid"}`. Queries that fail to parse count too, since
+    backtracking before a failure is often the slowest path.
+    """
+    budget = ParseBudget(max_attempts=max_attempts)
+    is_valid = False
+    start = time.perf_counter()
+    try:
+        parse_ast(grammar, query, budget=budget)
+        is_valid = True
+    except (AstParseError, RecursionError):
+        pass
+    seconds = time.perf_counter() - start
+    return {
+        "query": query,
+        "tokens": budget.tokens,
+        "attempts": budget.attempts,
+        "seconds": seconds,
+        "is_valid": is_valid,
+    }
+
+
+def get_score(result: SearchResult, score: str = "attempts") -> float:
+    """Rates parse work per token, so longer inputs do not win by length."""
+    work = result["seconds"] if score == "time" else result["attempts"]
+    return work / max(result["tokens"], 1)
+
+
+def mutate(
+    tokens: list[str],
+    rng: random.Random,
+    vocabulary: list[str],
+    donors: list[list[str]]
+) -> list[str]:
+    """Applies one random edit: delete, repeat, insert, replace, nest or splice."""
+    tokens = list(tokens)
+    if not tokens:
+        return [rng.choice(vocabulary)]
+    i = rng.randrange(len(tokens))
+    j = min(len(tokens), i + rng.randint(1, 4))
+    kind = rng.randrange(6)
+    if kind == 0 and len(tokens) > 1:
+        del tokens[i]
+    elif kind == 1:
+        tokens[j:j] = tokens[i:j]
+    elif kind == 2:
+        tokens.insert(i, rng.choice(vocabulary))
+    elif kind == 3:
+        tokens[i] = rng.choice(vocabulary)
+    elif kind == 4:
+        tokens[i:j] = ["(", *tokens[i:j], ")"]
+    else:
+        donor = rng.choice(donors)
+        start = rng.randrange(len(donor))
+        tokens[i:i] = donor[start:start + rng.randint(1, 6)]
+    return tokens
+
+
+def minimize(
+    grammar: Grammar,
+    result: SearchResult,
+    score: str = "attempts",
+    keep: float = 0.9,
+    max_attempts: int | None = None
+) -> SearchResult:
+    """
+    Removes chunks of tokens, halving the chunk size down to one token, as
+    long as the score stays above `keep` times the original score.
+    """
+    target = keep * get_score(result, score)
+    tokens = get_tokens_string_safe(result["query"])
+    best = result
+    size = max(len(tokens) // 2, 1)
+    while size >= 1:
+        i = 0
+        while i < len(tokens):
+            candidate = tokens[:i] + tokens[i + size:]
+            if not candidate:
+                break
+            measured = measure(grammar, SPACE.join(candidate), max_attempts)
+            if get_score(measured, score) >= target:
+                tokens, best = candidate, measured
+            else:
+                i += size
+        size //= 2
+    return best
+
+
+class WorstCaseSearch:
+    """
+    Searches for inputs that make the parser work hardest per token, by
+    mutating a population of the slowest inputs found so far. The population
+    starts from `seeds`, such as test queries and generated queries. Parses
+    are cut off after `max_attempts` rule attempts, which caps the score.
+    """
+
+    def __init__(
+        self,
+        grammar: Grammar,
+        seeds: list[str],
+        seed: int | None = None,
+        score: str = "attempts",
+        max_tokens: int = 80,
+        max_attempts: int = 50_000,
+        population_size: int = 20
+    ):
+        self.grammar = grammar
+        self.rng = random.Random(seed)
+        self.score = score
+        self.max_tokens = max_tokens
+        self.max_attempts = max_attempts
+        self.population_size = population_size
+        self.vocabulary = get_grammar_tokens(grammar)
+        self.donors = [get_tokens_string_safe(s) for s in seeds if s.strip()]
+        self.population: list[SearchResult] = []
+        for query in seeds:
+            self.add(measure(grammar, query, max_attempts))
+
+    def add(self, result: SearchResult):
+        queries = {r["query"] for r in self.population}
+        if result["query"] in queries:
+            return
+        self.population.append(result)
+        self.population.sort(key=lambda r: get_score(r, self.score), reverse=True)
+        del self.population[self.population_size:]
+
+    def step(self):
+        parent = self.rng.choice(self.population)
+        tokens = get_tokens_string_safe(parent["query"])
+        tokens = mutate(tokens, self.rng, self.vocabulary, self.donors)
+        tokens = tokens[:self.max_tokens]
+        query = SPACE.join(tokens)
+        self.add(measure(self.grammar, query, self.max_attempts))
+
+    def run(self, rounds: int) -> list[SearchResult]:
+        for _ in range(rounds):
+            self.step()
+        return self.population
+
+
+def write_regression_case(directory: str | Path, result: SearchResult) -> str:
+    """
+    Saves a slow query to the regression corpus, named by its hash, with its
+    rule attempts in a leading comment. Returns the path.
+    """
+    os.makedirs(directory, exist_ok=True)
+    digest = hashlib.sha256(result["query"].encode()).hexdigest()[:12]
+    path = os.path.join(directory, f"slow_{digest}.zql")
+    with open(path, "w") as file:
+        file.write(f"-- attempts: {result['attempts']}, ")
+        file.write(f"tokens: {result['tokens']}\n")
+        file.write(f"{result['query']}\n")
+    return path
+
+
+def read_regression_case(path: str) -> tuple[str, int]:
+    """Reads a saved query and the rule attempts it took when it was found."""
+    with open(path, "r") as file:
+        content = file.read()
+    match = ATTEMPTS_HEADER_REGEX.search(content)
+    attempts = int(match.group(1)) if match else 0
+    return content, attempts
+
+
+def get_seeds(count: int, seed: int | None) -> list[str]:
+    generator = QueryGenerator(ZQL_GRAMMAR, seed=seed, max_tokens=30)
+    return get_test_corpus() + generator.generate_many(count)
+
+
+def format_result(result: SearchResult, score: str) -> str:
+    return (
+        f"{get_score(result, score):10.2f} per token  "
+        f"{result['attempts']:8d} attempts  {result['tokens']:3d} tokens  "
+        f"{result['query'][:60]}"
+    )
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m zql.fuzz",
+        description=(
+            "Search for ZQL inputs that make the parser backtrack the most, "
+            "and save minimized slow cases to a regression corpus."
+        ),
+    )
+    parser.add_argument("--rounds", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--score", choices=SCORES, default="attempts")
+    parser.add_argument("--max-tokens", type=int, default=80)
+    parser.add_argument("--generated", type=int, default=50)
+    parser.add_argument("--top", type=int, default=3)
+    parser.add_argument(
+        "--corpus",
+        default=REGRESSION_CORPUS_PATH,
+        help="Directory to write minimized slow cases to.",
+    )
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="Print the slowest cases without writing them.",
+    )
+    args = parser.parse_args(argv)
+
+    search = WorstCaseSearch(
+        ZQL_GRAMMAR,
+        get_seeds(args.generated, args.seed),
+        seed=args.seed,
+        score=args.score,
+        max_tokens=args.max_tokens,
+    )
+    population = search.run(args.rounds)
+    record_attempts = search.max_attempts * RECORD_ATTEMPTS_FACTOR
+    written: set[str] = set()
+    for result in population[:args.top]:
+        minimized = minimize(
+            ZQL_GRAMMAR, result, args.score, max_attempts=search.max_attempts
+        )
+        if minimized["query"] in written:
+            continue
+        written.add(minimized["query"])
+        recorded = measure(ZQL_GRAMMAR, minimized["query"], record_attempts)
+        print(format_result(recorded, args.score))
+        if not args.dry_run:
+            print(f"  wrote {write_regression_case(args.corpus, recorded)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
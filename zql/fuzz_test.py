@@ -0,0 +1,78 @@
+import glob
+import os
+import random
+
+import pytest
+from zql.fuzz import (
+    REGRESSION_CORPUS_PATH,
+    WorstCaseSearch,
+    get_score,
+    get_test_corpus,
+    measure,
+    minimize,
+    mutate,
+    read_regression_case,
+    write_regression_case,
+)
+from zql.main import ZQL_GRAMMAR
+from zql.parser import AstParseError, ParseBudget, ParseLimitError, parse_ast
+
+
+REGRESSION_CASES = sorted(glob.glob(os.path.join(REGRESSION_CORPUS_PATH, "*.zql")))
+
+
+def test_test_corpus_reads_queries():
+    queries = get_test_corpus()
+    assert "its giving a, b\n    yass example\n    no cap" in queries
+
+
+def test_mutate_is_reproducible():
+    tokens = ["its giving", "a", "yass", "b", "no cap"]
+    vocabulary, donors = ["tfw", "("], [tokens]
+    first = [mutate(tokens, random.Random(n), vocabulary, donors) for n in range(20)]
+    second = [mutate(tokens, random.Random(n), vocabulary, donors) for n in range(20)]
+    assert first == second
+    assert any(mutated != tokens for mutated in first)
+
+
+def test_measure_counts_failed_parses():
+    result = measure(ZQL_GRAMMAR, "its giving count ( b ( b (")
+    assert not result["is_valid"]
+    assert result["tokens"] == 8
+    assert result["attempts"] > 100
+
+
+def test_minimize_drops_tokens_that_do_not_add_work():
+    padded = measure(ZQL_GRAMMAR, "its giving x , y , z , count ( b ( b ( b (")
+    minimized = minimize(ZQL_GRAMMAR, padded)
+    assert minimized["tokens"] < padded["tokens"]
+    assert get_score(minimized) >= 0.9 * get_score(padded)
+
+
+def test_search_finds_more_work_per_token():
+    seeds = ["its giving a yass b no cap", "its giving count ( a ) no cap"]
+    search = WorstCaseSearch(ZQL_GRAMMAR, seeds, seed=0, max_attempts=20_000)
+    start = get_score(search.population[0])
+    best = search.run(100)[0]
+    assert get_score(best) > start
+
+
+def test_regression_case_round_trip(tmp_path):
+    result = measure(ZQL_GRAMMAR, "its giving count ( b ( no cap")
+    path = write_regression_case(str(tmp_path), result)
+    content, attempts = read_regression_case(path)
+    assert attempts == result["attempts"]
+    assert measure(ZQL_GRAMMAR, content)["attempts"] == attempts
+
+
+@pytest.mark.parametrize("path", REGRESSION_CASES)
+def test_regression_case_does_not_get_slower(path):
+    content, attempts = read_regression_case(path)
+    budget = ParseBudget(max_attempts=int(attempts * 1.1))
+    try:
+        parse_ast(ZQL_GRAMMAR, content, budget=budget)
+    except ParseLimitError:
+        pytest.fail(f"{path} took over {budget.max_attempts} rule attempts.")
+    except AstParseError:
+        # Slow cases are often invalid, and only the work they take matters.
+        pass
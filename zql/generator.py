@@ -0,0 +1,310 @@
+import argparse
+import math
+import random
+import sys
+
+from zql.grammar import Grammar, expand_rule, get_rule_nodes
+from zql.main import ZQL_GRAMMAR
+from zql.parser import AstParseError, parse_ast
+from zql.statements import get_statement_kind
+
+
+SPACE = " "
+ROOT_NODE = "root"
+TERMINAL_NODE = "terminal"
+WORDS = [
+    "a", "b", "c", "name", "price", "total", "user_id", "created_at",
+    "peeps", "orders", "lower", "count", "x1", "t2",
+]
+QUOTED = ["'hi'", "'no cap fr'", "''", "\"Name\"", "\"a b\""]
+# Regex nodes cannot be generated from their pattern, so each gets a sampler.
+TERMINAL_SAMPLERS = {
+    "word": lambda rng: rng.choice(WORDS),
+    "non_keyword": lambda rng: rng.choice(WORDS),
+    "integer": lambda rng: str(rng.randint(0, 1000)),
+    "quoted_expr": lambda rng: rng.choice(QUOTED),
+    "star": lambda rng: "shee" + "e" * rng.randint(0, 3) + "sh",
+}
+STRESS_NODES = ["condition_list", "cte_list", "column_def_list"]
+
+
+class QueryGenerationError(Exception):
+    pass
+
+
+def get_min_tokens(grammar: Grammar) -> dict[str, float]:
+    """
+    Finds the fewest tokens each node can produce, to steer generation to the
+    cheapest alternatives once a depth or length limit is reached.
+    """
+    costs = {node: math.inf for node in grammar}
+    is_changed = True
+    while is_changed:
+        is_changed = False
+        for node, rules in grammar.items():
+            for rule in rules:
+                for expanded in expand_rule(rule):
+                    cost = get_rule_min_tokens(expanded, costs)
+                    if cost < costs[node]:
+                        costs[node] = cost
+                        is_changed = True
+    return costs
+
+
+def get_rule_min_tokens(rule: dict, costs: dict[str, float]) -> float:
+    if "literal" in rule:
+        return len(rule["literal"].split())
+    if "regex" in rule:
+        return 1
+    return sum(costs.get(child, math.inf) for child in rule["sequence"])
+
+
+def get_reachable_nodes(grammar: Grammar) -> dict[str, set[str]]:
+    """Maps each node to every node that can appear below it, itself included."""
+    children = {
+        node: {c for rule in rules for c in get_rule_nodes(rule)}
+        for node, rules in grammar.items()
+    }
+    reachable = {}
+    for node in grammar:
+        seen = {node}
+        stack = [node]
+        while stack:
+            for child in children.get(stack.pop(), set()):
+                if child not in seen:
+                    seen.add(child)
+                    stack.append(child)
+        reachable[node] = seen
+    return reachable
+
+
+def find_ending_nodes(grammar: Grammar, last: str) -> set[str]:
+    """Finds the nodes that have an alternative ending with the `last` node."""
+    ending = {last}
+    is_changed = True
+    while is_changed:
+        is_changed = False
+        for node, rules in grammar.items():
+            if node in ending:
+                continue
+            expanded = [r for rule in rules for r in expand_rule(rule)]
+            if any(r.get("sequence", [None])[-1] in ending for r in expanded):
+                ending.add(node)
+                is_changed = True
+    return ending
+
+
+class QueryGenerator:
+    """
+    Generates random queries by walking a grammar from `root`, reproducibly
+    for a given `seed`.
+    - `max_depth` bounds nesting, not counting a list rule repeating itself.
+    - `max_breadth` bounds how many times a list rule, such as
+      `select_expr_list`, repeats.
+    - `max_tokens` is a soft length limit: past it, every node takes its
+      shortest alternative.
+    - `stress` maps list nodes to an exact number of repeats, and steers every
+      query through them, to exercise one rule at scale. Items of a stressed
+      list take their shortest alternatives, so long lists stay valid.
+    - `is_terminated` makes every query end with `terminal`, and never use
+      it anywhere else, so generated queries can be joined into one script.
+    - `kinds` keeps only statements of those kinds, such as `QUERY_STMT` for
+      load that must not change a database.
+    Queries that the parser rejects, for example where an earlier alternative
+    shadows the one generated, are dropped and generated again.
+    """
+
+    def __init__(
+        self,
+        grammar: Grammar,
+        seed: int | None = None,
+        max_depth: int = 12,
+        max_breadth: int = 3,
+        max_tokens: int = 60,
+        stress: dict[str, int] | None = None,
+        is_terminated: bool = True,
+        max_tries: int = 100,
+        kinds: set[str] | None = None
+    ):
+        self.grammar = grammar
+        self.rng = random.Random(seed)
+        self.max_depth = max_depth
+        self.max_breadth = max_breadth
+        self.max_tokens = max_tokens
+        self.stress = stress or {}
+        self.max_tries = max_tries
+        self.kinds = kinds
+        self.min_tokens = get_min_tokens(grammar)
+        self.reachable = get_reachable_nodes(grammar)
+        self.rules = {
+            node: [r for rule in rules for r in expand_rule(rule)]
+            for node, rules in grammar.items()
+        }
+        self.terminated: set[str] = set()
+        if is_terminated and TERMINAL_NODE in grammar:
+            self.terminated = find_ending_nodes(grammar, TERMINAL_NODE)
+        for node in self.stress:
+            if node not in grammar:
+                raise QueryGenerationError(f"Unknown stress node: `{node}`.")
+        self.tokens: list[str] = []
+        self.unmet: set[str] = set()
+
+    def generate(self) -> str:
+        for _ in range(self.max_tries):
+            query = SPACE.join(self.generate_tokens())
+            try:
+                ast = parse_ast(self.grammar, query)
+            except (AstParseError, RecursionError):
+                continue
+            if self.kinds is not None and get_statement_kind(ast) not in self.kinds:
+                continue
+            return query
+        raise QueryGenerationError(
+            f"No valid query in {self.max_tries} tries."
+        )
+
+    def generate_many(self, count: int) -> list[str]:
+        return [self.generate() for _ in range(count)]
+
+    def generate_tokens(self) -> list[str]:
+        self.tokens = []
+        self.unmet = set(self.stress)
+        self.write_node(ROOT_NODE, 0, 0, False, True)
+        return self.tokens
+
+    def write_node(
+        self,
+        node: str,
+        depth: int,
+        repeats: int,
+        is_short: bool,
+        is_last: bool
+    ):
+        """
+        Writes the tokens of one node. `is_last` marks the nodes that end the
+        query, which must end with `terminal` when queries are terminated.
+        """
+        self.unmet.discard(node)
+        rule = self.choose_rule(node, depth, repeats, is_short, is_last)
+        if "literal" in rule:
+            self.tokens.append(rule["literal"])
+            return
+        if "regex" in rule:
+            sampler = TERMINAL_SAMPLERS.get(node)
+            if sampler is None:
+                raise QueryGenerationError(f"No sampler for regex `{node}`.")
+            self.tokens.append(sampler(self.rng))
+            return
+
+        is_short = is_short or node in self.stress
+        sequence = rule["sequence"]
+        for n, child in enumerate(sequence):
+            is_last_child = is_last and n == len(sequence) - 1
+            if child == node:
+                self.write_node(
+                    child, depth, repeats + 1, is_short, is_last_child
+                )
+            else:
+                self.write_node(child, depth + 1, 0, is_short, is_last_child)
+
+    def choose_rule(
+        self,
+        node: str,
+        depth: int,
+        repeats: int,
+        is_short: bool,
+        is_last: bool
+    ) -> dict:
+        rules = self.rules.get(node)
+        if not rules:
+            raise QueryGenerationError(f"Node `{node}` has no rules.")
+        if self.terminated and not is_last:
+            # A `terminal` inside a query would split it in a script.
+            rules = [r for r in rules if not self.has_terminal(r)] or rules
+        elif is_last and node in self.terminated and node != TERMINAL_NODE:
+            rules = [r for r in rules if self.is_terminated(r)]
+
+        repeating = [r for r in rules if node in r.get("sequence", [])]
+        ending = [r for r in rules if r not in repeating] or rules
+        if node in self.stress:
+            if repeats + 1 < self.stress[node]:
+                return self.rng.choice(repeating or rules)
+            return self.rng.choice(ending)
+
+        # Head for rules still to stress before anything else.
+        steering = [r for r in rules if self.is_steering(r)]
+        if steering:
+            rules = steering
+
+        if repeats + 1 >= self.max_breadth:
+            rules = [r for r in rules if r not in repeating] or rules
+
+        is_over = depth >= self.max_depth or len(self.tokens) >= self.max_tokens
+        if (is_short or is_over) and not steering:
+            cost = min(self.get_cost(r) for r in rules)
+            rules = [r for r in rules if self.get_cost(r) == cost]
+        return self.rng.choice(rules)
+
+    def is_terminated(self, rule: dict) -> bool:
+        sequence = rule.get("sequence")
+        return bool(sequence) and sequence[-1] in self.terminated
+
+    def has_terminal(self, rule: dict) -> bool:
+        return TERMINAL_NODE in rule.get("sequence", [])
+
+    def is_steering(self, rule: dict) -> bool:
+        return any(
+            self.unmet & self.reachable.get(child, set())
+            for child in rule.get("sequence", [])
+        )
+
+    def get_cost(self, rule: dict) -> float:
+        return get_rule_min_tokens(rule, self.min_tokens)
+
+
+def parse_stress(values: list[str]) -> dict[str, int]:
+    """Reads `node=count` pairs, such as `condition_list=50`."""
+    stress = {}
+    for value in values:
+        node, _, count = value.partition("=")
+        stress[node] = int(count or 1)
+    return stress
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m zql.generator",
+        description=(
+            "Generate random valid ZQL from the grammar, separated by blank "
+            "lines, for load tests and benchmarks."
+        ),
+    )
+    parser.add_argument("--count", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--max-depth", type=int, default=12)
+    parser.add_argument("--max-breadth", type=int, default=3)
+    parser.add_argument("--max-tokens", type=int, default=60)
+    parser.add_argument(
+        "--stress",
+        action="append",
+        default=[],
+        metavar="NODE=COUNT",
+        help=f"Repeat a list rule COUNT times, e.g. {STRESS_NODES[0]}=50.",
+    )
+    args = parser.parse_args(argv)
+
+    generator = QueryGenerator(
+        ZQL_GRAMMAR,
+        seed=args.seed,
+        max_depth=args.max_depth,
+        max_breadth=args.max_breadth,
+        max_tokens=args.max_tokens,
+        stress=parse_stress(args.stress),
+    )
+    for query in generator.generate_many(args.count):
+        print(query, end="\n\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,73 @@
+import pytest
+from zql.cleaner import split_statements
+from zql.generator import QueryGenerationError, QueryGenerator, main
+from zql.main import ZQL_GRAMMAR
+from zql.parser import parse_ast
+from zql.statements import QUERY_STMT, find_nodes, get_statement_kind
+
+
+def test_generator_is_reproducible_from_seed():
+    first = QueryGenerator(ZQL_GRAMMAR, seed=7).generate_many(10)
+    second = QueryGenerator(ZQL_GRAMMAR, seed=7).generate_many(10)
+    assert first == second
+    assert first != QueryGenerator(ZQL_GRAMMAR, seed=8).generate_many(10)
+
+
+def test_generated_queries_parse_and_end_with_terminal():
+    for query in QueryGenerator(ZQL_GRAMMAR, seed=1).generate_many(50):
+        parse_ast(ZQL_GRAMMAR, query)
+        assert query.endswith("no cap")
+
+
+def test_generated_queries_split_as_a_script():
+    queries = QueryGenerator(ZQL_GRAMMAR, seed=4).generate_many(100)
+    assert len(split_statements("\n\n".join(queries))) == 100
+
+
+def test_kinds_keeps_only_matching_statements():
+    generator = QueryGenerator(ZQL_GRAMMAR, seed=2, kinds={QUERY_STMT})
+    for query in generator.generate_many(20):
+        assert get_statement_kind(parse_ast(ZQL_GRAMMAR, query)) == QUERY_STMT
+
+
+def test_max_tokens_keeps_queries_short():
+    short = QueryGenerator(ZQL_GRAMMAR, seed=1, max_tokens=5, max_depth=40)
+    long = QueryGenerator(ZQL_GRAMMAR, seed=1, max_tokens=200, max_depth=40)
+    short_lengths = [len(q.split()) for q in short.generate_many(30)]
+    long_lengths = [len(q.split()) for q in long.generate_many(30)]
+    assert sum(short_lengths) < sum(long_lengths)
+
+
+@pytest.mark.parametrize(
+    "node,item",
+    [
+        ("cte_list", "aliased_cte"),
+        ("column_def_list", "column_def"),
+    ],
+)
+def test_stress_repeats_list_rule(node, item):
+    generator = QueryGenerator(ZQL_GRAMMAR, seed=3, stress={node: 25})
+    ast = parse_ast(ZQL_GRAMMAR, generator.generate())
+    [outer, *_] = find_nodes(ast, {node})
+    items = [n for n in find_nodes(outer, {node}) if n["children"][0]["type"] == item]
+    assert len(items) == 25
+
+
+def test_stress_repeats_condition_list():
+    generator = QueryGenerator(ZQL_GRAMMAR, seed=3, stress={"condition_list": 25})
+    tokens = generator.generate().split()
+    # The parser may read `a uh b` as one expression, so count the operators.
+    start = tokens.index("tfw")
+    operators = [t for t in tokens[start:] if t in {"fax", "uh"}]
+    assert len(operators) >= 24
+
+
+def test_stress_rejects_unknown_node():
+    with pytest.raises(QueryGenerationError):
+        QueryGenerator(ZQL_GRAMMAR, stress={"nope": 3})
+
+
+def test_main_prints_queries(capsys):
+    assert main(["--count", "3", "--seed", "2"]) == 0
+    queries = capsys.readouterr().out.strip().split("\n\n")
+    assert queries == QueryGenerator(ZQL_GRAMMAR, seed=2).generate_many(3)
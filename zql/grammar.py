@@ -4,6 +4,7 @@ import re
 DEF = ":"
 CASE = "|"
 TEMPLATE = ">"
+COMPACT_TEMPLATE = "~"
 END = ";"
 REGEX_START = "r"
 QUOTE = "\""
@@ -14,6 +15,7 @@ ROOT = "root"
 
 
 Grammar = dict[str, list[dict]]
+GrammarReport = dict[str, list]
 
 
 class GrammarParseError(Exception):
@@ -66,6 +68,21 @@ def parse_grammar(content: str) -> Grammar:
             grammar[current_node].append(rule)
             continue
 
+        if line.startswith(COMPACT_TEMPLATE):
+            raw_template = line[len(COMPACT_TEMPLATE):].strip()
+            if not raw_template:
+                raise GrammarParseError(f"L{n}: Missing template after `~`.")
+
+            current_rules = grammar[current_node]
+            last_rule = current_rules[-1]
+            if "compact_template" in last_rule:
+                raise GrammarParseError(f"L{n}: Repeat compact template for rule.")
+
+            template_no_quotes = raw_template[1:-1]
+            template = template_no_quotes.replace(ESCAPED_NEWLINE, NEWLINE)
+            last_rule["compact_template"] = template
+            continue
+
         template_index = line.find(TEMPLATE)
         case_index = line.find(CASE)
 
@@ -109,4 +126,356 @@ def parse_grammar(content: str) -> Grammar:
     if ROOT not in grammar:
         raise GrammarParseError("Missing `root` definition.")
 
-    return grammar
\ No newline at end of file
+    return grammar
+
+
+def expand_rule(rule: dict) -> list[dict]:
+    """
+    Expands a left-factored rule back into the rules it was compiled from.
+    Other rules are returned as they are.
+    """
+    prefix = rule.get("prefix")
+    if prefix is None:
+        return [rule]
+
+    return [
+        {**branch, "sequence": [*prefix, *branch["sequence"]]}
+        for branch in rule["branches"]
+    ]
+
+
+def get_rule_nodes(rule: dict) -> list[str]:
+    """Lists the nodes a rule refers to, in order."""
+    nodes = []
+    for expanded in expand_rule(rule):
+        nodes.extend(expanded.get("sequence", []))
+    return nodes
+
+
+def find_undefined_nodes(grammar: Grammar) -> list[str]:
+    """Finds nodes that rules refer to but that have no definition."""
+    undefined = set()
+    for rules in grammar.values():
+        for rule in rules:
+            for node in get_rule_nodes(rule):
+                if node not in grammar:
+                    undefined.add(node)
+    return sorted(undefined)
+
+
+def find_unreachable_nodes(grammar: Grammar) -> list[str]:
+    """Finds defined nodes that can never be reached from `root`."""
+    reached = set()
+    frontier = [ROOT]
+    while frontier:
+        node = frontier.pop()
+        if node in reached or node not in grammar:
+            continue
+        reached.add(node)
+        for rule in grammar[node]:
+            frontier.extend(get_rule_nodes(rule))
+    return sorted(node for node in grammar if node not in reached)
+
+
+def find_nullable_nodes(grammar: Grammar) -> list[str]:
+    """
+    Finds nodes that can match without consuming any tokens. Literals and
+    regexes always consume a token, so only sequences of nullable nodes (or
+    empty branches of compiled rules) are nullable.
+    """
+    nullable = set()
+    changed = True
+    while changed:
+        changed = False
+        for node, rules in grammar.items():
+            if node in nullable:
+                continue
+            for rule in rules:
+                for expanded in expand_rule(rule):
+                    sequence = expanded.get("sequence")
+                    if sequence is None:
+                        continue
+                    if all(n in nullable for n in sequence):
+                        nullable.add(node)
+                        changed = True
+                        break
+                if node in nullable:
+                    break
+    return sorted(nullable)
+
+
+def get_left_corners(grammar: Grammar, nullable: set[str]) -> dict[str, set]:
+    """
+    Maps each node to the nodes that can be evaluated before it consumes its
+    first token.
+    """
+    corners = {}
+    for node, rules in grammar.items():
+        corners[node] = set()
+        for rule in rules:
+            for expanded in expand_rule(rule):
+                for n in expanded.get("sequence", []):
+                    corners[node].add(n)
+                    if n not in nullable:
+                        break
+    return corners
+
+
+def find_left_recursion(grammar: Grammar) -> list[list[str]]:
+    """
+    Finds cycles of nodes that can call each other without consuming a token.
+    The parser would recurse forever on any of them.
+    """
+    nullable = set(find_nullable_nodes(grammar))
+    corners = get_left_corners(grammar, nullable)
+
+    # Tarjan's strongly connected components, iterative to avoid deep stacks.
+    index_of: dict[str, int] = {}
+    lowlink: dict[str, int] = {}
+    stack: list[str] = []
+    on_stack: set[str] = set()
+    cycles: list[list[str]] = []
+    counter = 0
+    for start in grammar:
+        if start in index_of:
+            continue
+        work = [(start, iter(sorted(corners[start])))]
+        index_of[start] = lowlink[start] = counter
+        counter += 1
+        stack.append(start)
+        on_stack.add(start)
+        while work:
+            node, children = work[-1]
+            child = next(children, None)
+            if child is not None:
+                if child not in grammar:
+                    continue
+                if child not in index_of:
+                    index_of[child] = lowlink[child] = counter
+                    counter += 1
+                    stack.append(child)
+                    on_stack.add(child)
+                    work.append((child, iter(sorted(corners[child]))))
+                elif child in on_stack:
+                    lowlink[node] = min(lowlink[node], index_of[child])
+                continue
+
+            work.pop()
+            if work:
+                parent = work[-1][0]
+                lowlink[parent] = min(lowlink[parent], lowlink[node])
+            if lowlink[node] != index_of[node]:
+                continue
+
+            component = []
+            while True:
+                member = stack.pop()
+                on_stack.discard(member)
+                component.append(member)
+                if member == node:
+                    break
+            if len(component) > 1 or node in corners[node]:
+                cycles.append(sorted(component))
+
+    return sorted(cycles)
+
+
+def find_shared_prefixes(grammar: Grammar) -> list[dict]:
+    """
+    Finds alternatives of a node that start with the same nodes, so the parser
+    evaluates that prefix again after each failed alternative. Groups whose
+    alternatives are adjacent can be left-factored by `compile_grammar`.
+    """
+    shared = []
+    for node, rules in grammar.items():
+        groups: dict[str, list[int]] = {}
+        for i, rule in enumerate(rules):
+            sequence = rule.get("sequence")
+            if sequence:
+                groups.setdefault(sequence[0], []).append(i)
+
+        for indexes in groups.values():
+            if len(indexes) < 2:
+                continue
+            sequences = [rules[i]["sequence"] for i in indexes]
+            prefix = get_common_prefix(sequences)
+            is_adjacent = indexes[-1] - indexes[0] == len(indexes) - 1
+            shared.append({
+                "node": node,
+                "alternatives": indexes,
+                "prefix": prefix,
+                "factorable": is_adjacent and node != ROOT,
+            })
+    return shared
+
+
+def get_literal_expansions(
+    grammar: Grammar,
+    node: str,
+    visiting: set[str] | None = None
+) -> list[str] | None:
+    """
+    Lists every literal a node can match, if the node only ever matches a
+    single literal. Returns `None` for nodes that match anything else.
+    """
+    visiting = visiting or set()
+    if node in visiting or node not in grammar:
+        return None
+
+    literals = []
+    for rule in grammar[node]:
+        rule_literals = get_rule_literal_expansions(
+            grammar, rule, {*visiting, node}
+        )
+        if rule_literals is None:
+            return None
+        literals.extend(rule_literals)
+    return literals
+
+
+def get_rule_literal_expansions(
+    grammar: Grammar,
+    rule: dict,
+    visiting: set[str]
+) -> list[str] | None:
+    literal = rule.get("literal")
+    if literal is not None:
+        return [literal]
+
+    sequence = rule.get("sequence")
+    if sequence is not None and len(sequence) == 1:
+        return get_literal_expansions(grammar, sequence[0], visiting)
+
+    return None
+
+
+def is_word_prefix(prefix: str, literal: str) -> bool:
+    prefix_words = prefix.split(SPACE)
+    return literal.split(SPACE)[:len(prefix_words)] == prefix_words
+
+
+def is_shadowed_by(grammar: Grammar, earlier: dict, later: dict) -> bool:
+    """
+    Checks if `later` can never match because `earlier` always matches first.
+    The parser commits to the first alternative that matches, so an earlier
+    alternative that matches a prefix of every input the later one accepts
+    hides it.
+    """
+    earlier_sequence = earlier.get("sequence")
+    later_sequence = later.get("sequence")
+    if earlier_sequence is not None and later_sequence is not None:
+        n = len(earlier_sequence)
+        if later_sequence[:n] == earlier_sequence:
+            return True
+
+    earlier_literals = get_rule_literal_expansions(grammar, earlier, set())
+    later_literals = get_rule_literal_expansions(grammar, later, set())
+    if not earlier_literals or not later_literals:
+        return False
+
+    return all(
+        any(is_word_prefix(e, l) for e in earlier_literals)
+        for l in later_literals
+    )
+
+
+def find_shadowed_alternatives(grammar: Grammar) -> list[dict]:
+    """
+    Finds alternatives that can never match. `root` is skipped because the
+    parser retries its alternatives when tokens remain after a match.
+    """
+    shadowed = []
+    for node, rules in grammar.items():
+        if node == ROOT:
+            continue
+        for j, later in enumerate(rules):
+            for i, earlier in enumerate(rules[:j]):
+                if is_shadowed_by(grammar, earlier, later):
+                    shadowed.append({
+                        "node": node,
+                        "alternative": j,
+                        "shadowed_by": i,
+                    })
+                    break
+    return shadowed
+
+
+def analyze_grammar(grammar: Grammar) -> GrammarReport:
+    """
+    Reports patterns in a grammar that cause wasted or impossible work:
+    - `undefined`: nodes that are referenced but never defined.
+    - `unreachable`: nodes that cannot be reached from `root`.
+    - `nullable`: nodes that can match without consuming tokens.
+    - `left_recursion`: cycles that recurse without consuming tokens.
+    - `shared_prefixes`: alternatives that repeat the same leading nodes.
+    - `shadowed`: alternatives hidden by an earlier alternative.
+    """
+    return {
+        "undefined": find_undefined_nodes(grammar),
+        "unreachable": find_unreachable_nodes(grammar),
+        "nullable": find_nullable_nodes(grammar),
+        "left_recursion": find_left_recursion(grammar),
+        "shared_prefixes": find_shared_prefixes(grammar),
+        "shadowed": find_shadowed_alternatives(grammar),
+    }
+
+
+def get_common_prefix(sequences: list[list[str]]) -> list[str]:
+    prefix = []
+    for nodes in zip(*sequences):
+        if any(n != nodes[0] for n in nodes):
+            break
+        prefix.append(nodes[0])
+    return prefix
+
+
+def factor_rules(rules: list[dict]) -> list[dict]:
+    """
+    Merges each run of adjacent sequence rules that share leading nodes into
+    one rule that evaluates the shared `prefix` once, then tries the remaining
+    `branches` in their original order.
+    """
+    factored = []
+    i = 0
+    while i < len(rules):
+        rule = rules[i]
+        sequence = rule.get("sequence")
+        j = i + 1
+        if sequence:
+            while j < len(rules):
+                next_sequence = rules[j].get("sequence")
+                if not next_sequence or next_sequence[0] != sequence[0]:
+                    break
+                j += 1
+
+        if j - i < 2:
+            factored.append(rule)
+            i += 1
+            continue
+
+        run = rules[i:j]
+        prefix = get_common_prefix([r["sequence"] for r in run])
+        branches = [
+            {**r, "sequence": r["sequence"][len(prefix):]}
+            for r in run
+        ]
+        factored.append({"prefix": prefix, "branches": branches})
+        i = j
+    return factored
+
+
+def compile_grammar(grammar: Grammar) -> Grammar:
+    """
+    Left-factors adjacent alternatives with shared prefixes. The parser never
+    backtracks into a node that has matched, so evaluating the prefix once
+    yields the same AST, and templates stay on the branch they belong to, so
+    rendered output is unchanged. `root` is left as is because the parser
+    retries its alternatives when tokens remain.
+    """
+    compiled = {}
+    for node, rules in grammar.items():
+        if node == ROOT:
+            compiled[node] = rules
+            continue
+        compiled[node] = factor_rules(rules)
+    return compiled
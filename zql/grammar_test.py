@@ -1,4 +1,9 @@
-from zql.grammar import parse_grammar
+from zql.grammar import (
+    analyze_grammar,
+    compile_grammar,
+    expand_rule,
+    parse_grammar,
+)
 from zql.sample_grammars import FORMULA_GRAMMAR_CONTENT, LIST_GRAMMAR_CONTENT
 
 
@@ -62,4 +67,107 @@ def test_parse_grammar_list():
             {"regex": r"[0-9]+"},
         ],
     }
-    assert actual == expected
\ No newline at end of file
+    assert actual == expected
+
+
+ANALYSIS_GRAMMAR_CONTENT = r"""
+root     : stmt
+         ;
+stmt     : head tail
+         | head
+         | loop
+         ;
+head     : "be"
+         ;
+tail     : alias
+         | equal
+         | is
+         ;
+alias    : "be"
+         ;
+equal    : "left"
+         ;
+is       : "left outer"
+         ;
+loop     : other head
+         ;
+other    : loop
+         ;
+orphan   : missing
+         ;
+"""
+
+
+def test_analyze_grammar():
+    grammar = parse_grammar(ANALYSIS_GRAMMAR_CONTENT)
+    actual = analyze_grammar(grammar)
+    expected = {
+        "undefined": ["missing"],
+        "unreachable": ["orphan"],
+        "nullable": [],
+        "left_recursion": [["loop", "other"]],
+        "shared_prefixes": [
+            {
+                "node": "stmt",
+                "alternatives": [0, 1],
+                "prefix": ["head"],
+                "factorable": True,
+            },
+        ],
+        "shadowed": [
+            {"node": "tail", "alternative": 2, "shadowed_by": 1},
+        ],
+    }
+    assert actual == expected
+
+
+def test_compile_grammar_factors_shared_prefixes():
+    grammar = parse_grammar(ANALYSIS_GRAMMAR_CONTENT)
+    actual = compile_grammar(grammar)["stmt"]
+    expected = [
+        {
+            "prefix": ["head"],
+            "branches": [
+                {"sequence": ["tail"]},
+                {"sequence": []},
+            ],
+        },
+        {"sequence": ["loop"]},
+    ]
+    assert actual == expected
+
+
+def test_compile_grammar_keeps_templates_on_branches():
+    grammar = parse_grammar(FORMULA_GRAMMAR_CONTENT)
+    grammar["formula"][0]["template"] = "{expr} {operator} {expr}"
+    compiled = compile_grammar(grammar)
+    actual = compiled["formula"]
+    expected = [
+        {
+            "prefix": ["expr"],
+            "branches": [
+                {
+                    "sequence": ["operator", "expr"],
+                    "template": "{expr} {operator} {expr}",
+                },
+                {"sequence": []},
+            ],
+        },
+    ]
+    assert actual == expected
+    assert expand_rule(actual[0]) == grammar["formula"]
+    assert compiled["root"] == grammar["root"]
+
+
+def test_parse_compact_template():
+    grammar = parse_grammar("""
+root : a b
+     > "{a}\\n{b}"
+     ~ "{a} {b}"
+     ;
+""")
+    assert grammar["root"] == [{
+        "sequence": ["a", "b"],
+        "template": "{a}\n{b}",
+        "compact_template": "{a} {b}",
+    }]
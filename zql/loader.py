@@ -1,10 +1,58 @@
-from zql.grammar import Grammar, parse_grammar
+import hashlib
+import json
+import os
+from pathlib import Path
 
+from zql.grammar import Grammar, compile_grammar, parse_grammar
 
-ZQL_GRAMMAR_PATH = "zql/zql_grammar.tmjd"
 
+ZQL_GRAMMAR_PATH = Path(__file__).parent / "zql_grammar.tmjd"
+ZQL_COMPILED_GRAMMAR_PATH = os.environ.get("ZQL_COMPILED_GRAMMAR")
 
-def get_zql_grammar() -> Grammar:
+
+def get_zql_grammar_source() -> str:
     with open(ZQL_GRAMMAR_PATH, "r") as file:
-        content = file.read()
-        return parse_grammar(content)
\ No newline at end of file
+        return file.read()
+
+
+def get_zql_grammar() -> Grammar:
+    return parse_grammar(get_zql_grammar_source())
+
+
+def get_grammar_hash(content: str) -> str:
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()[:16]
+
+
+def write_compiled_zql_grammar(path: str) -> str:
+    """
+    Compiles the ZQL grammar once and saves it as JSON with the hash of its
+    source, so worker processes can load it instead of compiling it again.
+    Returns the hash.
+    """
+    content = get_zql_grammar_source()
+    grammar_hash = get_grammar_hash(content)
+    artifact = {
+        "hash": grammar_hash,
+        "grammar": compile_grammar(parse_grammar(content)),
+    }
+    with open(path, "w") as file:
+        json.dump(artifact, file)
+    return grammar_hash
+
+
+def get_compiled_zql_grammar(
+    path: str | None = ZQL_COMPILED_GRAMMAR_PATH
+) -> tuple[Grammar, str]:
+    """
+    Returns the compiled ZQL grammar and the hash of its source. Loads the
+    artifact at `path` when it was built from the current source, and
+    compiles from source otherwise.
+    """
+    content = get_zql_grammar_source()
+    grammar_hash = get_grammar_hash(content)
+    if path and os.path.exists(path):
+        with open(path, "r") as file:
+            artifact = json.load(file)
+        if artifact["hash"] == grammar_hash:
+            return artifact["grammar"], grammar_hash
+    return compile_grammar(parse_grammar(content)), grammar_hash
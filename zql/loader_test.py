@@ -1,6 +1,35 @@
-from zql.loader import get_zql_grammar
+import json
+
+from zql.loader import (
+    get_compiled_zql_grammar,
+    get_zql_grammar,
+    write_compiled_zql_grammar,
+)
+from zql.grammar import analyze_grammar, compile_grammar
 
 
 def test_parse_zql_grammar():
     grammar = get_zql_grammar()
     assert grammar.get("root") is not None
+
+
+def test_zql_grammar_has_no_broken_rules():
+    report = analyze_grammar(get_zql_grammar())
+    assert report["undefined"] == []
+    assert report["unreachable"] == []
+    assert report["left_recursion"] == []
+
+
+def test_compiled_grammar_artifact_round_trips(tmp_path):
+    path = str(tmp_path / "grammar.json")
+    grammar_hash = write_compiled_zql_grammar(path)
+    grammar, loaded_hash = get_compiled_zql_grammar(path)
+    assert loaded_hash == grammar_hash
+    assert grammar == compile_grammar(get_zql_grammar())
+
+
+def test_stale_grammar_artifact_is_ignored(tmp_path):
+    path = tmp_path / "grammar.json"
+    path.write_text(json.dumps({"hash": "stale", "grammar": {}}))
+    grammar, _ = get_compiled_zql_grammar(str(path))
+    assert grammar == compile_grammar(get_zql_grammar())
@@ -1,28 +1,260 @@
+import os
+from typing import TextIO
+
 from zql.types import ZqlQuery, SqlQuery
-from zql.parser import AstParseError, parse_ast
-from zql.loader import get_zql_grammar
-from zql.renderer import QueryRenderError, render_query
+from zql.cache import LruCache, SqliteCache
+from zql.cleaner import get_tokens_string_safe
+from zql.parser import (
+    AstNode,
+    AstParseError,
+    ParseBudget,
+    ParseLimitError,
+    ParseTimeoutError,
+    parse_ast,
+)
+from zql.loader import get_compiled_zql_grammar
+from zql.parameters import (
+    ZQL_INLINE_NODES,
+    ZQL_PARAMETER_LIFTS,
+    get_token_shape,
+    inline_params,
+    is_same_params,
+    split_lifted,
+)
+from zql.renderer import (
+    COMPACT_MODE,
+    PRETTY_MODE,
+    RENDER_MODES,
+    QueryRenderError,
+    Literals,
+    QueryRenderer,
+    check_render_mode,
+)
+from zql.sharing import SharedNodes, share_subtrees
+from zql.statements import DEFINITION_STMT, get_statement_kind
+
 
+ZQL_GRAMMAR, ZQL_GRAMMAR_HASH = get_compiled_zql_grammar()
+ZQL_RENDERERS = {mode: QueryRenderer(ZQL_GRAMMAR, mode) for mode in RENDER_MODES}
+SHAPE_CACHE_SIZE = 1024
+TRANSPILE_CACHE_PATH = os.environ.get("ZQL_TRANSPILE_CACHE_PATH")
+TRANSPILE_CACHE_SIZE = int(os.environ.get("ZQL_TRANSPILE_CACHE_SIZE", "100000"))
 
-ZQL_GRAMMAR = get_zql_grammar()
+
+PreparedQuery = dict
 
 
 class ZqlParserError(Exception):
     pass
 
 
+class ZqlTimeoutError(ZqlParserError):
+    pass
+
+
+class ZqlLimitError(ZqlParserError):
+    pass
+
+
 class Zql:
-    """Converts ZQL queries to SQL."""
+    """
+    Converts ZQL queries to SQL. With `share`, structurally equal subtrees of
+    every AST this instance parses are one shared object, and their SQL is
+    rendered once per query. This saves memory and render time on repetitive
+    generated ZQL. Shared subtrees are kept for the life of the instance, so
+    use one instance per batch of queries.
+    """
+
+    shape_cache = LruCache(SHAPE_CACHE_SIZE)
+    transpile_cache: SqliteCache | None = None
+
+    def __init__(self, share: bool = False):
+        self.shared_nodes: SharedNodes | None = {} if share else None
+
+    def parse(
+        self,
+        raw: ZqlQuery,
+        budget: ParseBudget | None = None,
+        mode: str = PRETTY_MODE
+    ) -> SqlQuery:
+        """
+        Converts ZQL to SQL. With a `transpile_cache`, SQL is looked up by the
+        query's tokens first, so queries transpiled before, even by another
+        process, are never parsed again.
+        """
+        cache = self.transpile_cache
+        if cache is None:
+            return self.render(self.parse_tree(raw, budget), mode)
 
-    def __init__(self):
-        pass
+        key = [mode, get_tokens_string_safe(raw)]
+        sql = cache.get(key)
+        if sql is None:
+            sql = self.render(self.parse_tree(raw, budget), mode)
+            cache.put(key, sql)
+        return sql
 
-    def parse(self, raw: ZqlQuery) -> SqlQuery:
+    def parse_tree(
+        self,
+        raw: ZqlQuery,
+        budget: ParseBudget | None = None
+    ) -> AstNode:
+        """
+        Parses ZQL to an AST without rendering it. Raises `ZqlTimeoutError`
+        if `budget` runs out of time, or `ZqlLimitError` if the query has too
+        many tokens or takes too many rule attempts.
+        """
         try:
-            ast = parse_ast(ZQL_GRAMMAR, raw)
-            sql = render_query(ZQL_GRAMMAR, ast)
-            return sql
+            ast = parse_ast(ZQL_GRAMMAR, raw, budget=budget)
+        except ParseTimeoutError as pte:
+            raise ZqlTimeoutError(pte)
+        except ParseLimitError as ple:
+            raise ZqlLimitError(ple)
         except AstParseError as ape:
             raise ZqlParserError(ape)
+        if self.shared_nodes is not None:
+            # Literals are never shared, so each can be lifted on its own.
+            lifted = frozenset(ZQL_PARAMETER_LIFTS)
+            return share_subtrees(ast, self.shared_nodes, lifted)
+        return ast
+
+    def render(self, ast: AstNode, mode: str = PRETTY_MODE) -> SqlQuery:
+        """
+        Renders an AST from `parse_tree` to SQL, laid out for reading in
+        `pretty` mode or on one line in `compact` mode.
+        """
+        try:
+            return get_renderer(mode).render(ast, self.is_sharing())
         except QueryRenderError as qre:
-            raise ZqlParserError(ape)
+            raise ZqlParserError(qre)
+
+    def transpile_to(
+        self,
+        raw: ZqlQuery,
+        writer: TextIO,
+        budget: ParseBudget | None = None,
+        mode: str = PRETTY_MODE
+    ):
+        """
+        Converts ZQL to SQL written straight to a text stream, such as a file,
+        so large statements are never held as one string.
+        """
+        ast = self.parse_tree(raw, budget)
+        try:
+            get_renderer(mode).render_to(writer, ast)
+        except QueryRenderError as qre:
+            raise ZqlParserError(qre)
+
+    def render_parameterized(
+        self,
+        ast: AstNode,
+        mode: str = PRETTY_MODE,
+        literals: Literals | None = None
+    ) -> tuple[SqlQuery, list]:
+        """
+        Renders an AST to SQL with integer, float and single quoted string
+        literals replaced by numbered `?N` placeholders. Literals in the
+        select list, `GROUP BY` and `ORDER BY` stay inline, where a parameter
+        would change the result.
+        """
+        try:
+            renderer = get_renderer(mode)
+            return renderer.render_parameterized(
+                ast,
+                ZQL_PARAMETER_LIFTS,
+                self.is_sharing(),
+                ZQL_INLINE_NODES,
+                literals,
+            )
+        except QueryRenderError as qre:
+            raise ZqlParserError(qre)
+
+    def prepare(
+        self,
+        raw: ZqlQuery,
+        budget: ParseBudget | None = None
+    ) -> PreparedQuery:
+        """
+        Converts ZQL to parameterized SQL, as `{"ast", "sql", "params",
+        "param_texts"}`, where `param_texts` are the literals as written.
+        Queries that differ only in literal values share a shape, and repeated
+        shapes are served from a cache without parsing, as long as literals
+        kept inline are the same. The cached `ast` is the one parsed for the
+        first query of that shape, so read literal values from `params`, not
+        from the AST. Definition statements are never parameterized, because
+        SQLite does not accept parameters in them. SQL is rendered in
+        `compact` mode, since it is executed, not read.
+        """
+        tokens = get_tokens_string_safe(raw)
+        shape, values, texts = get_token_shape(tokens)
+        cached = self.shape_cache.get(shape)
+        if cached is not None:
+            param_texts, inline = split_lifted(texts, cached["lifted"])
+            if inline == cached["inline"]:
+                params, _ = split_lifted(values, cached["lifted"])
+                return {
+                    "ast": cached["ast"],
+                    "sql": cached["sql"],
+                    "params": params,
+                    "param_texts": param_texts,
+                }
+
+        ast = self.parse_tree(raw, budget)
+        if get_statement_kind(ast) == DEFINITION_STMT:
+            sql, params = self.render(ast, COMPACT_MODE), []
+            literals = [(value, False) for value in values]
+        else:
+            literals = []
+            sql, params = self.render_parameterized(ast, COMPACT_MODE, literals)
+
+        # Only shapes whose literals line up with the parsed ones are safe to
+        # reuse, and only then are the source texts known for each parameter.
+        param_texts = None
+        if is_same_params([value for value, _ in literals], values):
+            lifted = [is_lifted for _, is_lifted in literals]
+            param_texts, inline = split_lifted(texts, lifted)
+            self.shape_cache.put(shape, {
+                "ast": ast,
+                "sql": sql,
+                "lifted": lifted,
+                "inline": inline,
+            })
+        return {
+            "ast": ast,
+            "sql": sql,
+            "params": params,
+            "param_texts": param_texts,
+        }
+
+    def is_sharing(self) -> bool:
+        return self.shared_nodes is not None
+
+    def format(self, prepared: PreparedQuery) -> SqlQuery:
+        """
+        Renders a query from `prepare` as pretty SQL for display, with its
+        parameter values written inline.
+        """
+        if not prepared["params"]:
+            return self.render(prepared["ast"])
+        sql, _ = self.render_parameterized(prepared["ast"])
+        texts = prepared.get("param_texts")
+        return inline_params(sql, prepared["params"], texts)
+
+
+def open_transpile_cache(
+    path: str,
+    max_size: int = TRANSPILE_CACHE_SIZE
+) -> SqliteCache:
+    """
+    Opens a transpile cache file, scoped to the grammar hash so SQL rendered
+    by another version of the grammar is never served.
+    """
+    return SqliteCache(path, max_size, namespace=ZQL_GRAMMAR_HASH)
+
+
+if TRANSPILE_CACHE_PATH:
+    Zql.transpile_cache = open_transpile_cache(TRANSPILE_CACHE_PATH)
+
+
+def get_renderer(mode: str) -> QueryRenderer:
+    check_render_mode(mode)
+    return ZQL_RENDERERS[mode]
@@ -1,5 +1,12 @@
 import pytest
-from zql.main import Zql
+from zql.main import (
+    Zql,
+    ZqlLimitError,
+    ZqlTimeoutError,
+    open_transpile_cache,
+)
+from zql.parser import ParseBudget
+from zql.sharing import find_shared_nodes
 
 
 def test_simple_select_query():
@@ -984,3 +991,158 @@ def test_insert():
     raw_query = "pushin p into example (1, \"A\") no cap"
     actual = Zql().parse(raw_query)
     assert actual == "INSERT INTO example VALUES (1, \"A\");"
+
+
+def test_prepare_parameterizes_literals():
+    raw_query = """
+    its giving a, "b"
+    yass example
+    tfw a be 'x' fax c bops 1.5
+    say less 10
+    no cap
+    """
+    actual = Zql().prepare(raw_query)
+    expected_sql = 'SELECT a, "b" FROM example WHERE a = ?1 AND c > ?2 LIMIT ?3 ;'
+    assert actual["sql"] == expected_sql
+    assert actual["params"] == ["x", 1.5, 10]
+
+
+def test_format_prepared_query_is_pretty():
+    zql = Zql()
+    zql.prepare("its giving a yass example tfw a be 'x' no cap")
+    prepared = zql.prepare("its giving a yass example tfw a be 'y' no cap")
+    expected = """
+SELECT a
+FROM example
+WHERE a = 'y'
+;
+    """.strip()
+    assert zql.format(prepared) == expected
+
+
+def test_parse_compact_mode():
+    raw_query = """
+    built different girlie t be (a varchar(10), b int)
+    no cap
+    """
+    actual = Zql().parse(raw_query, mode="compact")
+    assert actual == "CREATE TABLE t(a varchar(10), b int);"
+
+
+def test_prepare_reuses_shape_without_parsing():
+    zql = Zql()
+    first = zql.prepare("pushin p into example (1, 'A') no cap")
+    second = zql.prepare("pushin p into example (2, 'B') no cap")
+    assert second["sql"] == first["sql"] == "INSERT INTO example VALUES (?1, ?2);"
+    assert second["params"] == [2, "B"]
+    assert second["ast"] is first["ast"]
+
+
+def test_prepare_does_not_parameterize_definitions():
+    raw_query = "built different girlie t be (a varchar(10)) no cap"
+    actual = Zql().prepare(raw_query)
+    assert actual["params"] == []
+    assert "varchar(10)" in actual["sql"]
+
+
+def test_prepare_keeps_grouping_and_ordering_literals():
+    zql = Zql()
+    query = "its giving a, count(b) yass t let {} cook ngl {} high key no cap"
+    first = zql.prepare(query.format(1, 2))
+    second = zql.prepare(query.format(2, 1))
+    assert first["sql"] == "SELECT a, count(b) FROM t GROUP BY 1 ORDER BY 2 DESC ;"
+    assert second["sql"] == "SELECT a, count(b) FROM t GROUP BY 2 ORDER BY 1 DESC ;"
+    assert first["params"] == second["params"] == []
+
+
+def test_prepare_keeps_select_list_literals():
+    zql = Zql()
+    first = zql.prepare("its giving 6, a yass t tfw a be 6 no cap")
+    second = zql.prepare("its giving 7, a yass t tfw a be 7 no cap")
+    assert first["sql"] == "SELECT 6, a FROM t WHERE a = ?1 ;"
+    assert second["sql"] == "SELECT 7, a FROM t WHERE a = ?1 ;"
+    assert second["params"] == [7]
+
+
+def test_prepare_keeps_huge_integers_inline():
+    actual = Zql().prepare("its giving a yass t tfw a be 99999999999999999999 no cap")
+    assert actual["sql"] == "SELECT a FROM t WHERE a = 99999999999999999999 ;"
+    assert actual["params"] == []
+
+
+def test_format_keeps_literals_as_written():
+    zql = Zql()
+    zql.prepare("its giving a yass t tfw b be 1.0 no cap")
+    prepared = zql.prepare("its giving a yass t tfw b be 573.530 no cap")
+    assert prepared["params"] == [573.53]
+    assert zql.format(prepared).endswith("WHERE b = 573.530\n;")
+
+
+def test_share_prepares_literals_in_select_list_and_conditions():
+    actual = Zql(share=True).prepare("its giving 1, a yass t tfw a be 1 no cap")
+    assert actual["sql"] == "SELECT 1, a FROM t WHERE a = ?1 ;"
+    assert actual["params"] == [1]
+
+
+def test_parse_out_of_budget():
+    budget = ParseBudget(timeout=0)
+    with pytest.raises(ZqlTimeoutError):
+        Zql().parse("its giving a yass example no cap", budget)
+
+
+def test_parse_over_limits():
+    raw_query = "its giving a yass example no cap"
+    with pytest.raises(ZqlLimitError):
+        Zql().parse(raw_query, ParseBudget(max_tokens=5))
+    with pytest.raises(ZqlLimitError):
+        Zql().parse(raw_query, ParseBudget(max_attempts=10))
+
+
+def test_transpile_to_writes_sql(tmp_path):
+    raw_query = "its giving a, b yass example say less 10 no cap"
+    path = tmp_path / "out.sql"
+    with open(path, "w") as file:
+        Zql().transpile_to(raw_query, file)
+    assert path.read_text() == Zql().parse(raw_query)
+
+
+def test_share_renders_same_sql():
+    query = (
+        "its giving lower(a.name), lower(a.name) yass a "
+        "tfw lower(a.name) be 'x' no cap"
+    )
+    zql = Zql(share=True)
+    ast = zql.parse_tree(query)
+    assert find_shared_nodes(ast)
+    assert zql.parse(query) == Zql().parse(query)
+    assert zql.render_parameterized(ast) == Zql().render_parameterized(ast)
+
+
+def test_transpile_cache_skips_parsing_on_warm_start(tmp_path, monkeypatch):
+    path = str(tmp_path / "transpile.db")
+    raw_query = "its giving a yass example tfw b be 1 no cap"
+    monkeypatch.setattr(Zql, "transpile_cache", open_transpile_cache(path))
+    sql = Zql().parse(raw_query)
+    Zql.transpile_cache.close()
+
+    # A fresh connection to the same file stands in for a restarted process.
+    monkeypatch.setattr(Zql, "transpile_cache", open_transpile_cache(path))
+
+    def fail_parse(*args):
+        raise AssertionError("Expected a cached query not to be parsed.")
+
+    monkeypatch.setattr(Zql, "parse_tree", fail_parse)
+    # Comments and layout do not change the tokens.
+    assert Zql().parse(raw_query.replace(" tfw", " -- note\n tfw")) == sql
+    Zql.transpile_cache.close()
+
+
+def test_transpile_cache_keys_by_mode(tmp_path, monkeypatch):
+    path = str(tmp_path / "transpile.db")
+    raw_query = "its giving a yass example tfw b be 1 no cap"
+    monkeypatch.setattr(Zql, "transpile_cache", open_transpile_cache(path, 1))
+    pretty = Zql().parse(raw_query)
+    compact = Zql().parse(raw_query, mode="compact")
+    assert pretty != compact
+    assert len(Zql.transpile_cache) == 1
+    Zql.transpile_cache.close()
@@ -0,0 +1,84 @@
+import argparse
+import sys
+import tracemalloc
+
+from zql.cache import Interner
+from zql.cleaner import INTERN_SIZE, get_tokens_string_safe
+from zql.generator import QueryGenerator
+from zql.main import ZQL_GRAMMAR
+from zql.profile import split_queries
+
+
+# Distinct generated queries, repeated to fill a batch.
+SAMPLE_POOL_SIZE = 200
+
+
+def get_sample_batch(size: int, seed: int = 0) -> list[str]:
+    """
+    Generates a batch of random queries from the grammar, reproducibly for a
+    given `seed`, repeating a pool of distinct queries once it is used up.
+    """
+    generator = QueryGenerator(ZQL_GRAMMAR, seed=seed)
+    pool = generator.generate_many(min(size, SAMPLE_POOL_SIZE))
+    return [pool[n % len(pool)] for n in range(size)]
+
+
+def measure_batch(queries: list[str], interner: Interner) -> dict:
+    """
+    Tokenizes every query and keeps the tokens, as a batch transpile does
+    while it holds results. Returns the memory the tokens take.
+    """
+    tracemalloc.start()
+    held = [get_tokens_string_safe(query, interner) for query in queries]
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "queries": len(held),
+        "bytes": size,
+        "bytes_per_query": size / max(len(held), 1),
+    }
+
+
+def format_result(name: str, result: dict) -> str:
+    return (
+        f"{name}: {result['bytes'] / 2**20:.1f} MiB "
+        f"({result['bytes_per_query']:.0f} bytes/query)"
+    )
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m zql.memory",
+        description=(
+            "Measure the memory that tokens of a query batch take, with and "
+            "without interning identifiers and keywords."
+        ),
+    )
+    parser.add_argument(
+        "queries",
+        nargs="?",
+        help="File of queries separated by blank lines. Defaults to samples.",
+    )
+    parser.add_argument("--batch", type=int, default=100_000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--intern-size", type=int, default=INTERN_SIZE)
+    args = parser.parse_args(argv)
+
+    if args.queries:
+        with open(args.queries, "r") as file:
+            queries = split_queries(file.read())
+        queries = [queries[n % len(queries)] for n in range(args.batch)]
+    else:
+        queries = get_sample_batch(args.batch, args.seed)
+
+    plain = measure_batch(queries, Interner(0))
+    interned = measure_batch(queries, Interner(args.intern_size))
+    reduction = 1 - interned["bytes"] / max(plain["bytes"], 1)
+    print(format_result("plain", plain))
+    print(format_result("interned", interned))
+    print(f"reduction: {reduction:.0%}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,32 @@
+from zql.cache import Interner
+from zql.cleaner import get_tokens_string_safe
+from zql.memory import get_sample_batch, main, measure_batch
+
+
+def test_sample_batch_is_reproducible():
+    assert get_sample_batch(10, seed=3) == get_sample_batch(10, seed=3)
+    assert get_sample_batch(10, seed=3) != get_sample_batch(10, seed=4)
+
+
+def test_interned_tokens_share_identifiers():
+    interner = Interner(1000)
+    terminals = [
+        token
+        for query in get_sample_batch(10)
+        for token in get_tokens_string_safe(query, interner)
+        if token == "cap"
+    ]
+    assert len(terminals) == 10
+    assert all(token is terminals[0] for token in terminals)
+
+
+def test_interning_reduces_batch_memory():
+    queries = get_sample_batch(2000)
+    plain = measure_batch(queries, Interner(0))
+    interned = measure_batch(queries, Interner(1000))
+    assert interned["bytes"] < 0.6 * plain["bytes"]
+
+
+def test_main_reports_reduction(capsys):
+    assert main(["--batch", "100"]) == 0
+    assert "reduction:" in capsys.readouterr().out
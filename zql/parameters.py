@@ -0,0 +1,143 @@
+import re
+from typing import Any
+
+from zql.renderer import ParameterLifts
+
+
+SINGLE_QUOTE = "'"
+DOT = "."
+INTEGER_REGEX = re.compile(r"[0-9]+$")
+# SQLite binds integers as signed 64 bit values.
+MAX_SQLITE_INTEGER = 2**63 - 1
+PARAMETER_REGEX = re.compile(r"('(?:[^']|'')*'|\"(?:[^\"]|\"\")*\")|\?([0-9]+)")
+
+# Shape markers contain a NUL so they can never collide with a source token.
+INTEGER_MARKER = "\0integer"
+FLOAT_MARKER = "\0float"
+STRING_MARKER = "\0string"
+
+TokenShape = tuple[str, ...]
+
+
+def lift_integer(text: str) -> int | None:
+    """
+    Lifts integers that SQLite can bind. Larger ones stay inline, where SQLite
+    reads them as floats.
+    """
+    value = int(text)
+    if value > MAX_SQLITE_INTEGER:
+        return None
+    return value
+
+
+def lift_string(text: str) -> str | None:
+    """
+    Lifts single quoted strings only. SQLite resolves double quoted strings to
+    columns when one exists, so they must stay inline.
+    """
+    if not text.startswith(SINGLE_QUOTE):
+        return None
+    return text[1:-1]
+
+
+ZQL_PARAMETER_LIFTS: ParameterLifts = {
+    "integer": lift_integer,
+    "float": float,
+    "quoted_expr": lift_string,
+}
+# Literals in these clauses change the meaning of the query when they become
+# parameters: `ORDER BY 2` sorts by a column but `ORDER BY ?1` sorts by a
+# constant, and a parameter in the select list renames the result column.
+ZQL_INLINE_NODES = frozenset({"select_clause", "groupby_clause", "orderby_clause"})
+
+
+def is_integer_token(token: str) -> bool:
+    return INTEGER_REGEX.match(token) is not None
+
+
+def get_token_shape(
+    tokens: list[str]
+) -> tuple[TokenShape, list, list[str]]:
+    """
+    Replaces literal tokens with markers so queries that differ only in their
+    literal values share a shape. Returns the shape, the literal values in
+    source order, converted the same way `ZQL_PARAMETER_LIFTS` converts them,
+    and the source text of each literal. An integer, a dot and another integer
+    form one float, as in the grammar. Integers too large to lift stay part of
+    the shape.
+    """
+    shape: list[str] = []
+    values: list = []
+    texts: list[str] = []
+    i = 0
+    n = len(tokens)
+    while i < n:
+        token = tokens[i]
+        if is_integer_token(token):
+            is_float = (
+                i + 2 < n
+                and tokens[i + 1] == DOT
+                and is_integer_token(tokens[i + 2])
+            )
+            if is_float:
+                text = f"{token}.{tokens[i + 2]}"
+                values.append(float(text))
+                texts.append(text)
+                shape.append(FLOAT_MARKER)
+                i += 3
+                continue
+            value = lift_integer(token)
+            if value is None:
+                shape.append(token)
+            else:
+                values.append(value)
+                texts.append(token)
+                shape.append(INTEGER_MARKER)
+        elif token.startswith(SINGLE_QUOTE):
+            values.append(lift_string(token))
+            texts.append(token)
+            shape.append(STRING_MARKER)
+        else:
+            shape.append(token)
+        i += 1
+    return tuple(shape), values, texts
+
+
+def is_same_params(actual: list, expected: list) -> bool:
+    """Compares parameters by type as well as value, since `1 == 1.0`."""
+    return [(type(a), a) for a in actual] == [(type(e), e) for e in expected]
+
+
+def to_sql_literal(value: Any) -> str:
+    if isinstance(value, str):
+        return SINGLE_QUOTE + value.replace("'", "''") + SINGLE_QUOTE
+    return str(value)
+
+
+def split_lifted(items: list, lifted: list[bool]) -> tuple[list, list]:
+    """Splits items by a mask of lifted literals, as `(lifted, inline)`."""
+    return (
+        [item for item, is_lifted in zip(items, lifted) if is_lifted],
+        [item for item, is_lifted in zip(items, lifted) if not is_lifted],
+    )
+
+
+def inline_params(
+    sql: str,
+    params: list,
+    texts: list[str] | None = None
+) -> str:
+    """
+    Substitutes `?N` placeholders back to literals, for display only. Pass the
+    source `texts` of the parameters to show them as written, since converting
+    values back to text can change them, as `573.530` becomes `573.53`.
+    """
+    def replace(match: re.Match) -> str:
+        quoted, index = match.groups()
+        if quoted is not None:
+            return quoted
+        if texts is not None:
+            return texts[int(index) - 1]
+        return to_sql_literal(params[int(index) - 1])
+
+    return PARAMETER_REGEX.sub(replace, sql)
@@ -0,0 +1,66 @@
+from zql.parameters import (
+    FLOAT_MARKER,
+    INTEGER_MARKER,
+    STRING_MARKER,
+    get_token_shape,
+    inline_params,
+    is_same_params,
+    lift_integer,
+    lift_string,
+    split_lifted,
+)
+
+
+def test_get_token_shape():
+    tokens = ["its giving", "a", ",", "6", ".", "04", "tfw", "b", "'x'", "3"]
+    shape, values, texts = get_token_shape(tokens)
+    assert shape == (
+        "its giving", "a", ",", FLOAT_MARKER, "tfw", "b", STRING_MARKER,
+        INTEGER_MARKER,
+    )
+    assert values == [6.04, "x", 3]
+    assert texts == ["6.04", "'x'", "3"]
+
+
+def test_get_token_shape_keeps_huge_integers():
+    shape, values, texts = get_token_shape(["99999999999999999999", "1"])
+    assert shape == ("99999999999999999999", INTEGER_MARKER)
+    assert values == [1]
+    assert texts == ["1"]
+
+
+def test_get_token_shape_keeps_double_quotes_and_words():
+    shape, values, _ = get_token_shape(["\"x\"", "t1", ".", "a"])
+    assert shape == ("\"x\"", "t1", ".", "a")
+    assert values == []
+
+
+def test_lift_integer_only_lifts_sqlite_integers():
+    assert lift_integer("9223372036854775807") == 2**63 - 1
+    assert lift_integer("9223372036854775808") is None
+
+
+def test_lift_string():
+    assert lift_string("'hello'") == "hello"
+    assert lift_string("\"hello\"") is None
+
+
+def test_is_same_params_checks_types():
+    assert is_same_params([1, "a"], [1, "a"])
+    assert not is_same_params([1], [1.0])
+
+
+def test_inline_params():
+    sql = "SELECT ?2, '?1' FROM t WHERE a = ?1"
+    actual = inline_params(sql, ["it's", 2.5])
+    assert actual == "SELECT 2.5, '?1' FROM t WHERE a = 'it''s'"
+
+
+def test_inline_params_uses_source_texts():
+    actual = inline_params("WHERE a = ?1", [573.53], ["573.530"])
+    assert actual == "WHERE a = 573.530"
+
+
+def test_split_lifted():
+    actual = split_lifted(["a", "b", "c"], [True, False, True])
+    assert actual == (["a", "c"], ["b"])
@@ -1,6 +1,9 @@
 import re
+import threading
+import time
+from functools import lru_cache
 from zql.grammar import ROOT, Grammar
-from zql.cleaner import get_tokens_string_safe
+from zql.cleaner import TokenSpans, get_token_spans
 
 
 SPACE = " "
@@ -13,88 +16,271 @@ class AstParseError(Exception):
     pass
 
 
-class TokensManager:
+class ParseAbortedError(AstParseError):
+    """Stops the whole parse. Never caught by backtracking."""
+    pass
 
-    def __init__(self, tokens: list[str]):
-        self.tokens = tokens
 
-    def set_tokens(self, tokens: list[str]):
-        self.tokens = tokens
+class ParseTimeoutError(ParseAbortedError):
+    pass
+
 
-    def copy(self):
-        return TokensManager(list(self.tokens))
+class ParseLimitError(ParseAbortedError):
+    pass
 
 
-def evaluate_literal(tokens: list[str], literal: str) -> AstNode:
-    tokens_in_literal = len(literal.split(SPACE))
-    peeked_tokens = SPACE.join(tokens[:tokens_in_literal]).casefold()
-    if peeked_tokens != literal:
+class TokensManager:
+    """
+    Cursor over the token spans of a source. Backtracking restores a saved
+    position instead of copying tokens. With `offsets`, parsed nodes record
+    the `start` and `end` of their source text.
+    """
+
+    __slots__ = ("spans", "position", "offsets")
+
+    def __init__(
+        self,
+        spans: TokenSpans,
+        position: int = 0,
+        offsets: bool = False
+    ):
+        self.spans = spans
+        self.position = position
+        self.offsets = offsets
+
+    @property
+    def tokens(self) -> list[str]:
+        """Text of the remaining tokens."""
+        return [self.spans.text(i) for i in range(self.position, len(self.spans))]
+
+    def has_tokens(self) -> bool:
+        return self.position < len(self.spans)
+
+    def set_position(self, position: int):
+        self.position = position
+
+    def get_offsets(self, start: int, end: int) -> tuple[int, int]:
+        """Converts a range of token positions to source offsets."""
+        if start < end:
+            return self.spans.start(start), self.spans.end(end - 1)
+        if start < len(self.spans):
+            offset = self.spans.start(start)
+        else:
+            offset = len(self.spans.source)
+        return offset, offset
+
+
+class ParseBudget:
+    """
+    Bounds the work a parse may do. The parser checks the budget before every
+    node it evaluates, so a parse stops soon after it passes its deadline, it
+    attempts more than `max_attempts` nodes, or another thread calls `cancel`.
+    Sources with more than `max_tokens` tokens are rejected before parsing.
+    `attempts` and `tokens` count the work done, for tuning the limits.
+    """
+
+    def __init__(
+        self,
+        timeout: float | None = None,
+        max_attempts: int | None = None,
+        max_tokens: int | None = None,
+    ):
+        self.timeout = timeout
+        self.max_attempts = max_attempts
+        self.max_tokens = max_tokens
+        self.deadline = None
+        if timeout is not None:
+            self.deadline = time.perf_counter() + timeout
+        self.cancelled = threading.Event()
+        self.attempts = 0
+        self.tokens = 0
+
+    def cancel(self):
+        self.cancelled.set()
+
+    def check_tokens(self, tokens: TokenSpans):
+        self.tokens = len(tokens)
+        if self.max_tokens is not None and self.tokens > self.max_tokens:
+            raise ParseLimitError(
+                f"Got {self.tokens} tokens. Expected at most {self.max_tokens}."
+            )
+
+    def check(self):
+        self.attempts += 1
+        if self.max_attempts is not None and self.attempts > self.max_attempts:
+            raise ParseLimitError(
+                f"Parse attempted more than {self.max_attempts} rules."
+            )
+        if self.cancelled.is_set():
+            raise ParseTimeoutError("Parse was cancelled.")
+        if self.deadline is not None and time.perf_counter() > self.deadline:
+            raise ParseTimeoutError(
+                f"Parse took longer than {self.timeout}s."
+            )
+
+
+RuleKey = tuple[str, int]
+RuleStats = dict[str, int | float]
+
+
+class ParseProfile:
+    """
+    Collects per-rule statistics while parsing, keyed by node and the index of
+    the alternative that was tried for that node.
+    - `attempts`: times the alternative was tried.
+    - `successes`: times the alternative matched.
+    - `failures`: times the alternative raised and the parser backtracked.
+    - `time`: cumulative seconds spent in the alternative, including children.
+    - `wasted_time`: cumulative seconds spent in failed attempts.
+    """
+
+    def __init__(self):
+        self.stats: dict[RuleKey, RuleStats] = {}
+
+    def record(self, node: str, index: int, succeeded: bool, elapsed: float):
+        stats = self.stats.get((node, index))
+        if stats is None:
+            stats = {
+                "attempts": 0,
+                "successes": 0,
+                "failures": 0,
+                "time": 0.0,
+                "wasted_time": 0.0,
+            }
+            self.stats[(node, index)] = stats
+
+        stats["attempts"] += 1
+        stats["time"] += elapsed
+        if succeeded:
+            stats["successes"] += 1
+        else:
+            stats["failures"] += 1
+            stats["wasted_time"] += elapsed
+
+
+@lru_cache(maxsize=None)
+def get_literal_words(literal: str) -> tuple[str, ...]:
+    return tuple(literal.split(SPACE))
+
+
+def evaluate_literal(tokens_manager: TokensManager, literal: str) -> AstNode:
+    spans = tokens_manager.spans
+    position = tokens_manager.position
+    words = get_literal_words(literal)
+    end = position + len(words)
+    is_match = end <= len(spans)
+    for k, word in enumerate(words):
+        if not is_match:
+            break
+        is_match = spans.matches(position + k, word)
+    if not is_match:
+        peeked = [spans.text(i) for i in range(position, min(end, len(spans)))]
+        peeked_tokens = SPACE.join(peeked).casefold()
         raise AstParseError(f"Expected `{literal}`. Got `{peeked_tokens}`.")
-    
-    for _ in range(tokens_in_literal):
-        tokens.pop(0)
+
+    tokens_manager.set_position(end)
     return {"value": literal}
 
 
-def evaluate_regex(tokens: list[str], regex: str) -> AstNode:
-    if not tokens:
+def evaluate_regex(tokens_manager: TokensManager, regex: str) -> AstNode:
+    spans = tokens_manager.spans
+    position = tokens_manager.position
+    if not tokens_manager.has_tokens():
         raise AstParseError(f"Expected match for `{regex}`, not end of input.")
 
-    next_token = tokens[0]
-    if not re.compile(regex).match(next_token):
+    # Match within the source, so tokens that fail are never sliced out.
+    start, end = spans.start(position), spans.end(position)
+    if not re.compile(regex).match(spans.source, start, end):
+        next_token = spans.text(position)
         raise AstParseError(f"Expected `{next_token}` to match `{regex}`.")
 
-    tokens.pop(0)
-    return {"value": next_token}
+    tokens_manager.set_position(position + 1)
+    return {"value": spans.text(position)}
 
 
 def evaluate_sequence(
     grammar: Grammar,
     tokens_manager: TokensManager,
-    sequence: list[str]
+    sequence: list[str],
+    profile: ParseProfile | None = None,
+    budget: ParseBudget | None = None
 ) -> AstNode:
-    mutable_tokens_manager = tokens_manager.copy()
     children: list[AstNode] = []
     for node in sequence:
-        ast_node = evaluate_node(grammar, mutable_tokens_manager, node)
+        ast_node = evaluate_node(grammar, tokens_manager, node, profile, budget)
         children.append(ast_node)
-
-    tokens_manager.set_tokens(mutable_tokens_manager.tokens)
     return {"children": children}
 
 
+def evaluate_branches(
+    grammar: Grammar,
+    tokens_manager: TokensManager,
+    branches: list[dict],
+    profile: ParseProfile | None = None,
+    budget: ParseBudget | None = None
+) -> AstNode:
+    error = None
+    start_position = tokens_manager.position
+    for branch in branches:
+        try:
+            return evaluate_sequence(
+                grammar, tokens_manager, branch["sequence"], profile, budget
+            )
+        except ParseAbortedError:
+            raise
+        except Exception as e:
+            tokens_manager.set_position(start_position)
+            error = e
+            continue
+
+    raise error or AstParseError("Factored rule has no branches.")
+
+
 def evaluate_rule(
     grammar: Grammar,
     tokens_manager: TokensManager,
-    rule: dict
+    rule: dict,
+    profile: ParseProfile | None = None,
+    budget: ParseBudget | None = None
 ) -> AstNode:
-    tokens = tokens_manager.tokens
     literal = rule.get("literal")
     if literal is not None:
-        ast_node = evaluate_literal(tokens, literal)
+        ast_node = evaluate_literal(tokens_manager, literal)
         return ast_node
     
     regex = rule.get("regex")
     if regex is not None:
-        ast_node = evaluate_regex(tokens, regex)
+        ast_node = evaluate_regex(tokens_manager, regex)
         return ast_node
     
     sequence = rule.get("sequence")
     if sequence is not None:
-        mutable_tokens_manager = tokens_manager.copy()
-        ast_node = evaluate_sequence(grammar, mutable_tokens_manager, sequence)
-        mutated_tokens = mutable_tokens_manager.tokens
-        tokens_manager.set_tokens(mutated_tokens)
+        ast_node = evaluate_sequence(
+            grammar, tokens_manager, sequence, profile, budget
+        )
         return ast_node
 
+    prefix = rule.get("prefix")
+    if prefix is not None:
+        head = evaluate_sequence(grammar, tokens_manager, prefix, profile, budget)
+        tail = evaluate_branches(
+            grammar, tokens_manager, rule["branches"], profile, budget
+        )
+        return {"children": [*head["children"], *tail["children"]]}
+
     raise AstParseError(f"Invalid rule: {rule}")
 
 
 def evaluate_node(
     grammar: Grammar,
     tokens_manager: TokensManager,
-    node: str
+    node: str,
+    profile: ParseProfile | None = None,
+    budget: ParseBudget | None = None
 ) -> AstNode:
+    if budget is not None:
+        budget.check()
+
     rules = grammar.get(node, [])
     if not rules:
         raise AstParseError(
@@ -103,22 +289,32 @@ def evaluate_node(
 
     error = None
     ast_node = None
-    for rule in rules:
+    start_position = tokens_manager.position
+    for index, rule in enumerate(rules):
+        start = time.perf_counter() if profile is not None else 0.0
         try:
-            mutable_tokens_manager = tokens_manager.copy()
-            rule_node = evaluate_rule(grammar, mutable_tokens_manager, rule)
+            rule_node = evaluate_rule(
+                grammar, tokens_manager, rule, profile, budget
+            )
 
-            remaining_tokens = mutable_tokens_manager.tokens
-            if node == ROOT and remaining_tokens:
+            if node == ROOT and tokens_manager.has_tokens():
                 raise AstParseError(
                     "Could not apply `root` rule to remaining tokens: "
-                    f"{remaining_tokens}"
+                    f"{tokens_manager.tokens}"
                 )
 
-            tokens_manager.set_tokens(remaining_tokens)
             ast_node = rule_node
+            if profile is not None:
+                elapsed = time.perf_counter() - start
+                profile.record(node, index, True, elapsed)
             break
+        except ParseAbortedError:
+            raise
         except Exception as e:
+            tokens_manager.set_position(start_position)
+            if profile is not None:
+                elapsed = time.perf_counter() - start
+                profile.record(node, index, False, elapsed)
             error = e
             continue
 
@@ -133,19 +329,38 @@ def evaluate_node(
         )
 
     ast_node = {"type": node, **ast_node}
+    if tokens_manager.offsets:
+        start, end = tokens_manager.get_offsets(
+            start_position, tokens_manager.position
+        )
+        ast_node["start"] = start
+        ast_node["end"] = end
     return ast_node
 
 
-def parse_ast(grammar: Grammar, source: str) -> AstNode:
-    tokens = get_tokens_string_safe(source)
-    tokens_manager = TokensManager(tokens)
-    root = evaluate_node(grammar, tokens_manager, ROOT)
-
-    remaining_tokens = tokens_manager.tokens
-    if remaining_tokens:
+def parse_ast(
+    grammar: Grammar,
+    source: str,
+    profile: ParseProfile | None = None,
+    budget: ParseBudget | None = None,
+    offsets: bool = False
+) -> AstNode:
+    """
+    Parses `source` into an AST using `grammar`.
+    - Pass a `ParseProfile` to collect per-rule attempt counts and timings.
+    - Pass a `ParseBudget` to stop parses that run too long or do too much.
+    - Pass `offsets` to add the `start` and `end` of each node's source text.
+    """
+    spans = get_token_spans(source)
+    if budget is not None:
+        budget.check_tokens(spans)
+    tokens_manager = TokensManager(spans, offsets=offsets)
+    root = evaluate_node(grammar, tokens_manager, ROOT, profile, budget)
+
+    if tokens_manager.has_tokens():
         raise AstParseError(
             "Satisfied `root` rule, but unparsed tokens remain: "
-            f"{remaining_tokens}"
+            f"{tokens_manager.tokens}"
         )
 
     children = root.get("children")
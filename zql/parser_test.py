@@ -1,5 +1,12 @@
 import pytest
-from zql.parser import AstParseError, parse_ast
+from zql.parser import (
+    AstParseError,
+    ParseBudget,
+    ParseLimitError,
+    ParseTimeoutError,
+    parse_ast,
+)
+from zql.grammar import compile_grammar
 from zql.sample_grammars import FORMULA_GRAMMAR, LIST_GRAMMAR
 
 
@@ -120,4 +127,64 @@ def test_parse_ast_list_simple():
             {"type": "end", "value": "0"},
         ],
     }
-    assert actual == expected
\ No newline at end of file
+    assert actual == expected
+
+
+@pytest.mark.parametrize("source", ["7 * c", "(A + 12) - 0", "((1))"])
+def test_parse_ast_compiled_grammar_same_ast(source):
+    compiled = compile_grammar(FORMULA_GRAMMAR)
+    assert parse_ast(compiled, source) == parse_ast(FORMULA_GRAMMAR, source)
+
+
+def test_parse_ast_budget_cancelled():
+    budget = ParseBudget()
+    budget.cancel()
+    with pytest.raises(ParseTimeoutError) as err:
+        parse_ast(FORMULA_GRAMMAR, "(A + 12) - 0", budget=budget)
+    assert str(err.value) == "Parse was cancelled."
+
+
+def test_parse_ast_budget_expired_is_not_backtracked():
+    budget = ParseBudget(timeout=0)
+    with pytest.raises(ParseTimeoutError) as err:
+        parse_ast(FORMULA_GRAMMAR, "7 * c", budget=budget)
+    assert str(err.value) == "Parse took longer than 0s."
+
+
+def test_parse_ast_budget_not_reached():
+    budget = ParseBudget(timeout=60)
+    actual = parse_ast(FORMULA_GRAMMAR, "7 * c", budget=budget)
+    assert actual == parse_ast(FORMULA_GRAMMAR, "7 * c")
+
+
+def test_parse_ast_budget_max_attempts():
+    budget = ParseBudget(max_attempts=5)
+    with pytest.raises(ParseLimitError) as err:
+        parse_ast(FORMULA_GRAMMAR, "(A + 12) - 0", budget=budget)
+    assert str(err.value) == "Parse attempted more than 5 rules."
+    assert budget.attempts == 6
+
+
+def test_parse_ast_budget_max_tokens():
+    budget = ParseBudget(max_tokens=3)
+    with pytest.raises(ParseLimitError) as err:
+        parse_ast(FORMULA_GRAMMAR, "(A + 12) - 0", budget=budget)
+    assert str(err.value) == "Got 7 tokens. Expected at most 3."
+    assert budget.attempts == 0
+
+
+def test_parse_ast_budget_counts_work():
+    budget = ParseBudget(max_attempts=1000, max_tokens=3)
+    parse_ast(FORMULA_GRAMMAR, "7 * c", budget=budget)
+    assert budget.tokens == 3
+    assert 0 < budget.attempts <= 1000
+
+
+def test_parse_ast_offsets():
+    source = " 7 *  c "
+    actual = parse_ast(FORMULA_GRAMMAR, source, offsets=True)
+    assert (actual["start"], actual["end"]) == (1, 7)
+    number, operator, word = actual["children"]
+    assert source[number["start"]:number["end"]] == "7"
+    assert source[operator["start"]:operator["end"]] == "*"
+    assert source[word["start"]:word["end"]] == "c"
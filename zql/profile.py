@@ -0,0 +1,134 @@
+import argparse
+import re
+import sys
+
+from zql.grammar import Grammar, parse_grammar
+from zql.loader import ZQL_GRAMMAR_PATH
+from zql.parser import ParseProfile, parse_ast
+
+
+SPACE = " "
+BLANK_LINES_REGEX = re.compile(r"\n\s*\n")
+SORT_KEYS = ["wasted_time", "failures", "attempts", "time"]
+REPORT_COLUMNS = [
+    ("node", 18),
+    ("alt", 4),
+    ("attempts", 9),
+    ("successes", 10),
+    ("failures", 9),
+    ("wasted_ms", 10),
+    ("time_ms", 10),
+    ("rule", 0),
+]
+
+
+def split_queries(content: str) -> list[str]:
+    """Splits a file of queries separated by one or more blank lines."""
+    chunks = BLANK_LINES_REGEX.split(content)
+    queries = [c.strip() for c in chunks if c.strip()]
+    return queries
+
+
+def describe_rule(rule: dict) -> str:
+    """Renders a grammar rule back to its `.tmjd` source form."""
+    if "literal" in rule:
+        return f"\"{rule['literal']}\""
+    if "regex" in rule:
+        return f"r{rule['regex']}"
+    if "prefix" in rule:
+        branches = [SPACE.join(b["sequence"]) for b in rule["branches"]]
+        return f"{SPACE.join(rule['prefix'])} ({' | '.join(branches)})"
+    return SPACE.join(rule.get("sequence", []))
+
+
+def profile_queries(
+    grammar: Grammar,
+    queries: list[str]
+) -> tuple[ParseProfile, list[str]]:
+    """
+    Parses every query with a shared profile. Queries that fail to parse still
+    count towards the profile, and their errors are returned for reporting.
+    """
+    profile = ParseProfile()
+    errors: list[str] = []
+    for query in queries:
+        try:
+            parse_ast(grammar, query, profile)
+        except Exception as e:
+            errors.append(f"{query[:40]!r}: {e}")
+    return profile, errors
+
+
+def get_report_rows(
+    grammar: Grammar,
+    profile: ParseProfile,
+    sort_by: str = "wasted_time"
+) -> list[dict]:
+    """Flattens profile stats into report rows, most expensive first."""
+    rows = []
+    for (node, index), stats in profile.stats.items():
+        rule = grammar[node][index]
+        rows.append({
+            "node": node,
+            "alt": index,
+            "rule": describe_rule(rule),
+            **stats,
+        })
+    rows.sort(key=lambda r: (-r[sort_by], r["node"], r["alt"]))
+    return rows
+
+
+def format_report(rows: list[dict]) -> str:
+    header = "".join(name.ljust(width) for name, width in REPORT_COLUMNS)
+    lines = [header.rstrip()]
+    for row in rows:
+        values = {
+            **row,
+            "wasted_ms": f"{row['wasted_time'] * 1000:.3f}",
+            "time_ms": f"{row['time'] * 1000:.3f}",
+        }
+        line = "".join(
+            str(values[name]).ljust(width) for name, width in REPORT_COLUMNS
+        )
+        lines.append(line.rstrip())
+    return "\n".join(lines)
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m zql.profile",
+        description=(
+            "Profile which grammar rules cost the most while parsing a file of "
+            "ZQL queries separated by blank lines."
+        ),
+    )
+    parser.add_argument("queries", help="File of queries, or `-` for stdin.")
+    parser.add_argument("--grammar", default=ZQL_GRAMMAR_PATH)
+    parser.add_argument("--sort", choices=SORT_KEYS, default="wasted_time")
+    parser.add_argument("--top", type=int, default=30)
+    args = parser.parse_args(argv)
+
+    with open(args.grammar, "r") as file:
+        grammar = parse_grammar(file.read())
+
+    if args.queries == "-":
+        content = sys.stdin.read()
+    else:
+        with open(args.queries, "r") as file:
+            content = file.read()
+
+    queries = split_queries(content)
+    profile, errors = profile_queries(grammar, queries)
+    rows = get_report_rows(grammar, profile, args.sort)
+    if args.top > 0:
+        rows = rows[:args.top]
+
+    print(format_report(rows))
+    print(f"\nParsed {len(queries) - len(errors)}/{len(queries)} queries.")
+    for error in errors:
+        print(f"Failed {error}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,73 @@
+from zql.parser import ParseProfile, parse_ast
+from zql.profile import (
+    describe_rule,
+    format_report,
+    get_report_rows,
+    profile_queries,
+    split_queries,
+)
+from zql.sample_grammars import FORMULA_GRAMMAR
+
+
+def test_parse_ast_profile_counts_alternatives():
+    profile = ParseProfile()
+    parse_ast(FORMULA_GRAMMAR, "7 * c", profile)
+
+    # `formula: expr operator expr` is tried first and matches.
+    formula = profile.stats[("formula", 0)]
+    assert formula["attempts"] == 1
+    assert formula["successes"] == 1
+    assert formula["failures"] == 0
+
+    # `expr: open formula close` fails on both `7` and `c`.
+    expr_open = profile.stats[("expr", 0)]
+    assert expr_open["attempts"] == 2
+    assert expr_open["failures"] == 2
+    assert expr_open["wasted_time"] == expr_open["time"]
+
+    # `expr: word` fails on `7` and matches `c`.
+    expr_word = profile.stats[("expr", 1)]
+    assert expr_word["attempts"] == 2
+    assert expr_word["successes"] == 1
+    assert expr_word["failures"] == 1
+
+    assert ("formula", 1) not in profile.stats
+
+
+def test_split_queries():
+    content = """
+    its giving 1
+    no cap
+
+    its giving 2 no cap
+
+
+    its giving 3 no cap
+    """
+    actual = split_queries(content)
+    expected = [
+        "its giving 1\n    no cap",
+        "its giving 2 no cap",
+        "its giving 3 no cap",
+    ]
+    assert actual == expected
+
+
+def test_describe_rule():
+    assert describe_rule({"sequence": ["expr", "operator"]}) == "expr operator"
+    assert describe_rule({"literal": "+"}) == "\"+\""
+    assert describe_rule({"regex": "[0-9]+"}) == "r[0-9]+"
+
+
+def test_get_report_rows_sorted_by_waste():
+    profile, errors = profile_queries(FORMULA_GRAMMAR, ["7 * c", "(A + 1)", "?"])
+    assert len(errors) == 1
+
+    rows = get_report_rows(FORMULA_GRAMMAR, profile, "failures")
+    failures = [row["failures"] for row in rows]
+    assert failures == sorted(failures, reverse=True)
+
+    report = format_report(rows)
+    lines = report.split("\n")
+    assert lines[0].startswith("node")
+    assert len(lines) == len(rows) + 1
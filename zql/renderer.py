@@ -1,63 +1,264 @@
-from zql.grammar import Grammar
+from string import Formatter
+from typing import Any, Callable, TextIO
+
+from zql.grammar import Grammar, expand_rule
 from zql.parser import AstNode
+from zql.sharing import find_shared_nodes
 from zql.types import SqlQuery
 
 
 RuleKey = tuple[str, list[str]]
 Template = str
 TemplateLookup = dict[RuleKey, Template]
+ParameterLifts = dict[str, Callable[[str], Any]]
+Segment = tuple[str, str | None]
+CompiledTemplate = list[Segment]
+CompiledLookup = dict[str, CompiledTemplate]
+Placeholders = dict[int, str]
+Literals = list[tuple[Any, bool]]
+Memo = dict[int, str | None]
+Write = Callable[[str], Any]
 
 
 SPACE = " "
 SEQUENCE_RULE_TYPE = "sequence"
 NON_CHILDREN_RULE_TYPES = {"literal", "regex"}
+PRETTY_MODE = "pretty"
+COMPACT_MODE = "compact"
+RENDER_MODES = {PRETTY_MODE, COMPACT_MODE}
+TEMPLATE_FORMATTER = Formatter()
 
 
 class QueryRenderError(Exception):
     pass
 
 
-def render_query(grammar: Grammar, ast: AstNode) -> SqlQuery:
-    template_lookup = get_template_lookup(grammar)
-    return render_with_grammar(grammar, template_lookup, ast)
+def render_query(
+    grammar: Grammar,
+    ast: AstNode,
+    mode: str = PRETTY_MODE
+) -> SqlQuery:
+    return QueryRenderer(grammar, mode).render(ast)
 
 
-def render_with_grammar(
+def render_parameterized(
     grammar: Grammar,
-    lookup: TemplateLookup,
-    ast: AstNode
-) -> SqlQuery:
-    node_type = ast.get("type")
-    children = ast.get("children", [])
-    if not node_type:
-        raise QueryRenderError(f"Node should have a `type`: {ast}")
+    ast: AstNode,
+    lifts: ParameterLifts,
+    mode: str = PRETTY_MODE,
+    inline: frozenset[str] = frozenset()
+) -> tuple[SqlQuery, list]:
+    """
+    Renders a query with the nodes named in `lifts` replaced by numbered `?N`
+    placeholders. Each lift converts the node's rendered text to a parameter
+    value, or returns `None` to keep the text inline. Nodes below a node type
+    in `inline` are never lifted. Placeholders are numbered in source order,
+    so templates may reorder them freely.
+    """
+    renderer = QueryRenderer(grammar, mode)
+    return renderer.render_parameterized(ast, lifts, inline=inline)
+
+
+def render_to(
+    writer: TextIO,
+    grammar: Grammar,
+    ast: AstNode,
+    mode: str = PRETTY_MODE
+):
+    QueryRenderer(grammar, mode).render_to(writer, ast)
+
 
-    template = maybe_get_template(lookup, ast)
-    if template:
-        kwargs = {
-            c.get("type"): render_with_grammar(grammar, lookup, c)
-            for c in children
-        }
-        rendered = template.format(**kwargs)
-        return rendered
+def check_render_mode(mode: str):
+    if mode not in RENDER_MODES:
+        expected = ", ".join(sorted(RENDER_MODES))
+        raise QueryRenderError(
+            f"Expected render mode to be one of: {expected}. Got `{mode}`."
+        )
 
-    if children:
-        args = [render_with_grammar(grammar, lookup, c) for c in children]
-        rendered = SPACE.join(args)
-        return rendered
 
-    value = ast.get("value")
-    if value is not None:
-        return value
+class QueryRenderer:
+    """
+    Renders ASTs with the templates of one grammar. Templates are split into
+    literal and placeholder segments once, up front. Rendering writes each
+    fragment to a single buffer that is joined at the end, so the cost grows
+    with the size of the SQL rather than its size times the tree depth.
+    - `pretty` mode lays SQL out for people with the `>` templates.
+    - `compact` mode prefers the `~` templates, which drop layout whitespace,
+      for SQL that is only executed or used as a cache key.
+    """
 
-    raise QueryRenderError(f"Unable to render node: `{node_type}`.")
+    def __init__(self, grammar: Grammar, mode: str = PRETTY_MODE):
+        check_render_mode(mode)
+        self.grammar = grammar
+        self.mode = mode
+        lookup = get_template_lookup(grammar, mode)
+        self.lookup = compile_template_lookup(lookup)
 
+    def render(self, ast: AstNode, memoize: bool = False) -> SqlQuery:
+        """
+        Renders an AST to SQL. With `memoize`, each subtree that appears more
+        than once, as in trees from `share_subtrees`, is rendered only once.
+        """
+        fragments: list[str] = []
+        memo = get_memo(ast) if memoize else None
+        self.write_node(fragments.append, ast, {}, memo)
+        return "".join(fragments)
 
-def get_template_lookup(grammar: Grammar) -> TemplateLookup:
+    def render_to(self, writer: TextIO, ast: AstNode):
+        """
+        Writes SQL to a text stream, such as a file or `sys.stdout`, fragment
+        by fragment as the tree is walked, without building the whole string.
+        If rendering fails, the fragments written so far stay in `writer`.
+        """
+        self.write_node(writer.write, ast, {})
+
+    def render_parameterized(
+        self,
+        ast: AstNode,
+        lifts: ParameterLifts,
+        memoize: bool = False,
+        inline: frozenset[str] = frozenset(),
+        literals: Literals | None = None
+    ) -> tuple[SqlQuery, list]:
+        params: list = []
+        placeholders = self.lift_params(ast, lifts, params, inline, literals)
+        fragments: list[str] = []
+        memo = get_memo(ast) if memoize else None
+        self.write_node(fragments.append, ast, placeholders, memo)
+        return "".join(fragments), params
+
+    def lift_params(
+        self,
+        ast: AstNode,
+        lifts: ParameterLifts,
+        params: list,
+        inline: frozenset[str] = frozenset(),
+        literals: Literals | None = None
+    ) -> Placeholders:
+        """
+        Converts lifted nodes to parameters in source order, appending them to
+        `params`. Returns the placeholder to write for each lifted node, keyed
+        by node identity. Nodes inside a lifted node, or below a node type in
+        `inline`, are never lifted. A node shared by several places in the
+        tree is one parameter for all of them, so it must not be shared with
+        an `inline` subtree. If given, `literals` collects every value a lift
+        accepts, in source order, with whether it became a parameter.
+        """
+        placeholders: Placeholders = {}
+        stack = [(ast, False)]
+        while stack:
+            node, is_inline = stack.pop()
+            node_type = node.get("type")
+            if node_type in lifts:
+                if id(node) in placeholders:
+                    continue
+                value = lifts[node_type](self.render(node))
+                if value is None:
+                    continue
+                if literals is not None:
+                    literals.append((value, not is_inline))
+                if not is_inline:
+                    params.append(value)
+                    placeholders[id(node)] = f"?{len(params)}"
+                continue
+            is_inline = is_inline or node_type in inline
+            children = node.get("children", [])
+            stack.extend((child, is_inline) for child in reversed(children))
+        return placeholders
+
+    def write_node(
+        self,
+        write: Write,
+        ast: AstNode,
+        placeholders: Placeholders,
+        memo: Memo | None = None
+    ):
+        if memo and id(ast) in memo:
+            # Take the entry out while rendering, so the subtree is written
+            # once in full, then reuse its SQL at every later occurrence.
+            rendered = memo.pop(id(ast))
+            if rendered is None:
+                fragments: list[str] = []
+                self.write_node(fragments.append, ast, placeholders, memo)
+                rendered = "".join(fragments)
+            memo[id(ast)] = rendered
+            write(rendered)
+            return
+
+        node_type = ast.get("type")
+        children = ast.get("children", [])
+        if not node_type:
+            raise QueryRenderError(f"Node should have a `type`: {ast}")
+
+        placeholder = placeholders.get(id(ast))
+        if placeholder is not None:
+            write(placeholder)
+            return
+
+        template = self.get_template(ast)
+        if template is not None:
+            # Like `str.format`, the last child of a repeated type wins.
+            fields = {c.get("type"): c for c in children}
+            for literal, field in template:
+                if literal:
+                    write(literal)
+                if field is None:
+                    continue
+                child = fields.get(field)
+                if child is None:
+                    raise QueryRenderError(
+                        f"Template for `{node_type}` has no `{field}` child."
+                    )
+                self.write_node(write, child, placeholders, memo)
+            return
+
+        if children:
+            for n, child in enumerate(children):
+                if n > 0:
+                    write(SPACE)
+                self.write_node(write, child, placeholders, memo)
+            return
+
+        value = ast.get("value")
+        if value is not None:
+            write(value)
+            return
+
+        raise QueryRenderError(f"Unable to render node: `{node_type}`.")
+
+    def get_template(self, ast: AstNode) -> CompiledTemplate | None:
+        node = ast.get("type")
+        children = ast.get("children", [])
+
+        if children:
+            rule_pattern = [child.get("type") for child in children]
+            key = SPACE.join([node, *rule_pattern])
+            return self.lookup.get(key)
+
+        for rule_type in NON_CHILDREN_RULE_TYPES:
+            key = SPACE.join([node, rule_type])
+            template = self.lookup.get(key)
+            if template is not None:
+                return template
+
+        return None
+
+
+def get_memo(ast: AstNode) -> Memo:
+    return dict.fromkeys(find_shared_nodes(ast))
+
+
+def get_template_lookup(
+    grammar: Grammar,
+    mode: str = PRETTY_MODE
+) -> TemplateLookup:
     template_lookup: TemplateLookup = {}
     for node, rules in grammar.items():
-        for rule in rules:
+        expanded_rules = [r for rule in rules for r in expand_rule(rule)]
+        for rule in expanded_rules:
             template = rule.get("template")
+            if mode == COMPACT_MODE:
+                template = rule.get("compact_template", template)
             if template is None:
                 continue
 
@@ -81,20 +282,32 @@ def get_rule_key(node: str, rule: dict) -> RuleKey:
     raise QueryRenderError(f"Unable to determine pattern of node: `{node}`.")
 
 
-def maybe_get_template(lookup: TemplateLookup, ast: AstNode) -> Template | None:
-    node = ast.get("type")
-    children = ast.get("children", [])
+def compile_template(template: Template) -> CompiledTemplate:
+    """
+    Splits a template into `(literal, field)` segments, where `field` names
+    the child to render after the literal, or is `None` at the end.
+    """
+    try:
+        parsed = list(TEMPLATE_FORMATTER.parse(template))
+    except ValueError as ve:
+        raise QueryRenderError(f"Invalid template {template!r}: {ve}")
 
-    if children:
-        rule_pattern = [child.get("type") for child in children]
-        key = SPACE.join([node, *rule_pattern])
-        template = lookup.get(key)
-        return template
+    segments: CompiledTemplate = []
+    pending = ""
+    for literal, field, spec, conversion in parsed:
+        if field == "" or spec or conversion:
+            raise QueryRenderError(
+                f"Template placeholders must name a child: {template!r}"
+            )
+        # Escaped braces split literals, so merge them back together.
+        pending += literal
+        if field is not None:
+            segments.append((pending, field))
+            pending = ""
+    if pending or not segments:
+        segments.append((pending, None))
+    return segments
 
-    for rule_type in NON_CHILDREN_RULE_TYPES:
-        key = SPACE.join([node, rule_type])
-        template = lookup.get(key)
-        if template is not None:
-            return template
 
-    return None
+def compile_template_lookup(lookup: TemplateLookup) -> CompiledLookup:
+    return {key: compile_template(t) for key, t in lookup.items()}
@@ -1,6 +1,18 @@
+import io
+
 import pytest
+from zql.grammar import compile_grammar
 from zql.parser import parse_ast
-from zql.renderer import QueryRenderError, render_query
+from zql.renderer import (
+    COMPACT_MODE,
+    PRETTY_MODE,
+    QueryRenderError,
+    QueryRenderer,
+    compile_template,
+    render_parameterized,
+    render_query,
+    render_to,
+)
 from zql.sample_grammars import FUNCTION_GRAMMAR
 
 
@@ -65,3 +77,98 @@ def test_render_fail_no_rule_key():
         render_query(grammar_invalid_rule, {"type": "start"})
     actual = str(err.value)
     assert actual == "Unable to determine pattern of node: `start`."
+
+
+def test_render_compiled_grammar():
+    compiled = compile_grammar(FUNCTION_GRAMMAR)
+    ast = parse_ast(compiled, "(2 + 3) / (1000 * K)")
+    actual = render_query(compiled, ast)
+    expected = render_query(FUNCTION_GRAMMAR, ast)
+    assert actual == expected
+
+
+def test_render_parameterized_numbers_in_source_order():
+    ast = parse_ast(FUNCTION_GRAMMAR, "(2 + 3) - (1000 * K)")
+    actual = render_parameterized(FUNCTION_GRAMMAR, ast, {"number": int})
+    expected = ("subtract(add(?1, ?2), multiply(?3, K))", [2, 3, 1000])
+    assert actual == expected
+
+
+def test_render_parameterized_keeps_unlifted_values_inline():
+    ast = parse_ast(FUNCTION_GRAMMAR, "2 + 3")
+    lifts = {"number": lambda text: None if text == "2" else int(text)}
+    actual = render_parameterized(FUNCTION_GRAMMAR, ast, lifts)
+    assert actual == ("add(2, ?1)", [3])
+
+
+def test_render_parameterized_keeps_inline_subtrees():
+    ast = parse_ast(FUNCTION_GRAMMAR, "(2 + 3) - 4")
+    lifts = {"number": int}
+    inline = frozenset({"arg1"})
+    actual = render_parameterized(FUNCTION_GRAMMAR, ast, lifts, inline=inline)
+    assert actual == ("subtract(add(2, 3), ?1)", [4])
+
+
+def test_render_parameterized_collects_literals():
+    ast = parse_ast(FUNCTION_GRAMMAR, "(2 + 3) - 4")
+    renderer = QueryRenderer(FUNCTION_GRAMMAR, PRETTY_MODE)
+    literals = []
+    renderer.render_parameterized(
+        ast, {"number": int}, inline=frozenset({"arg1"}), literals=literals
+    )
+    assert literals == [(2, False), (3, False), (4, True)]
+
+
+def test_compile_template_splits_literals_and_fields():
+    actual = compile_template("{{{a}}} + {b}!")
+    assert actual == [("{", "a"), ("} + ", "b"), ("!", None)]
+
+
+def test_compile_template_rejects_unnamed_fields():
+    with pytest.raises(QueryRenderError):
+        compile_template("{} + {0}")
+
+
+def test_render_template_without_matching_child():
+    grammar = {"start": [{"literal": "x", "template": "{missing}"}]}
+    with pytest.raises(QueryRenderError) as err:
+        render_query(grammar, {"type": "start", "value": "x"})
+    assert str(err.value) == "Template for `start` has no `missing` child."
+
+
+def test_renderer_reuses_compiled_templates():
+    renderer = QueryRenderer(FUNCTION_GRAMMAR)
+    first = renderer.render(parse_ast(FUNCTION_GRAMMAR, "2 + 3"))
+    second = renderer.render(parse_ast(FUNCTION_GRAMMAR, "(1000 * K) - 1"))
+    assert first == "add(2, 3)"
+    assert second == "subtract(multiply(1000, K), 1)"
+
+
+def test_render_to_writes_to_stream():
+    ast = parse_ast(FUNCTION_GRAMMAR, "(2 + 3) / (1000 * K)")
+    writer = io.StringIO()
+    render_to(writer, FUNCTION_GRAMMAR, ast)
+    assert writer.getvalue() == render_query(FUNCTION_GRAMMAR, ast)
+
+
+def test_render_compact_mode_prefers_compact_templates():
+    grammar = {
+        "root": [{
+            "sequence": ["a", "b"],
+            "template": "{a}\n{b}",
+            "compact_template": "{a} {b}",
+        }],
+        "a": [{"literal": "A"}],
+        "b": [{"literal": "B", "template": "b"}],
+    }
+    ast = {"type": "root", "children": [
+        {"type": "a", "value": "A"},
+        {"type": "b", "value": "B"},
+    ]}
+    assert render_query(grammar, ast) == "A\nb"
+    assert render_query(grammar, ast, COMPACT_MODE) == "A b"
+
+
+def test_render_unknown_mode():
+    with pytest.raises(QueryRenderError):
+        QueryRenderer(FUNCTION_GRAMMAR, "fancy")
@@ -0,0 +1,93 @@
+from zql.parser import AstNode
+
+
+SharedNodes = dict[tuple, AstNode]
+
+
+def get_node_key(node: AstNode, children: list[AstNode] | None) -> tuple:
+    """
+    Identifies a node by its own fields and the identity of its children,
+    which are already shared, so equal keys mean equal subtrees.
+    """
+    fields = tuple(sorted(
+        (name, value) for name, value in node.items() if name != "children"
+    ))
+    if children is None:
+        return fields, None
+    return fields, tuple(id(child) for child in children)
+
+
+def share_subtrees(
+    ast: AstNode,
+    table: SharedNodes | None = None,
+    distinct: frozenset[str] = frozenset()
+) -> AstNode:
+    """
+    Returns a copy of `ast` where structurally equal subtrees are a single
+    shared object, so repeated expressions are stored once. Pass the same
+    `table` to share subtrees across queries, and keep it for as long as the
+    trees are used, since keys hold the identity of shared children. Nodes
+    of a type in `distinct`, and every subtree holding one, are never shared.
+    The result must be treated as read only.
+    """
+    if table is None:
+        table = {}
+    shared_by_id: dict[int, AstNode] = {}
+    stack = [(ast, False)]
+    while stack:
+        node, is_expanded = stack.pop()
+        if id(node) in shared_by_id:
+            continue
+
+        children = node.get("children")
+        if children and not is_expanded:
+            stack.append((node, True))
+            stack.extend((child, False) for child in reversed(children))
+            continue
+
+        shared_children = None
+        if children is not None:
+            shared_children = [shared_by_id[id(child)] for child in children]
+        key = get_node_key(node, shared_children)
+        shared = table.get(key)
+        if shared is None:
+            shared = dict(node)
+            if shared_children is not None:
+                shared["children"] = shared_children
+            # A fresh copy has a new identity, so its parents stay distinct.
+            if node.get("type") not in distinct:
+                table[key] = shared
+        shared_by_id[id(node)] = shared
+
+    return shared_by_id[id(ast)]
+
+
+def find_shared_nodes(ast: AstNode) -> set[int]:
+    """Finds the ids of nodes with children that appear more than once."""
+    seen: set[int] = set()
+    shared: set[int] = set()
+    stack = [ast]
+    while stack:
+        node = stack.pop()
+        children = node.get("children")
+        if not children:
+            continue
+        if id(node) in seen:
+            shared.add(id(node))
+            continue
+        seen.add(id(node))
+        stack.extend(children)
+    return shared
+
+
+def count_nodes(ast: AstNode) -> int:
+    """Counts distinct node objects, so shared subtrees count once."""
+    seen: set[int] = set()
+    stack = [ast]
+    while stack:
+        node = stack.pop()
+        if id(node) in seen:
+            continue
+        seen.add(id(node))
+        stack.extend(node.get("children", []))
+    return len(seen)
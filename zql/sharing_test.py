@@ -0,0 +1,63 @@
+from zql.parser import parse_ast
+from zql.renderer import QueryRenderer
+from zql.sample_grammars import FUNCTION_GRAMMAR
+from zql.sharing import count_nodes, find_shared_nodes, share_subtrees
+
+
+def test_share_subtrees_shares_equal_subtrees():
+    ast = parse_ast(FUNCTION_GRAMMAR, "(2 + 3) - (2 + 3)")
+    shared = share_subtrees(ast)
+    arg1, _, arg2 = shared["children"]
+    left, right = arg1["children"][0], arg2["children"][0]
+    assert shared == ast
+    assert left is right
+    assert count_nodes(shared) < count_nodes(ast)
+
+
+def test_share_subtrees_across_queries():
+    table = {}
+    first = share_subtrees(parse_ast(FUNCTION_GRAMMAR, "(2 + 3) - K"), table)
+    second = share_subtrees(parse_ast(FUNCTION_GRAMMAR, "(2 + 3) * K"), table)
+    first_left = first["children"][0]["children"][0]
+    second_left = second["children"][0]["children"][0]
+    assert first_left is second_left
+
+
+def test_share_subtrees_keeps_offsets_apart():
+    ast = parse_ast(FUNCTION_GRAMMAR, "(2 + 3) - (2 + 3)", offsets=True)
+    arg1, _, arg2 = share_subtrees(ast)["children"]
+    left, right = arg1["children"][0], arg2["children"][0]
+    assert left["start"] != right["start"]
+    assert left is not right
+
+
+def test_find_shared_nodes():
+    shared = share_subtrees(parse_ast(FUNCTION_GRAMMAR, "(2 + 3) - (2 + 3)"))
+    arg1 = shared["children"][0]
+    # Nodes inside a shared subtree are only reached through it.
+    assert find_shared_nodes(shared) == {id(arg1["children"][0])}
+
+
+def test_memoized_render_matches_plain_render():
+    renderer = QueryRenderer(FUNCTION_GRAMMAR)
+    ast = parse_ast(FUNCTION_GRAMMAR, "((2 + 3) - (2 + 3)) * ((2 + 3) - K)")
+    shared = share_subtrees(ast)
+    assert renderer.render(shared, memoize=True) == renderer.render(ast)
+
+
+def test_memoized_render_parameterized_reuses_shared_params():
+    renderer = QueryRenderer(FUNCTION_GRAMMAR)
+    shared = share_subtrees(parse_ast(FUNCTION_GRAMMAR, "(2 + 3) - (2 + 4)"))
+    lifts = {"number": int}
+    sql, params = renderer.render_parameterized(shared, lifts, memoize=True)
+    assert sql == "subtract(add(?1, ?2), add(?1, ?3))"
+    assert params == [2, 3, 4]
+
+
+def test_share_subtrees_keeps_distinct_types_apart():
+    ast = parse_ast(FUNCTION_GRAMMAR, "(2 + 3) - (2 + 3)")
+    shared = share_subtrees(ast, distinct=frozenset({"number"}))
+    arg1, _, arg2 = shared["children"]
+    left, right = arg1["children"][0], arg2["children"][0]
+    assert shared == ast
+    assert left is not right
@@ -0,0 +1,50 @@
+from zql.parser import AstNode
+
+
+QUERY_STMT = "query_stmt"
+DEFINITION_STMT = "definition_stmt"
+MANIPULATION_STMT = "manipulation_stmt"
+STATEMENT_KINDS = {QUERY_STMT, DEFINITION_STMT, MANIPULATION_STMT}
+TABLE_NODES = {"table_name", "db_table"}
+
+
+def find_nodes(ast: AstNode, node_types: set[str]) -> list[AstNode]:
+    """Finds all nodes of the given types, in source order."""
+    found = []
+    stack = [ast]
+    while stack:
+        node = stack.pop()
+        if node.get("type") in node_types:
+            found.append(node)
+        stack.extend(reversed(node.get("children", [])))
+    return found
+
+
+def get_statement_kind(ast: AstNode) -> str | None:
+    """
+    Classifies a ZQL AST as a `query_stmt`, `definition_stmt` or
+    `manipulation_stmt`.
+    """
+    statements = find_nodes(ast, STATEMENT_KINDS)
+    if not statements:
+        return None
+    return statements[0]["type"]
+
+
+def get_table_names(ast: AstNode) -> set[str]:
+    """
+    Lists the tables a statement refers to, casefolded because SQLite table
+    names are case insensitive. Tables qualified with a database keep only the
+    table name.
+    """
+    tables = set()
+    for node in find_nodes(ast, TABLE_NODES):
+        words = [c for c in node.get("children", []) if c.get("type") == "word"]
+        if not words:
+            continue
+        if node["type"] == "db_table":
+            name = words[-1]["value"]
+        else:
+            name = words[0]["value"]
+        tables.add(name.casefold())
+    return tables
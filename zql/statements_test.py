@@ -0,0 +1,36 @@
+import pytest
+from zql.main import Zql
+from zql.statements import get_statement_kind, get_table_names
+
+
+@pytest.mark.parametrize("raw_query,expected", [
+    ("its giving a yass t no cap", "query_stmt"),
+    ("whats good with its giving a yass t no cap", "query_stmt"),
+    ("pushin p into t (1, 'a') no cap", "manipulation_stmt"),
+    ("yeet girlie t no cap", "definition_stmt"),
+    ("built different girlie t be (a valid(varchar)) no cap", "definition_stmt"),
+])
+def test_get_statement_kind(raw_query, expected):
+    ast = Zql().parse_tree(raw_query)
+    assert get_statement_kind(ast) == expected
+
+
+def test_get_table_names_joins_and_sub_queries():
+    raw_query = """
+    its giving a.x, b.y
+    yass Apples a
+    come through (its giving y yass bananas) be b bet a.x be b.y
+    no cap
+    """
+    ast = Zql().parse_tree(raw_query)
+    assert get_table_names(ast) == {"apples", "bananas"}
+
+
+def test_get_table_names_qualified_table():
+    ast = Zql().parse_tree("yeet girlie db.peeps or nah no cap")
+    assert get_table_names(ast) == {"peeps"}
+
+
+def test_get_table_names_no_tables():
+    ast = Zql().parse_tree("its giving 1 no cap")
+    assert get_table_names(ast) == set()
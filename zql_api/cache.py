@@ -0,0 +1,197 @@
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable
+
+
+RESULT_CACHE_BYTES = int(os.environ.get("ZQL_RESULT_CACHE_BYTES", 32 * 2**20))
+RESULT_CACHE_TTL_SECONDS = float(os.environ.get("ZQL_RESULT_CACHE_TTL", "60"))
+SQL_WHITESPACE_REGEX = re.compile(r"('(?:[^']|'')*'|\"(?:[^\"]|\"\")*\")|\s+")
+# Counts writes whose tables are unknown, which make every result stale.
+ALL_TABLES = "*"
+
+
+def normalize_sql(sql: str) -> str:
+    """Collapses whitespace outside of quoted strings and identifiers."""
+    normalized = SQL_WHITESPACE_REGEX.sub(
+        lambda m: m.group(1) or " ", sql
+    )
+    return normalized.strip()
+
+
+def estimate_size(value: Any) -> int:
+    """Approximates the memory an entry holds by its JSON encoded length."""
+    return len(json.dumps(value, default=str))
+
+
+class TableVersions:
+    """
+    Counts writes to each table in a SQLite file, so worker processes on one
+    machine see each other's writes. A result is stale once the version of a
+    table it read, or of `ALL_TABLES`, has moved on.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(
+            path, check_same_thread=False, isolation_level=None
+        )
+        self.connection.execute("PRAGMA busy_timeout = 5000;")
+        self.connection.execute("PRAGMA journal_mode = WAL;")
+        self.connection.execute("""
+            CREATE TABLE IF NOT EXISTS table_versions(
+                name text PRIMARY KEY,
+                version integer NOT NULL
+            );
+        """)
+
+    def get(self, tables: set[str]) -> tuple[int, ...]:
+        names = sorted({ALL_TABLES, *tables})
+        placeholders = ", ".join("?" * len(names))
+        with self.lock:
+            rows = self.connection.execute(
+                "SELECT name, version FROM table_versions "
+                f"WHERE name IN ({placeholders});",
+                names,
+            ).fetchall()
+        versions = dict(rows)
+        return tuple(versions.get(name, 0) for name in names)
+
+    def bump(self, tables: set[str]):
+        """Counts a write to `tables`, or to every table if it is empty."""
+        names = tables or {ALL_TABLES}
+        with self.lock:
+            self.connection.executemany(
+                """
+                INSERT INTO table_versions VALUES (?, 1)
+                ON CONFLICT(name) DO UPDATE SET version = version + 1;
+                """,
+                [(name,) for name in names],
+            )
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
+
+
+Snapshot = tuple[int, tuple[int, ...] | None]
+
+
+class ResultCache:
+    """
+    LRU cache of query results with a time to live and a total size budget.
+    Each entry remembers the tables it read, so writes to a table evict every
+    result that depends on it. Safe to share across worker threads. Pass
+    shared `versions` when several processes write to one database, so each
+    cache also drops results that another process's writes made stale.
+    """
+
+    def __init__(
+        self,
+        max_bytes: int = RESULT_CACHE_BYTES,
+        ttl_seconds: float = RESULT_CACHE_TTL_SECONDS,
+        clock: Callable[[], float] = time.monotonic,
+        versions: TableVersions | None = None,
+    ):
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.clock = clock
+        self.versions = versions
+        self.entries: OrderedDict[Hashable, dict] = OrderedDict()
+        self.size = 0
+        self.generation = 0
+        self.lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Any | None:
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            if self.clock() >= entry["expires_at"]:
+                self.remove(key)
+                return None
+            self.entries.move_to_end(key)
+        if self.versions is not None:
+            if self.versions.get(entry["tables"]) != entry["versions"]:
+                with self.lock:
+                    if self.entries.get(key) is entry:
+                        self.remove(key)
+                return None
+        return entry["value"]
+
+    def snapshot(self, tables: set[str]) -> Snapshot:
+        """
+        Reads the writes a result of `tables` would reflect. Take a snapshot
+        before running a query and pass it to `put`, so a result that raced
+        with a write is dropped.
+        """
+        generation = self.generation
+        versions = None
+        if self.versions is not None:
+            versions = self.versions.get(tables)
+        return generation, versions
+
+    def put(
+        self,
+        key: Hashable,
+        value: Any,
+        tables: set[str],
+        snapshot: Snapshot | None = None
+    ):
+        """
+        Stores a result. Pass the `snapshot` taken before running the query
+        to drop results that raced with a write invalidating the cache.
+        """
+        size = estimate_size(value)
+        if size > self.max_bytes:
+            return
+
+        if snapshot is None:
+            snapshot = self.snapshot(tables)
+        generation, versions = snapshot
+        with self.lock:
+            if generation != self.generation:
+                return
+            if key in self.entries:
+                self.remove(key)
+            self.entries[key] = {
+                "value": value,
+                "tables": tables,
+                "versions": versions,
+                "size": size,
+                "expires_at": self.clock() + self.ttl_seconds,
+            }
+            self.size += size
+            while self.size > self.max_bytes:
+                oldest = next(iter(self.entries))
+                self.remove(oldest)
+
+    def invalidate(self, tables: set[str]):
+        """
+        Drops results that read any of `tables`. An empty set drops everything,
+        for statements whose effect on tables is unknown.
+        """
+        if self.versions is not None:
+            self.versions.bump(tables)
+        with self.lock:
+            self.generation += 1
+            if not tables:
+                self.entries.clear()
+                self.size = 0
+                return
+
+            stale = [
+                key for key, entry in self.entries.items()
+                if entry["tables"] & tables
+            ]
+            for key in stale:
+                self.remove(key)
+
+    def remove(self, key: Hashable):
+        entry = self.entries.pop(key)
+        self.size -= entry["size"]
@@ -0,0 +1,111 @@
+import os
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from sqlite3 import Connection
+from typing import Iterator
+
+
+DB_PATH = os.environ.get("ZQL_DB_PATH", "zql.db")
+POOL_SIZE = int(os.environ.get("ZQL_DB_POOL_SIZE", "8"))
+POOL_TIMEOUT_SECONDS = float(os.environ.get("ZQL_DB_POOL_TIMEOUT", "30"))
+STATEMENT_CACHE_SIZE = int(os.environ.get("ZQL_DB_STATEMENT_CACHE", "256"))
+MMAP_BYTES = int(os.environ.get("ZQL_DB_MMAP_BYTES", 256 * 2**20))
+READ_ONLY = os.environ.get("ZQL_DB_READ_ONLY", "0") == "1"
+BUSY_TIMEOUT_MS = 5000
+
+
+class PoolTimeoutError(Exception):
+    pass
+
+
+def connect(path: str, read_only: bool = False) -> Connection:
+    """
+    Opens a connection that may be used from any worker thread, one thread at
+    a time. WAL mode lets readers run while another connection writes, the
+    statement cache keeps repeated parameterized SQL prepared, and reads go
+    through a memory map of the database file.
+    - Read only connections open an existing database and never write to it,
+      so they leave the journal mode as it is.
+    """
+    if read_only:
+        path = f"{Path(path).absolute().as_uri()}?mode=ro"
+    connection = sqlite3.connect(
+        path,
+        check_same_thread=False,
+        cached_statements=STATEMENT_CACHE_SIZE,
+        uri=read_only,
+    )
+    connection.execute(f"PRAGMA busy_timeout = {BUSY_TIMEOUT_MS};")
+    connection.execute(f"PRAGMA mmap_size = {MMAP_BYTES};")
+    if not read_only:
+        connection.execute("PRAGMA journal_mode = WAL;")
+    return connection
+
+
+class ConnectionPool:
+    """
+    Bounded pool of SQLite connections. Connections are opened lazily up to
+    `size`, and callers wait for a free one once all are checked out.
+    """
+
+    def __init__(
+        self,
+        path: str = DB_PATH,
+        size: int = POOL_SIZE,
+        timeout: float = POOL_TIMEOUT_SECONDS,
+        read_only: bool = READ_ONLY,
+    ):
+        self.path = path
+        self.size = size
+        self.timeout = timeout
+        self.read_only = read_only
+        self.idle: queue.LifoQueue[Connection] = queue.LifoQueue()
+        self.opened = 0
+        self.lock = threading.Lock()
+
+    def acquire(self) -> Connection:
+        try:
+            return self.idle.get_nowait()
+        except queue.Empty:
+            pass
+
+        with self.lock:
+            if self.opened < self.size:
+                self.opened += 1
+                try:
+                    return connect(self.path, self.read_only)
+                except BaseException:
+                    self.opened -= 1
+                    raise
+
+        try:
+            return self.idle.get(timeout=self.timeout)
+        except queue.Empty:
+            raise PoolTimeoutError(
+                f"No database connection free after {self.timeout}s."
+            )
+
+    def release(self, connection: Connection):
+        if connection.in_transaction:
+            connection.rollback()
+        self.idle.put(connection)
+
+    @contextmanager
+    def connection(self) -> Iterator[Connection]:
+        connection = self.acquire()
+        try:
+            yield connection
+        finally:
+            self.release(connection)
+
+    def close(self):
+        with self.lock:
+            while True:
+                try:
+                    self.idle.get_nowait().close()
+                except queue.Empty:
+                    break
+            self.opened = 0
@@ -0,0 +1,111 @@
+import json
+import time
+from sqlite3 import Connection
+from typing import Iterable, Iterator
+
+from zql import Zql, ZqlParserError
+from zql.cleaner import split_statements
+from zql.statements import MANIPULATION_STMT, get_statement_kind, get_table_names
+
+
+INGEST_BATCH_SIZE = 1000
+
+
+class IngestError(Exception):
+    pass
+
+
+def iter_ndjson_statements(lines: Iterable[str]) -> Iterator[str]:
+    """
+    Reads statements from NDJSON, one per line, as either a JSON string or an
+    object with a `query` key. Blank lines are skipped.
+    """
+    for n, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            value = json.loads(line)
+        except json.JSONDecodeError as e:
+            raise IngestError(f"L{n}: Invalid JSON: {e}")
+
+        if isinstance(value, dict):
+            value = value.get("query")
+        if not isinstance(value, str):
+            raise IngestError(f"L{n}: Expected a string or a `query` object.")
+        yield value
+
+
+def iter_script_statements(script: str) -> Iterator[str]:
+    yield from split_statements(script)
+
+
+def ingest_statements(
+    connection: Connection,
+    statements: Iterable[str],
+    batch_size: int = INGEST_BATCH_SIZE
+) -> dict:
+    """
+    Runs ZQL statements in one transaction, so either all apply or none do.
+    - Consecutive manipulation statements with the same shape are transpiled
+      once and sent to `executemany` in batches of up to `batch_size` rows.
+    - Other statements run one at a time, in order.
+    Returns counts, timing and the tables written.
+    """
+    zql = Zql()
+    stats = {
+        "statements": 0,
+        "rows": 0,
+        "batches": 0,
+        "seconds": 0.0,
+        "rows_per_second": 0.0,
+        "tables": set(),
+    }
+    pending_sql: str | None = None
+    pending_params: list[list] = []
+
+    def flush():
+        nonlocal pending_sql, pending_params
+        if pending_sql is None:
+            return
+        connection.executemany(pending_sql, pending_params)
+        stats["rows"] += len(pending_params)
+        stats["batches"] += 1
+        pending_sql = None
+        pending_params = []
+
+    start = time.perf_counter()
+    try:
+        # Begin explicitly, since sqlite3 only opens a transaction on its own
+        # before data changes, which would leave a leading CREATE applied.
+        connection.execute("BEGIN;")
+        try:
+            for n, statement in enumerate(statements, start=1):
+                try:
+                    prepared = zql.prepare(statement)
+                except ZqlParserError as zpe:
+                    raise IngestError(f"Statement {n}: {zpe}")
+
+                ast = prepared["ast"]
+                stats["statements"] += 1
+                stats["tables"] |= get_table_names(ast)
+                if get_statement_kind(ast) != MANIPULATION_STMT:
+                    flush()
+                    connection.execute(prepared["sql"], prepared["params"])
+                    continue
+
+                is_full = len(pending_params) >= batch_size
+                if prepared["sql"] != pending_sql or is_full:
+                    flush()
+                pending_sql = prepared["sql"]
+                pending_params.append(prepared["params"])
+            flush()
+        except BaseException:
+            connection.rollback()
+            raise
+        connection.commit()
+    finally:
+        stats["seconds"] = time.perf_counter() - start
+
+    if stats["seconds"] > 0:
+        stats["rows_per_second"] = stats["rows"] / stats["seconds"]
+    return stats
@@ -1,26 +1,85 @@
+import asyncio
+import os
 import sqlite3
-from sqlite3 import Cursor
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from sqlite3 import Connection
 from pathlib import Path
+from typing import Any, AsyncIterator, Awaitable, Callable, Iterator
 
-from fastapi import FastAPI, Request, Form, Depends
+from fastapi import Body, FastAPI, Request, Form, Depends, HTTPException
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from fastapi.templating import Jinja2Templates
 
-from zql import Zql, ZqlParserError
+from zql import Zql, ZqlParserError, ZqlTimeoutError
+from zql.cache import SqliteCache
+from zql.main import SHAPE_CACHE_SIZE, ZQL_GRAMMAR_HASH, PreparedQuery
+from zql.parameters import inline_params
+from zql.parser import ParseBudget
+from zql.statements import QUERY_STMT, get_statement_kind, get_table_names
+from zql_api.cache import ResultCache, TableVersions, normalize_sql
+from zql_api.db import ConnectionPool, PoolTimeoutError
+from zql_api.ingest import (
+    IngestError,
+    ingest_statements,
+    iter_ndjson_statements,
+    iter_script_statements,
+)
+from zql_api.plan import (
+    find_full_scans,
+    get_index_hints,
+    get_plan_sql,
+    get_plan_tree,
+    strip_explain,
+)
+from zql_api.responses import CompactJSONResponse, dumps
 
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
 
 TEMPLATE_DIR = Path(__file__).resolve().parent / "templates"
+STREAM_BATCH_SIZE = 500
+MAX_ROWS = int(os.environ.get("ZQL_MAX_ROWS", "10000"))
+TRANSPILE_WORKERS = int(os.environ.get("ZQL_TRANSPILE_WORKERS", "4"))
+TRANSPILE_TIMEOUT_SECONDS = float(os.environ.get("ZQL_TRANSPILE_TIMEOUT", "2"))
+MAX_PARSE_ATTEMPTS = int(os.environ.get("ZQL_MAX_PARSE_ATTEMPTS", "200000"))
+MAX_PARSE_TOKENS = int(os.environ.get("ZQL_MAX_PARSE_TOKENS", "20000"))
+MAX_BATCH_SIZE = int(os.environ.get("ZQL_MAX_BATCH_SIZE", "1000"))
+BATCH_WORKERS = int(os.environ.get("ZQL_BATCH_WORKERS", "2"))
+BATCH_TIMEOUT_SECONDS = float(os.environ.get("ZQL_BATCH_TIMEOUT", "10"))
+DISCONNECT_POLL_SECONDS = 0.1
+GZIP_MINIMUM_BYTES = int(os.environ.get("ZQL_GZIP_MINIMUM_BYTES", "1000"))
+ROWS_FORMAT = "rows"
+COLUMNAR_FORMAT = "columnar"
+RESULT_FORMATS = {ROWS_FORMAT, COLUMNAR_FORMAT}
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+SEED_DB = os.environ.get("ZQL_DB_SEED", "1") == "1"
+SHARED_CACHE_PATH = os.environ.get("ZQL_SHARED_CACHE_PATH")
+
 
-def setup_db(session):
-    session.execute("DROP TABLE IF EXISTS peeps;")
+def setup_db(connection: Connection):
+    """
+    Creates and fills the demo `peeps` table unless it already has rows. The
+    write lock is taken up front, so when several workers start at once only
+    the first one seeds and the rest see the rows and skip.
+    """
+    session = connection.cursor()
+    session.execute("BEGIN IMMEDIATE;")
     session.execute("""
-        CREATE TABLE peeps(
+        CREATE TABLE IF NOT EXISTS peeps(
             name text,
             fave_color text,
             followers int,
             dank float
         );
     """)
+    count = session.execute("SELECT count(*) FROM peeps;").fetchone()[0]
+    if count:
+        session.connection.commit()
+        return
+
     session.execute("INSERT INTO peeps VALUES ('andrew', 'blue', 1700, 0.6);")
     session.execute("INSERT INTO peeps VALUES ('bella', 'green', 1000, 0.4);")
     session.execute("INSERT INTO peeps VALUES ('hugo', 'red', 1400, 0.5);")
@@ -38,9 +97,24 @@ def setup_db(session):
     session.connection.commit()
 
 
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    """
+    Seeds the demo data once the server starts, rather than on import, and
+    releases workers and connections on shutdown.
+    """
+    if SEED_DB and not pool.read_only:
+        with pool.connection() as connection:
+            await run_in_threadpool(setup_db, connection)
+    yield
+    transpile_executor.shutdown(cancel_futures=True)
+    batch_executor.shutdown(cancel_futures=True)
+    pool.close()
+
+
 templates = Jinja2Templates(directory=TEMPLATE_DIR)
 
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
 origins = [
     "http://localhost",
@@ -57,11 +131,28 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(GZipMiddleware, minimum_size=GZIP_MINIMUM_BYTES)
 
 
-connection = sqlite3.connect("zql.db")
-db_session = connection.cursor()
-setup_db(db_session)
+pool = ConnectionPool()
+result_cache = ResultCache()
+if SHARED_CACHE_PATH:
+    # Worker processes share transpiled query shapes through one local file,
+    # and count writes there so no worker serves results another made stale.
+    Zql.shape_cache = SqliteCache(
+        SHARED_CACHE_PATH, SHAPE_CACHE_SIZE, namespace=ZQL_GRAMMAR_HASH
+    )
+    result_cache = ResultCache(versions=TableVersions(SHARED_CACHE_PATH))
+transpile_executor = ThreadPoolExecutor(
+    max_workers=TRANSPILE_WORKERS,
+    thread_name_prefix="zql-transpile",
+)
+# Batches get their own workers, so a slow batch never queues ahead of
+# single transpiles.
+batch_executor = ThreadPoolExecutor(
+    max_workers=BATCH_WORKERS,
+    thread_name_prefix="zql-batch",
+)
 
 
 def get_result_dicts(rows: list[tuple], column_names: list[str]) -> list[dict]:
@@ -72,87 +163,509 @@ def get_result_dicts(rows: list[tuple], column_names: list[str]) -> list[dict]:
     results = [dict(zip(column_names, row)) for row in rows]
     return results
 
-@app.post("/transpile")
-async def transpile_query(query: str = Form(...)):
-    """Transpile ZQL to SQL"""
+
+class PageError(Exception):
+    pass
+
+
+def get_page_bounds(page: int | None, page_size: int | None) -> tuple[int, int]:
+    """
+    Resolves pagination parameters to a row offset and a page size. Page sizes
+    are capped at `MAX_ROWS`, which is also the size of the only page when no
+    parameters are given.
+    """
+    page = 1 if page is None else page
+    page_size = MAX_ROWS if page_size is None else page_size
+    if page < 1:
+        raise PageError(f"Expected `page` of at least 1. Got {page}.")
+    if page_size < 1:
+        raise PageError(f"Expected `page_size` of at least 1. Got {page_size}.")
+
+    page_size = min(page_size, MAX_ROWS)
+    offset = (page - 1) * page_size
+    return offset, page_size
+
+
+def execute_query(
+    sql: str,
+    params: list,
+    offset: int = 0,
+    page_size: int = MAX_ROWS
+) -> tuple[list[str], list[tuple], bool]:
+    """
+    Runs a query on a pooled connection and returns one page of rows, stepping
+    the cursor past `offset` rows without keeping them. Reads one extra row to
+    tell whether more pages follow. Blocking, so handlers call it through
+    `run_in_threadpool` to keep the event loop free.
+    """
+    with pool.connection() as connection:
+        cursor = connection.execute(sql, params)
+        skipped = 0
+        while skipped < offset:
+            batch = cursor.fetchmany(min(offset - skipped, STREAM_BATCH_SIZE))
+            if not batch:
+                break
+            skipped += len(batch)
+
+        rows = cursor.fetchmany(page_size + 1)
+        has_more = len(rows) > page_size
+        columns = []
+        if cursor.description:
+            columns = [col[0] for col in cursor.description]
+        connection.commit()
+        return columns, rows[:page_size], has_more
+
+
+def new_parse_budget() -> ParseBudget:
+    return ParseBudget(
+        timeout=TRANSPILE_TIMEOUT_SECONDS,
+        max_attempts=MAX_PARSE_ATTEMPTS,
+        max_tokens=MAX_PARSE_TOKENS,
+    )
+
+
+def get_parse_stats(budget: ParseBudget) -> dict:
+    return {"attempts": budget.attempts, "tokens": budget.tokens}
+
+
+async def run_transpile(
+    transpile: Callable[[str, ParseBudget], Any],
+    query: str,
+    budget: ParseBudget | None = None
+) -> Any:
+    """
+    Runs a transpile function on the bounded transpile pool, so CPU bound
+    parsing never blocks the event loop or starves database work. The budget
+    covers time spent waiting for a worker as well as parsing. When it runs
+    out of time, the parse is cancelled and `ZqlTimeoutError` is raised.
+    """
+    if budget is None:
+        budget = new_parse_budget()
+    loop = asyncio.get_running_loop()
+    future = loop.run_in_executor(transpile_executor, transpile, query, budget)
+    try:
+        return await asyncio.wait_for(future, TRANSPILE_TIMEOUT_SECONDS)
+    except asyncio.TimeoutError:
+        budget.cancel()
+        raise ZqlTimeoutError(
+            f"Transpiling took longer than {TRANSPILE_TIMEOUT_SECONDS}s."
+        )
+    except asyncio.CancelledError:
+        budget.cancel()
+        raise
+
+
+def transpile_for_batch(
+    query: str,
+    deadline: float,
+    budgets: list[ParseBudget]
+) -> dict:
+    """
+    Transpiles one batch item on a batch worker, in the time left before the
+    batch deadline. Its budget is added to `budgets`, so the batch can stop
+    items that are still parsing.
+    """
+    budget = ParseBudget(
+        timeout=max(deadline - time.perf_counter(), 0),
+        max_attempts=MAX_PARSE_ATTEMPTS,
+        max_tokens=MAX_PARSE_TOKENS,
+    )
+    budgets.append(budget)
     try:
-        return Zql().parse(query)
+        sql = Zql().parse(query, budget)
+        return {"sql": sql, "error": None}
     except ZqlParserError as zpe:
-        return str(zpe)
-    return transpiled_query, error_message
+        return {"sql": None, "error": str(zpe)}
 
-@app.post("/run")
-async def run_query(query: str = Form(...)) -> dict:
-    """Transpile ZQL to SQL"""
+
+async def transpile_batch(queries: list[str]) -> list[dict]:
+    """
+    Transpiles each distinct query once, fanned out across the batch pool,
+    and returns results in input order. The whole batch shares one deadline.
+    Items still queued when it passes are dropped and items still parsing are
+    stopped, and both report a timeout error. The same happens to every item
+    when the batch is cancelled, as when the client disconnects.
+    """
+    loop = asyncio.get_running_loop()
+    unique_queries = list(dict.fromkeys(queries))
+    deadline = time.perf_counter() + BATCH_TIMEOUT_SECONDS
+    budgets: list[ParseBudget] = []
+    futures = [
+        loop.run_in_executor(
+            batch_executor, transpile_for_batch, query, deadline, budgets
+        )
+        for query in unique_queries
+    ]
+    try:
+        await asyncio.wait(futures, timeout=BATCH_TIMEOUT_SECONDS)
+    finally:
+        for future in futures:
+            future.cancel()
+        for budget in list(budgets):
+            budget.cancel()
+
+    timed_out = {
+        "sql": None,
+        "error": f"Batch took longer than {BATCH_TIMEOUT_SECONDS}s.",
+    }
+    results = {
+        query: timed_out if future.cancelled() else future.result()
+        for query, future in zip(unique_queries, futures)
+    }
+    return [results[query] for query in queries]
+
+
+async def cancel_on_disconnect(request: Request, work: Awaitable) -> Any:
+    """
+    Awaits `work`, cancelling it if the client disconnects first, so work for
+    a client that is gone stops using workers.
+    """
+    task = asyncio.ensure_future(work)
+    while True:
+        done, _ = await asyncio.wait({task}, timeout=DISCONNECT_POLL_SECONDS)
+        if done:
+            return task.result()
+        if await request.is_disconnected():
+            task.cancel()
+            raise HTTPException(status_code=499, detail="Client disconnected.")
+
+
+def execute_statement(
+    prepared: PreparedQuery,
+    offset: int = 0,
+    page_size: int = MAX_ROWS
+) -> tuple[list[str], list[tuple], bool, bool]:
+    """
+    Runs a statement through the result cache. Queries are served from the
+    cache when possible, and statements that change the database evict cached
+    results for the tables they touch. Returns whether the result was cached.
+    """
+    ast, sql, params = prepared["ast"], prepared["sql"], prepared["params"]
+    tables = get_table_names(ast)
+    if get_statement_kind(ast) != QUERY_STMT:
+        try:
+            return *execute_query(sql, params, offset, page_size), False
+        finally:
+            result_cache.invalidate(tables)
+
+    key = (normalize_sql(sql), tuple(params), offset, page_size)
+    cached = result_cache.get(key)
+    if cached is not None:
+        return *cached, True
+
+    snapshot = result_cache.snapshot(tables)
+    result = execute_query(sql, params, offset, page_size)
+    result_cache.put(key, result, tables, snapshot)
+    return *result, False
+
+
+class ResultFormatError(Exception):
+    pass
+
+
+def check_result_format(result_format: str):
+    if result_format not in RESULT_FORMATS:
+        expected = ", ".join(sorted(RESULT_FORMATS))
+        raise ResultFormatError(
+            f"Expected `format` to be one of: {expected}. Got `{result_format}`."
+        )
+
+
+async def run_zql(
+    query: str,
+    page: int | None = None,
+    page_size: int | None = None,
+    result_format: str = ROWS_FORMAT,
+    pretty: bool = False
+) -> dict:
+    """
+    Transpiles and runs a ZQL query without blocking the event loop. The
+    `rows` format returns one dict per row. The `columnar` format returns
+    the column names once and each row as an array under `data`, so column
+    names are not repeated on every row. SQL is executed and returned in
+    compact form, unless `pretty` asks for it laid out for reading.
+    """
     error_message: str | None = None
     transpiled_query: str = ""
+    prepared: PreparedQuery = {}
+    budget = new_parse_budget()
+    offset = 0
     try:
-        transpiled_query = Zql().parse(query)
-    except ZqlParserError as zpe:
-        error_message = str(zpe)
-
+        check_result_format(result_format)
+        offset, page_size = get_page_bounds(page, page_size)
+        prepared = await run_transpile(Zql().prepare, query, budget)
+        if pretty:
+            transpiled_query = Zql().format(prepared)
+        else:
+            transpiled_query = inline_params(
+                prepared["sql"], prepared["params"], prepared["param_texts"]
+            )
+    except (ResultFormatError, PageError, ZqlParserError) as e:
+        error_message = str(e)
 
     columns: list[str] = []
-    results: list[dict] = []
+    rows: list[tuple] = []
+    has_more = False
+    cached = False
     if not error_message:
         try:
-            cursor = db_session.execute(transpiled_query)
-            rows = cursor.fetchall()
-            columns = []
-            if cursor.description:
-                columns = [col[0] for col in cursor.description]
-            connection.commit()
-            results = get_result_dicts(rows, columns)
-        except sqlite3.OperationalError as soe:
-            error_message = str(soe)
+            columns, rows, has_more, cached = await run_in_threadpool(
+                execute_statement, prepared, offset, page_size
+            )
+        except (sqlite3.OperationalError, PoolTimeoutError) as e:
+            error_message = str(e)
+
+    if result_format == COLUMNAR_FORMAT:
+        results = {"data": rows}
+    else:
+        results = {"rows": get_result_dicts(rows, columns)}
 
     return {
         "query": query,
         "transpiled_query": transpiled_query,
-        "rows": results,
+        **results,
         "columns": columns,
+        "page": page or 1,
+        "page_size": page_size,
+        "has_more": has_more,
+        "cached": cached,
+        "parse_stats": get_parse_stats(budget),
         "error_message": error_message,
     }
 
 
-@app.get("/")
-async def home(request: Request):
-    return templates.TemplateResponse(
-        "main.html", {"request": request}
-    )
+def explain_statement(prepared: PreparedQuery) -> dict:
+    """
+    Runs `EXPLAIN QUERY PLAN` for a statement and returns the plan tree, the
+    full table scans in it and indexes that could avoid them. Queries are also
+    run, bypassing the result cache, to time them. Statements that change the
+    database are only planned.
+    """
+    ast, sql, params = prepared["ast"], prepared["sql"], prepared["params"]
+    with pool.connection() as connection:
+        start = time.perf_counter()
+        rows = connection.execute(get_plan_sql(sql), params).fetchall()
+        plan_seconds = time.perf_counter() - start
+        plan = get_plan_tree(rows)
+        full_scans = find_full_scans(plan)
+        index_hints = get_index_hints(connection, ast, full_scans)
 
-@app.post("/")
-async def run_query(request: Request, query: str = Form(...)):
-    """Run ZQL query"""
-    error_message: str | None = None
-    transpiled_query: str = ""
+    execute_seconds = None
+    row_count = None
+    if get_statement_kind(ast) == QUERY_STMT:
+        start = time.perf_counter()
+        _, rows, _ = execute_query(strip_explain(sql), params)
+        execute_seconds = time.perf_counter() - start
+        row_count = len(rows)
+
+    return {
+        "plan": plan,
+        "full_scans": full_scans,
+        "index_hints": index_hints,
+        "plan_seconds": plan_seconds,
+        "execute_seconds": execute_seconds,
+        "row_count": row_count,
+    }
+
+
+async def run_explain(query: str) -> dict:
+    """Transpiles a ZQL query and explains how SQLite runs it, with timings."""
+    result = {
+        "query": query,
+        "transpiled_query": "",
+        "plan": [],
+        "full_scans": [],
+        "index_hints": [],
+        "timing": {},
+        "row_count": None,
+        "error_message": None,
+    }
+    start = time.perf_counter()
     try:
-        transpiled_query = Zql().parse(query)
+        prepared = await run_transpile(Zql().prepare, query)
     except ZqlParserError as zpe:
-        error_message = str(zpe)
+        return {**result, "error_message": str(zpe)}
+    transpile_seconds = time.perf_counter() - start
+    result["transpiled_query"] = inline_params(
+        prepared["sql"], prepared["params"], prepared["param_texts"]
+    )
 
-    columns: list[str] = []
-    results: list[dict] = []
-    if not error_message:
+    try:
+        explained = await run_in_threadpool(explain_statement, prepared)
+    except (sqlite3.OperationalError, PoolTimeoutError) as e:
+        return {**result, "error_message": str(e)}
+    result["timing"] = {
+        "transpile_seconds": transpile_seconds,
+        "plan_seconds": explained.pop("plan_seconds"),
+        "execute_seconds": explained.pop("execute_seconds"),
+    }
+    return {**result, **explained}
+
+
+def to_ndjson_line(value) -> bytes:
+    return dumps(value) + b"\n"
+
+
+def stream_query_rows(
+    header: dict,
+    sql: str,
+    params: list,
+    written_tables: set[str] | None = None
+) -> Iterator[bytes]:
+    """
+    Yields NDJSON for a query: one header object with the column names, then
+    one compact array per row. Rows are read with `fetchmany`, so memory stays
+    flat however many rows the query returns. A failure before the header is
+    reported in the header, and a failure afterwards as a final
+    `{"error_message": ...}` line. Pass `written_tables` for statements that
+    change the database, to evict cached results once they have run.
+    """
+    if header["error_message"]:
+        yield to_ndjson_line(header)
+        return
+
+    try:
+        yield from stream_rows(header, sql, params)
+    finally:
+        if written_tables is not None:
+            result_cache.invalidate(written_tables)
+
+
+def stream_rows(header: dict, sql: str, params: list) -> Iterator[bytes]:
+    with pool.connection() as connection:
         try:
-            cursor = db_session.execute(transpiled_query)
-            rows = cursor.fetchall()
-            columns = []
-            if cursor.description:
-                columns = [col[0] for col in cursor.description]
+            cursor = connection.execute(sql, params)
+        except sqlite3.OperationalError as soe:
+            yield to_ndjson_line({**header, "error_message": str(soe)})
+            return
+
+        columns = []
+        if cursor.description:
+            columns = [col[0] for col in cursor.description]
+        yield to_ndjson_line({**header, "columns": columns})
+
+        try:
+            while rows := cursor.fetchmany(STREAM_BATCH_SIZE):
+                yield b"".join(to_ndjson_line(row) for row in rows)
             connection.commit()
-            results = get_result_dicts(rows, columns)
         except sqlite3.OperationalError as soe:
-            error_message = str(soe)
+            yield to_ndjson_line({"error_message": str(soe)})
+
+
+def run_ingest(body: str, is_ndjson: bool) -> dict:
+    if is_ndjson:
+        statements = iter_ndjson_statements(body.splitlines())
+    else:
+        statements = iter_script_statements(body)
 
+    with pool.connection() as connection:
+        stats = ingest_statements(connection, statements)
+    result_cache.invalidate(stats["tables"])
+    return {**stats, "tables": sorted(stats["tables"])}
+
+
+@app.post("/transpile")
+async def transpile_query(query: str = Form(...)):
+    """Transpile ZQL to SQL"""
+    try:
+        return await run_transpile(Zql().parse, query)
+    except ZqlParserError as zpe:
+        return str(zpe)
+
+
+@app.post("/transpile/batch")
+async def transpile_queries(
+    request: Request,
+    queries: list[str] = Body(...)
+) -> list[dict]:
+    """Transpile a JSON array of ZQL queries to an array of `{sql, error}`"""
+    if len(queries) > MAX_BATCH_SIZE:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Expected at most {MAX_BATCH_SIZE} queries per batch.",
+        )
+    return await cancel_on_disconnect(request, transpile_batch(queries))
+
+
+@app.post("/run", response_class=CompactJSONResponse)
+async def run_query(
+    query: str = Form(...),
+    page: int | None = Form(None),
+    page_size: int | None = Form(None),
+    format: str = Form(ROWS_FORMAT),
+    pretty: bool = Form(False),
+) -> CompactJSONResponse:
+    """Transpile ZQL to SQL"""
+    result = await run_zql(query, page, page_size, format, pretty)
+    return CompactJSONResponse(result)
+
+
+@app.post("/explain", response_class=CompactJSONResponse)
+async def explain_query(query: str = Form(...)) -> CompactJSONResponse:
+    """Transpile ZQL to SQL and show its query plan, scans and timings"""
+    result = await run_explain(query)
+    return CompactJSONResponse(result)
+
+
+@app.post("/run/stream")
+async def run_query_stream(query: str = Form(...)) -> StreamingResponse:
+    """Transpile ZQL to SQL and stream the results as NDJSON"""
+    header = {
+        "query": query,
+        "transpiled_query": "",
+        "columns": [],
+        "error_message": None,
+    }
+    prepared: PreparedQuery = {"sql": "", "params": []}
+    written_tables = None
+    try:
+        prepared = await run_transpile(Zql().prepare, query)
+        header["transpiled_query"] = inline_params(
+            prepared["sql"], prepared["params"], prepared["param_texts"]
+        )
+        if get_statement_kind(prepared["ast"]) != QUERY_STMT:
+            written_tables = get_table_names(prepared["ast"])
+    except ZqlParserError as zpe:
+        header["error_message"] = str(zpe)
+
+    rows = stream_query_rows(
+        header, prepared["sql"], prepared["params"], written_tables
+    )
+    return StreamingResponse(rows, media_type=NDJSON_MEDIA_TYPE)
+
+
+@app.post("/ingest")
+async def ingest(request: Request) -> dict:
+    """
+    Run a ZQL script, or NDJSON with one statement per line, in a single
+    transaction with inserts batched
+    """
+    body = (await request.body()).decode()
+    content_type = request.headers.get("content-type", "")
+    is_ndjson = content_type.startswith(NDJSON_MEDIA_TYPE)
+    try:
+        stats = await run_in_threadpool(run_ingest, body, is_ndjson)
+        return {**stats, "error_message": None}
+    except (IngestError, sqlite3.Error, PoolTimeoutError) as e:
+        return {"error_message": str(e)}
+
+
+@app.get("/")
+async def home(request: Request):
+    return templates.TemplateResponse(
+        "main.html", {"request": request}
+    )
+
+@app.post("/")
+async def run_query_html(
+    request: Request,
+    query: str = Form(...),
+    page: int | None = Form(None),
+    page_size: int | None = Form(None),
+):
+    """Run ZQL query"""
+    result = await run_zql(query, page, page_size, pretty=True)
     return templates.TemplateResponse(
         "main.html",
-        {
-            "request": request,
-            "query": query,
-            "transpiled_query": transpiled_query,
-            "rows": results,
-            "columns": columns,
-            "error_message": error_message,
-        }
+        {"request": request, **result}
     )
@@ -0,0 +1,138 @@
+import re
+from sqlite3 import Connection
+
+from zql.parser import AstNode
+from zql.statements import find_nodes
+
+
+EXPLAIN_PREFIX_REGEX = re.compile(r"^\s*EXPLAIN\s+(QUERY\s+PLAN\s+)?", re.I)
+SCAN_REGEX = re.compile(r"^SCAN (?:TABLE )?(\w+)(?: AS (\w+))?(.*)$")
+FILTER_CLAUSES = {"where_clause", "join_clause"}
+INDEXABLE_OPERATORS = {"equal", "comp_operator"}
+
+
+PlanNode = dict
+
+
+def strip_explain(sql: str) -> str:
+    """Removes a leading `EXPLAIN` or `EXPLAIN QUERY PLAN` from SQL."""
+    return EXPLAIN_PREFIX_REGEX.sub("", sql)
+
+
+def get_plan_sql(sql: str) -> str:
+    return f"EXPLAIN QUERY PLAN {strip_explain(sql)}"
+
+
+def get_plan_tree(rows: list[tuple]) -> list[PlanNode]:
+    """
+    Nests `EXPLAIN QUERY PLAN` rows of `(id, parent, notused, detail)` into
+    `{"id", "detail", "children"}` nodes. Returns the top level nodes.
+    """
+    nodes: dict[int, PlanNode] = {}
+    roots: list[PlanNode] = []
+    for node_id, parent_id, _, detail in rows:
+        node = {"id": node_id, "detail": detail, "children": []}
+        nodes[node_id] = node
+        parent = nodes.get(parent_id)
+        if parent is None:
+            roots.append(node)
+        else:
+            parent["children"].append(node)
+    return roots
+
+
+def find_full_scans(plan: list[PlanNode]) -> list[dict]:
+    """
+    Finds plan steps that read every row of a table, as
+    `{"name", "detail"}`. SQLite names a scan by its alias when the query gives
+    the table one. Scans that walk an index are not full table scans.
+    """
+    scans = []
+    stack = list(reversed(plan))
+    while stack:
+        node = stack.pop()
+        stack.extend(reversed(node["children"]))
+        match = SCAN_REGEX.match(node["detail"])
+        if match is None or match.group(1) == "CONSTANT":
+            continue
+        if "USING" in match.group(3):
+            continue
+        name = match.group(2) or match.group(1)
+        scans.append({"name": name, "detail": node["detail"]})
+    return scans
+
+
+def get_table_aliases(ast: AstNode) -> dict[str, str]:
+    """Maps each table alias, and each unaliased table name, to its table."""
+    aliases = {}
+    for node in find_nodes(ast, {"table_name"}):
+        children = node.get("children", [])
+        table = children[0]["value"]
+        aliases[table.casefold()] = table
+        if len(children) > 1:
+            aliases[children[-1]["value"].casefold()] = table
+    return aliases
+
+
+def get_operand_column(node: AstNode) -> tuple[str | None, str] | None:
+    """Reads `(qualifier, column)` from a `single_expr` naming a column."""
+    operand = node["children"][0]
+    if operand["type"] == "word":
+        return None, operand["value"]
+    if operand["type"] == "dot_expression":
+        word1, _, word2 = operand["children"]
+        return word1["children"][0]["value"], word2["children"][0]["value"]
+    return None
+
+
+def get_filter_columns(ast: AstNode) -> list[tuple[str | None, str]]:
+    """
+    Lists `(qualifier, column)` pairs compared with `=` or a comparison in
+    `WHERE` and `JOIN ... ON` conditions, which an index could serve.
+    """
+    columns = []
+    for clause in find_nodes(ast, FILTER_CLAUSES):
+        for expression in find_nodes(clause, {"expression"}):
+            children = expression.get("children", [])
+            if len(children) != 3:
+                continue
+            left, operator, right = children
+            if operator["children"][0]["type"] not in INDEXABLE_OPERATORS:
+                continue
+            for side in [left, right]:
+                column = get_operand_column(side)
+                if column is not None and column not in columns:
+                    columns.append(column)
+    return columns
+
+
+def get_table_columns(connection: Connection, table: str) -> set[str]:
+    rows = connection.execute("SELECT name FROM pragma_table_info(?);", [table])
+    return {row[0].casefold() for row in rows}
+
+
+def get_index_hints(
+    connection: Connection,
+    ast: AstNode,
+    full_scans: list[dict]
+) -> list[str]:
+    """
+    Suggests `CREATE INDEX` statements for filtered columns of fully scanned
+    tables. Unqualified columns are matched to any scanned table that has them.
+    """
+    aliases = get_table_aliases(ast)
+    filter_columns = get_filter_columns(ast)
+    hints = []
+    for scan in full_scans:
+        name = scan["name"].casefold()
+        table = aliases.get(name, scan["name"])
+        table_columns = get_table_columns(connection, table)
+        for qualifier, column in filter_columns:
+            if qualifier is not None and qualifier.casefold() != name:
+                continue
+            if column.casefold() not in table_columns:
+                continue
+            hint = f"CREATE INDEX idx_{table}_{column} ON {table}({column});"
+            if hint not in hints:
+                hints.append(hint)
+    return hints
@@ -0,0 +1,26 @@
+import json
+from typing import Any
+
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def dumps(content: Any) -> bytes:
+    """
+    Encodes JSON without whitespace, using `orjson` when it is installed.
+    Values JSON cannot represent, such as SQLite blobs, fall back to `str`.
+    """
+    if orjson is not None:
+        return orjson.dumps(content, default=str)
+    return json.dumps(content, separators=(",", ":"), default=str).encode()
+
+
+class CompactJSONResponse(JSONResponse):
+    """JSON response that skips `jsonable_encoder` and encodes compactly."""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
@@ -0,0 +1,53 @@
+import argparse
+import os
+import sys
+import tempfile
+
+import uvicorn
+
+from zql.loader import write_compiled_zql_grammar
+
+
+APP = "zql_api.main:app"
+
+
+def prepare_worker_env(work_dir: str) -> dict[str, str]:
+    """
+    Compiles the grammar once for every worker and picks a shared cache file,
+    used for both query shapes and transpiled SQL. Settings already in the
+    environment win, so deployments can keep these files on a volume. Returns
+    the variables to set before workers start.
+    """
+    grammar_path = os.environ.get(
+        "ZQL_COMPILED_GRAMMAR", os.path.join(work_dir, "zql_grammar.json")
+    )
+    cache_path = os.environ.get(
+        "ZQL_SHARED_CACHE_PATH", os.path.join(work_dir, "zql_cache.db")
+    )
+    transpile_cache_path = os.environ.get("ZQL_TRANSPILE_CACHE_PATH", cache_path)
+    write_compiled_zql_grammar(grammar_path)
+    return {
+        "ZQL_COMPILED_GRAMMAR": grammar_path,
+        "ZQL_SHARED_CACHE_PATH": cache_path,
+        "ZQL_TRANSPILE_CACHE_PATH": transpile_cache_path,
+    }
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m zql_api.serve",
+        description="Run the ZQL API with one worker process per core.",
+    )
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=80)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args(argv)
+
+    work_dir = tempfile.mkdtemp(prefix="zql-")
+    os.environ.update(prepare_worker_env(work_dir))
+    uvicorn.run(APP, host=args.host, port=args.port, workers=args.workers)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
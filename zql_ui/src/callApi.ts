@@ -7,6 +7,7 @@ export async function callTranspile(input: string) {
   try {
     const formData = new FormData();
     formData.append("query", input);
+    formData.append("pretty", "true");
 
     const response = await axios.post(`${BASE_API_URL}/run`, formData);
 